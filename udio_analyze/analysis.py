@@ -0,0 +1,84 @@
+import association
+import category_dictionary
+import consistency_analyzer
+import data_categorizer
+import data_cleaner
+import data_io
+import frequency_engine
+import language_id
+import profiler
+import results
+import word_frequency_analyzer
+
+# 原始列及清洗后对应的列
+CLEANED_COLUMNS = {'prompt': 'cleaned_prompt', 'tags': 'cleaned_tags'}
+
+def load_categories(category_file=None):
+    """分类词典: 指定文件时加载(使用编译缓存)，否则使用内置的默认词典，不在磁盘上创建文件"""
+    if category_file is None:
+        return category_dictionary.CategoryDictionary.from_categories(data_categorizer.DEFAULT_CATEGORIES)
+    return data_categorizer.load_dictionary(category_file)
+
+def analyze(df, category_file=None, min_support=1, ngram_max=4, pair_top_n=30, language_filter=False):
+    """在内存中运行清洗、分类、词频、短语、词对和一致性分析，返回 results.AnalysisResults，不读写输出文件
+
+    df至少包含prompt和tags列(也可以是已清洗的cleaned_prompt/cleaned_tags列，已有的清洗列不再清洗)。
+    参数与 main.run_full_analysis 的同名选项相同；不生成图表、报告和共享数组。
+    """
+    df = data_io.read_data(df)
+
+    with profiler.span('clean', rows=len(df)):
+        # 每列单独判断: 只清洗还没有对应cleaned_列的原始列
+        raw_columns = [raw for raw, cleaned in CLEANED_COLUMNS.items() if cleaned not in df.columns and raw in df.columns]
+        if raw_columns:
+            cleaner = language_id.LanguageFilter.from_category_file(category_file) if language_filter else None
+            cleaned = data_cleaner.clean_frame(df[raw_columns], cleaner)
+            for column in cleaned.columns:
+                df[column] = cleaned[column]
+
+    with profiler.span('categorize', rows=len(df)):
+        dictionary = load_categories(category_file)
+        categorized = data_categorizer.categorize_frame(df, dictionary.categories, dictionary.word_to_category)
+        for column in categorized.columns:
+            df[column] = categorized[column]
+
+    analysis_results = results.AnalysisResults(data=df)
+
+    with profiler.span('frequency', rows=len(df)):
+        column_counts = word_frequency_analyzer.count_frequency_columns(df, min_support)
+        for column, (name, top_n) in word_frequency_analyzer.FREQUENCY_OUTPUTS.items():
+            if column in df.columns:
+                analysis_results.frequencies[name] = results.FrequencyResult.from_counts(
+                    name, column, column_counts, top_n
+                )
+
+        if ngram_max >= 2 and 'cleaned_prompt' in df.columns:
+            row_weights = df['dedup_weight'].to_numpy() if 'dedup_weight' in df.columns else None
+            ngram_counts = frequency_engine.count_ngrams(
+                df['cleaned_prompt'], ngram_max, max(min_support, frequency_engine.DEFAULT_NGRAM_MIN_SUPPORT),
+                row_weights
+            )
+            for n in range(2, ngram_max + 1):
+                name = f"prompt_{n}gram_frequency"
+                analysis_results.phrases[name] = results.FrequencyResult.from_ngrams(
+                    name, 'cleaned_prompt', ngram_counts, n
+                )
+
+    with profiler.span('pairs', rows=len(df)):
+        for name, columns in word_frequency_analyzer.PAIR_OUTPUTS.items():
+            if any(column not in df.columns for column in columns):
+                continue
+            if len(columns) == 1:
+                associations = association.word_pair_associations(df[columns[0]], min_support)
+                labels = ('Word 1', 'Word 2')
+            else:
+                associations = association.cross_pair_associations(df[columns[0]], df[columns[1]], min_support)
+                labels = word_frequency_analyzer.CROSS_PAIR_LABELS
+            analysis_results.pairs[name] = results.PairResult.from_associations(
+                name, columns, associations, pair_top_n, labels
+            )
+
+    with profiler.span('consistency', rows=len(df)):
+        analysis_results.consistency = consistency_analyzer.consistency_results(df)
+
+    return analysis_results
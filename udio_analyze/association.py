@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.cluster import hierarchy
+from scipy.spatial.distance import pdist, squareform
+
+import frequency_engine
+import tokenizer
+import writers
+
+# 支持的关联度指标: 列名 -> 说明
+METRICS = {
+    'Frequency': '共现行数',
+    'PMI': '点互信息 log(P(a,b) / (P(a)P(b)))',
+    'NPMI': '归一化点互信息，取值 [-1, 1]',
+    'Lift': '提升度 P(a,b) / (P(a)P(b))',
+    'Chi2': '2x2列联表卡方统计量'
+}
+
+# 按PMI/NPMI/Lift/Chi2排序时默认要求的最低共现行数，避免只出现一两次的罕见词对排在最前
+DEFAULT_METRIC_MIN_COUNT = 5
+
+def document_term_matrix(texts, min_support=1):
+    """把每行文本转换为0/1的文档-词矩阵(行 x 词)，返回(矩阵, 词表)；文档频次低于min_support的词剪除"""
+    token_lists = [tokenizer.split_words(text) for text in texts]
+    doc_index, codes, vocabulary = frequency_engine.encode_tokens(token_lists)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(codes), dtype=np.int32), (doc_index, codes)),
+        shape=(len(token_lists), len(vocabulary))
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+
+    if min_support > 1:
+        # 词的文档频次是包含它的词对共现次数的上界，先剪枝再做矩阵乘法
+        keep = np.flatnonzero(np.bincount(matrix.indices, minlength=len(vocabulary)) >= min_support)
+        matrix = matrix[:, keep]
+        vocabulary = vocabulary[keep]
+    return matrix.tocsr(), vocabulary
+
+def association_scores(pair_counts, row_counts, col_counts, n_docs):
+    """由共现次数和两个词各自的文档频次向量化计算PMI、NPMI、Lift和卡方"""
+    a = pair_counts.astype(np.float64)
+    row_counts = row_counts.astype(np.float64)
+    col_counts = col_counts.astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = a * n_docs / (row_counts * col_counts)
+        pmi = np.log(lift)
+        joint_log = np.log(a / n_docs)
+        npmi = np.where(joint_log < 0, pmi / -joint_log, 1.0)
+
+        # 2x2列联表: a=同时出现, b/c=只出现其中一个, d=都不出现
+        b = row_counts - a
+        c = col_counts - a
+        d = n_docs - row_counts - col_counts + a
+        denominator = (a + b) * (c + d) * (a + c) * (b + d)
+        chi2 = np.where(denominator > 0, n_docs * (a * d - b * c) ** 2 / denominator, 0.0)
+
+    return {'PMI': pmi, 'NPMI': npmi, 'Lift': lift, 'Chi2': chi2}
+
+class PairAssociations:
+    """词对共现计数及关联度指标，所有指标由同一份聚合计数一次向量化算出"""
+
+    __slots__ = ('row_vocabulary', 'col_vocabulary', 'rows', 'cols', 'metrics', 'n_docs')
+
+    def __init__(self, row_vocabulary, col_vocabulary, rows, cols, metrics, n_docs):
+        self.row_vocabulary = row_vocabulary
+        self.col_vocabulary = col_vocabulary
+        self.rows = rows
+        self.cols = cols
+        self.metrics = metrics
+        self.n_docs = n_docs
+
+    def __len__(self):
+        return len(self.rows)
+
+    def top_index(self, metric='Frequency', n=30, min_count=1):
+        """按某个指标排序的前n个词对的下标(同分按共现次数)，只考虑共现行数不低于min_count的词对"""
+        values = self.metrics[metric]
+        frequency = self.metrics['Frequency']
+        candidates = np.flatnonzero(frequency >= min_count)
+        if len(candidates) > n:
+            # 先用argpartition取出候选，再对少量候选排序
+            part = np.argpartition(-values[candidates], n - 1)[:n]
+            threshold = values[candidates[part]].min()
+            candidates = candidates[values[candidates] >= threshold]
+        order = np.lexsort((candidates, -frequency[candidates], -values[candidates]))[:n]
+        return candidates[order]
+
+    def top_n(self, metric='Frequency', n=30, min_count=1, labels=('Word 1', 'Word 2')):
+        """按某个指标返回前n个词对的表(见 top_index)"""
+        index = self.top_index(metric, n, min_count)
+        result = pd.DataFrame({
+            labels[0]: self.row_vocabulary[self.rows[index]],
+            labels[1]: self.col_vocabulary[self.cols[index]],
+        })
+        for name, column in self.metrics.items():
+            result[name] = column[index] if name == 'Frequency' else np.round(column[index], 4)
+        return result
+
+def _pairs_from_matrix(cooccurrence, row_frequency, col_frequency, n_docs, min_support,
+                       row_vocabulary, col_vocabulary):
+    """从共现矩阵中取出非零词对并计算全部指标"""
+    cooccurrence = cooccurrence.tocoo()
+    keep = cooccurrence.data >= min_support
+    rows = cooccurrence.row[keep].astype(np.int64)
+    cols = cooccurrence.col[keep].astype(np.int64)
+    counts = cooccurrence.data[keep].astype(np.int64)
+
+    metrics = {'Frequency': counts}
+    metrics.update(association_scores(counts, row_frequency[rows], col_frequency[cols], n_docs))
+    return PairAssociations(row_vocabulary, col_vocabulary, rows, cols, metrics, n_docs)
+
+def word_pair_associations(texts, min_support=1):
+    """同一列内的词对: 共现矩阵 X.T @ X 的上三角，每行内重复的词只计一次"""
+    matrix, vocabulary = document_term_matrix(texts, min_support)
+    return matrix_pair_associations(matrix, vocabulary, min_support)
+
+def matrix_pair_associations(matrix, vocabulary, min_support=1):
+    """由已构建的0/1文档-词矩阵计算同一列内的词对关联度"""
+    return cooccurrence_pair_associations(matrix.T @ matrix, vocabulary, matrix.shape[0], min_support)
+
+def cooccurrence_pair_associations(cooccurrence, vocabulary, n_docs, min_support=1):
+    """由对称的共现矩阵 X.T @ X (对角线为各词的文档频次)计算同一列内的词对关联度，可用于增量累加的共现矩阵"""
+    cooccurrence = sparse.csr_matrix(cooccurrence)
+    frequency = cooccurrence.diagonal()
+    if min_support > 1:
+        # 文档频次低于min_support的词不可能出现在保留的词对中
+        keep = np.flatnonzero(frequency >= min_support)
+        cooccurrence = cooccurrence[keep][:, keep]
+        vocabulary = vocabulary[keep]
+        frequency = frequency[keep]
+
+    # 与原实现一致，词对内两个词按字母顺序排列
+    order = np.argsort(vocabulary.astype(str), kind='stable')
+    cooccurrence = cooccurrence[order][:, order]
+    vocabulary = vocabulary[order]
+    frequency = frequency[order]
+    return _pairs_from_matrix(sparse.triu(cooccurrence, k=1), frequency, frequency, n_docs, min_support,
+                              vocabulary, vocabulary)
+
+def cross_pair_associations(texts1, texts2, min_support=1):
+    """两列之间的词对: 共现矩阵 X1.T @ X2"""
+    matrix1, vocabulary1 = document_term_matrix(texts1, min_support)
+    matrix2, vocabulary2 = document_term_matrix(texts2, min_support)
+    return cross_matrix_associations(matrix1, matrix2, min_support, vocabulary1, vocabulary2)
+
+def cross_matrix_associations(matrix1, matrix2, min_support=1, vocabulary1=None, vocabulary2=None):
+    """两个已构建的0/1文档-词矩阵之间的词对关联度(两个矩阵的行必须对应同一批数据)"""
+    frequency1 = np.asarray(matrix1.sum(axis=0)).ravel()
+    frequency2 = np.asarray(matrix2.sum(axis=0)).ravel()
+    return cross_cooccurrence_associations(matrix1.T @ matrix2, frequency1, frequency2, matrix1.shape[0],
+                                           min_support, vocabulary1, vocabulary2)
+
+def cross_cooccurrence_associations(cooccurrence, frequency1, frequency2, n_docs, min_support=1,
+                                    vocabulary1=None, vocabulary2=None):
+    """由跨列共现矩阵 X1.T @ X2 和两列各自的文档频次计算词对关联度"""
+    return _pairs_from_matrix(sparse.csr_matrix(cooccurrence), frequency1, frequency2, n_docs, min_support,
+                              vocabulary1, vocabulary2)
+
+def top_k_cooccurrence(matrix, vocabulary, k=30, metric='Frequency', cluster=False):
+    """文档频次最高的k个词的 k x k 共现矩阵(一次稀疏矩阵乘积)，返回以词为行列索引的DataFrame
+
+    metric为'Frequency'时为共现行数(对角线置0)，为'NPMI'时为归一化点互信息(从不共现为-1，对角线为1)。
+    cluster=True时按层次聚类(平均连接)的叶子顺序排列行列，使关联紧密的词相邻。
+    """
+    frequency = np.asarray(matrix.sum(axis=0)).ravel()
+    top = _top_k_words(frequency, vocabulary, k)
+    sub = matrix[:, top]
+    counts = (sub.T @ sub).toarray().astype(np.int64)
+    return _cooccurrence_frame(counts, frequency[top], vocabulary[top], matrix.shape[0], metric, cluster)
+
+def top_k_from_cooccurrence(cooccurrence, vocabulary, n_docs, k=30, metric='Frequency', cluster=False):
+    """由对称的共现矩阵 X.T @ X (对角线为文档频次)取前k个词的热力图数据，参数与 top_k_cooccurrence 相同"""
+    cooccurrence = sparse.csr_matrix(cooccurrence)
+    frequency = cooccurrence.diagonal()
+    top = _top_k_words(frequency, vocabulary, k)
+    counts = cooccurrence[top][:, top].toarray().astype(np.int64)
+    return _cooccurrence_frame(counts, frequency[top], vocabulary[top], n_docs, metric, cluster)
+
+def _top_k_words(frequency, vocabulary, k):
+    """文档频次最高的k个词的下标，按频次降序、同频次按字母顺序"""
+    k = min(k, len(frequency))
+    top = np.argpartition(-frequency, k - 1)[:k] if 0 < k < len(frequency) else np.arange(k)
+    return top[np.lexsort((vocabulary[top].astype(str), -frequency[top]))]
+
+def _cooccurrence_frame(counts, frequency, words, n_docs, metric, cluster):
+    """把前k个词的共现计数转换为热力图取值(可选按层次聚类排序)，返回DataFrame"""
+    k = len(words)
+    if metric == 'NPMI':
+        values = association_scores(counts, frequency[:, None], frequency[None, :], n_docs)['NPMI']
+        values = np.where(counts > 0, values, -1.0)
+        np.fill_diagonal(values, 1.0)
+        values = np.round(values, 4)
+    elif metric == 'Frequency':
+        values = counts.copy()
+        np.fill_diagonal(values, 0)
+    else:
+        raise ValueError(f"热力图不支持的指标: {metric}")
+
+    if cluster and k > 2:
+        if metric == 'NPMI':
+            # NPMI越高距离越近，距离取值 [0, 1]
+            distances = squareform((1 - values) / 2, checks=False)
+        else:
+            # 每个词的共现分布(含自身文档频次)之间的余弦距离
+            profile = counts.astype(np.float64)
+            distances = np.nan_to_num(pdist(profile, 'cosine'), nan=1.0)
+        order = hierarchy.leaves_list(hierarchy.linkage(distances, method='average'))
+        words, values = words[order], values[np.ix_(order, order)]
+
+    return pd.DataFrame(values, index=words, columns=words)
+
+def save_association_tables(associations, output_file, n=30, min_count=DEFAULT_METRIC_MIN_COUNT,
+                            labels=('Word 1', 'Word 2')):
+    """把按各指标排序的前n个词对分别保存为一个表(xlsx中为工作表)，返回保存的文件路径"""
+    sheets = {}
+    for metric in METRICS:
+        threshold = 1 if metric == 'Frequency' else min_count
+        sheets[metric] = associations.top_n(metric, n, threshold, labels)
+    return writers.save_sheets(sheets, output_file)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 分析模块位于上级目录(平铺的脚本模块)，保证以任意方式运行基准测试时都能导入
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, _PACKAGE_DIR)
@@ -0,0 +1,78 @@
+import re
+import json
+import time
+import string
+import argparse
+
+from . import _PACKAGE_DIR  # noqa: F401  (保证可以导入分析模块)
+from .synthetic_corpus import generate_corpus
+import tokenizer
+
+def per_row_regex(texts):
+    """原 prompt_analyzer 的做法: 每行调用 re.findall"""
+    return [re.findall(r'\b\w+\b', text.lower()) for text in texts]
+
+def per_row_translate(texts):
+    """原 clean_text 的做法: 每行创建转换表删除标点后切分"""
+    return [text.lower().translate(str.maketrans('', '', string.punctuation)).split() for text in texts]
+
+METHODS = {
+    'per_row_regex': per_row_regex,
+    'per_row_translate': per_row_translate,
+    'tokenizer.tokenize_batch': tokenizer.tokenize_batch,
+}
+
+def load_texts(input_file=None, n_rows=100000, seed=42):
+    """准备测试文本: prompt和tags两列"""
+    if input_file:
+        import pandas as pd
+        df = pd.read_excel(input_file, usecols=['prompt', 'tags'])
+    else:
+        df = generate_corpus(n_rows, seed)
+    return [t for t in df['prompt'].tolist() + df['tags'].tolist() if isinstance(t, str)]
+
+def run(texts, repeat=3):
+    """对每种分词方法计时(取最快一次)"""
+    n_bytes = sum(len(t.encode('utf-8')) for t in texts)
+    results = {}
+    for name, method in METHODS.items():
+        best = None
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            tokens = method(texts)
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {
+            'seconds': round(best, 6),
+            'texts_per_sec': round(len(texts) / best, 1),
+            'mb_per_sec': round(n_bytes / best / 1e6, 2),
+            'tokens': sum(len(t) for t in tokens)
+        }
+
+    baseline = results['per_row_regex']['seconds']
+    for name, result in results.items():
+        result['speedup_vs_per_row_regex'] = round(baseline / result['seconds'], 2)
+        print(f"  {name:<28} {result['seconds']:>8.3f} 秒  {result['mb_per_sec']:>8.2f} MB/秒  "
+              f"{result['speedup_vs_per_row_regex']:>5.2f}x")
+    return results
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='分词吞吐基准测试')
+    parser.add_argument('--input', dest='input_file', help='使用真实Excel数据 (需包含prompt和tags列)')
+    parser.add_argument('--rows', type=int, default=100000, help='合成数据行数 (默认: 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最快一次 (默认: 3)')
+    parser.add_argument('-o', '--output', dest='output_file', help='把结果保存为JSON')
+    args = parser.parse_args()
+
+    texts = load_texts(args.input_file, args.rows)
+    print(f"分词基准测试: {len(texts)} 条文本")
+    results = run(texts, args.repeat)
+
+    if args.output_file:
+        with open(args.output_file, 'w', encoding='utf-8') as f:
+            json.dump({'texts': len(texts), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output_file}")
+
+if __name__ == "__main__":
+    main()
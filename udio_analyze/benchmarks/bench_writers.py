@@ -0,0 +1,122 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+# 基准测试不需要图形界面
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from . import _PACKAGE_DIR  # noqa: F401  (保证可以导入分析模块)
+from .synthetic_corpus import generate_corpus
+import data_io
+import data_cleaner
+import data_categorizer
+import word_frequency_analyzer
+import consistency_analyzer
+import profiler
+import writers
+
+def _span_seconds(spans, name, key='duration_s'):
+    """累加计时树中某个名称的区段耗时(key为 'write_s' 时取后台线程实际写文件的耗时)"""
+    total = 0.0
+    for span in spans:
+        if span['name'] == name:
+            total += span.get(key) or 0.0
+        total += _span_seconds(span['children'], name, key)
+    return total
+
+def _output_bytes(work_dir):
+    """输出目录中各中间结果文件的总大小(不含图表)"""
+    return sum(os.path.getsize(os.path.join(work_dir, name)) for name in os.listdir(work_dir)
+               if writers.split_output(name)[0] is not None)
+
+def run_stages(cleaned_df, category_file, work_dir):
+    """执行分类、词频/词对和一致性三个会写出中间结果的阶段"""
+    categorized_df, _ = data_categorizer.categorize_data(
+        cleaned_df, category_file, os.path.join(work_dir, 'music_prompt_categorized.xlsx'))
+    word_frequency_analyzer.analyze_all_word_frequencies(categorized_df, work_dir)
+    consistency_analyzer.analyze_tag_prompt_consistency(categorized_df, work_dir)
+
+def benchmark_format(output_format, use_background, cleaned_df, category_file):
+    """某个输出格式下三个阶段的总耗时、写出耗时和文件大小"""
+    work_dir = tempfile.mkdtemp(prefix=f'udio_writers_{output_format}_')
+    run_profiler = profiler.RunProfiler()
+    previous_profiler = profiler.activate(run_profiler)
+    previous_format = writers.get_format()
+    try:
+        writers.set_format(output_format)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            with run_profiler.span('stages'):
+                if use_background:
+                    with writers.background():
+                        run_stages(cleaned_df, category_file, work_dir)
+                else:
+                    run_stages(cleaned_df, category_file, work_dir)
+            elapsed = time.perf_counter() - start_time
+        spans = run_profiler.summary()['spans']
+        return {
+            'format': output_format,
+            'background': use_background,
+            'seconds': round(elapsed, 4),
+            # 写文件耗时: 后台写出时在写入线程中计时
+            'write_seconds': round(_span_seconds(spans, 'write_output', 'write_s' if use_background else 'duration_s'), 4),
+            # 后台写出时计算线程提交写入(包括队列已满时等待)的耗时
+            'submit_seconds': round(_span_seconds(spans, 'write_output'), 4) if use_background else None,
+            'output_mb': round(_output_bytes(work_dir) / 1024 / 1024, 2)
+        }
+    finally:
+        writers.set_format(previous_format)
+        profiler.activate(previous_profiler)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def run(n_rows=10000, formats=None, seed=42):
+    """对每种输出格式分别以同步和后台线程方式写出，返回结果列表"""
+    formats = formats or list(writers.FORMATS)
+    corpus = generate_corpus(n_rows, seed)
+    setup_dir = tempfile.mkdtemp(prefix='udio_writers_setup_')
+    try:
+        category_file = os.path.join(setup_dir, 'word_categories.xlsx')
+        with contextlib.redirect_stdout(io.StringIO()):
+            cleaned_df, _ = data_cleaner.clean_data(corpus, os.path.join(setup_dir, 'music_prompt_cleaned.xlsx'))
+            data_categorizer.create_category_dictionary(category_file)
+
+        results = []
+        for output_format in formats:
+            if output_format == 'parquet' and not data_io.parquet_available():
+                print("  parquet  跳过: 未安装pyarrow或fastparquet")
+                continue
+            for use_background in (False, True):
+                result = benchmark_format(output_format, use_background, cleaned_df, category_file)
+                results.append(result)
+                print(f"  {output_format:<8} {'后台' if use_background else '同步'}  总耗时 {result['seconds']:>8.3f} 秒  "
+                      f"写出 {result['write_seconds']:>8.3f} 秒  文件 {result['output_mb']:>7.2f} MB")
+        return results
+    finally:
+        shutil.rmtree(setup_dir, ignore_errors=True)
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='中间结果输出格式的导出耗时基准测试')
+    parser.add_argument('--rows', type=int, default=10000, help='合成数据行数 (默认: 10000)')
+    parser.add_argument('--formats', nargs='+', choices=list(writers.FORMATS), help='只测试指定格式')
+    parser.add_argument('--seed', type=int, default=42, help='合成数据随机种子 (默认: 42)')
+    parser.add_argument('-o', '--output', dest='output_file', help='把结果保存为JSON')
+    args = parser.parse_args()
+
+    print(f"输出格式基准测试: {args.rows} 行 (分类、词频/词对、一致性三个阶段)")
+    results = run(args.rows, args.formats, args.seed)
+
+    if args.output_file:
+        with open(args.output_file, 'w', encoding='utf-8') as f:
+            json.dump({'rows': args.rows, 'python': sys.version.split()[0], 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output_file}")
+
+if __name__ == "__main__":
+    main()
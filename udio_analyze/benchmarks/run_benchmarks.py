@@ -0,0 +1,171 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime
+
+# 基准测试不需要图形界面
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from . import _PACKAGE_DIR
+from .synthetic_corpus import generate_corpus
+import data_cleaner
+import data_categorizer
+import word_frequency_analyzer
+import consistency_analyzer
+import report_generator
+import profiler
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def git_commit():
+    """返回当前git提交，无法获取时返回None"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=_PACKAGE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _timed(stage, rows, func, repeat, verbose):
+    """执行func repeat次，返回最快一次的耗时、子步骤计时和返回值"""
+    best = None
+    for _ in range(repeat):
+        run_profiler = profiler.RunProfiler()
+        previous = profiler.activate(run_profiler)
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(sys.stdout if verbose else output):
+                start_time = time.perf_counter()
+                with run_profiler.span(stage, rows=rows):
+                    value = func()
+                elapsed = time.perf_counter() - start_time
+        finally:
+            profiler.activate(previous)
+
+        if best is None or elapsed < best[0]:
+            best = (elapsed, run_profiler.summary()['spans'][0]['children'], value)
+
+    elapsed, spans, value = best
+    return {
+        'stage': stage,
+        'rows': rows,
+        'seconds': round(elapsed, 6),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': profiler.peak_rss_mb(),
+        'spans': spans
+    }, value
+
+def benchmark_size(n_rows, work_dir, seed=42, repeat=1, verbose=False):
+    """对一个数据规模依次测试各分析阶段"""
+    results = []
+    print(f"\n规模 {n_rows} 行: 生成合成数据...")
+    corpus = generate_corpus(n_rows, seed)
+
+    result, (cleaned_df, _) = _timed('clean_data', n_rows, lambda: data_cleaner.clean_data(
+        corpus, os.path.join(work_dir, 'music_prompt_cleaned.xlsx')), repeat, verbose)
+    results.append(result)
+
+    category_file = os.path.join(work_dir, 'word_categories.xlsx')
+    with contextlib.redirect_stdout(io.StringIO()):
+        data_categorizer.create_category_dictionary(category_file)
+    result, (categorized_df, _) = _timed('categorize_data', n_rows, lambda: data_categorizer.categorize_data(
+        cleaned_df, category_file, os.path.join(work_dir, 'music_prompt_categorized.xlsx')), repeat, verbose)
+    results.append(result)
+
+    result, _ = _timed('analyze_word_pairs', n_rows, lambda: word_frequency_analyzer.analyze_word_pairs(
+        categorized_df, 'cleaned_prompt', os.path.join(work_dir, 'prompt_word_pairs.xlsx')), repeat, verbose)
+    results.append(result)
+
+    result, _ = _timed('analyze_tag_prompt_consistency', n_rows,
+                       lambda: consistency_analyzer.analyze_tag_prompt_consistency(categorized_df, work_dir),
+                       repeat, verbose)
+    results.append(result)
+
+    result, _ = _timed('generate_report', n_rows,
+                       lambda: report_generator.generate_report(categorized_df, work_dir), repeat, verbose)
+    results.append(result)
+
+    for result in results:
+        print(f"  {result['stage']:<32} {result['seconds']:>10.3f} 秒  {result['rows_per_sec'] or 0:>12.0f} 行/秒")
+    return results
+
+def run_benchmarks(sizes=None, seed=42, repeat=1, output_file=None, keep_outputs=False, verbose=False):
+    """运行全部基准测试并把结果保存为JSON"""
+    if sizes is None:
+        sizes = DEFAULT_SIZES
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+        'results': []
+    }
+
+    for n_rows in sizes:
+        work_dir = tempfile.mkdtemp(prefix=f'udio_bench_{n_rows}_')
+        try:
+            for result in benchmark_size(n_rows, work_dir, seed, repeat, verbose):
+                report['results'].append({'size': n_rows, **result})
+        finally:
+            if keep_outputs:
+                print(f"  输出文件保留在: {work_dir}")
+            else:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    if output_file is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_file = os.path.join(RESULTS_DIR, f"{stamp}_{commit or 'nogit'}.json")
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n基准测试结果已保存到: {output_file}")
+    return report
+
+def compare_results(baseline_file, current):
+    """与之前保存的基准结果比较，打印每个阶段的耗时变化"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    base_times = {(r['size'], r['stage']): r['seconds'] for r in baseline['results']}
+    print(f"\n与 {baseline.get('commit')} ({baseline_file}) 比较:")
+    for result in current['results']:
+        key = (result['size'], result['stage'])
+        if key not in base_times:
+            continue
+        ratio = result['seconds'] / base_times[key] if base_times[key] else float('inf')
+        print(f"  {result['size']:>8} {result['stage']:<32} {base_times[key]:>10.3f} -> {result['seconds']:>10.3f} 秒  ({ratio:.2f}x)")
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='音乐提示词分析基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='测试的数据规模 (默认: 1000 10000 100000 1000000)')
+    parser.add_argument('--seed', type=int, default=42, help='合成数据随机种子 (默认: 42)')
+    parser.add_argument('--repeat', type=int, default=1, help='每个阶段重复次数，取最快一次 (默认: 1)')
+    parser.add_argument('-o', '--output', dest='output_file',
+                        help='结果JSON文件 (默认: benchmarks/results/<时间>_<提交>.json)')
+    parser.add_argument('--compare', dest='baseline_file', help='与之前的基准结果JSON比较')
+    parser.add_argument('--keep-outputs', action='store_true', help='保留各阶段生成的输出文件')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示各分析阶段的输出')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.seed, args.repeat, args.output_file, args.keep_outputs, args.verbose)
+    if args.baseline_file:
+        compare_results(args.baseline_file, report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+from . import _PACKAGE_DIR  # noqa: F401  (保证可以导入分析模块)
+import data_categorizer
+
+# 用于拼接伪单词的音节，生成的噪声词看起来像英文但大多不在词典中
+_SYLLABLES = [
+    'ka', 'lo', 'mi', 'ra', 'ven', 'tor', 'shi', 'lux', 'dre', 'mon', 'zel', 'qua',
+    'fin', 'bri', 'sol', 'nyx', 'ter', 'vox', 'ly', 'den', 'gro', 'pha', 'sti', 'wen'
+]
+
+def zipf_weights(n, exponent=1.1):
+    """返回长度为n、按Zipf分布(1/rank^s)归一化的概率"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def category_vocabulary(categories=None):
+    """返回分类词典中的全部词汇(去重，保持顺序)"""
+    if categories is None:
+        categories = data_categorizer.DEFAULT_CATEGORIES
+    return list(dict.fromkeys(w for words in categories.values() for w in words))
+
+def noise_vocabulary(n_words, rng):
+    """生成n_words个互不相同的伪单词作为长尾噪声"""
+    words = set()
+    while len(words) < n_words:
+        n_syllables = rng.integers(2, 5, size=n_words)
+        picks = rng.integers(0, len(_SYLLABLES), size=(n_words, 4))
+        for count, row in zip(n_syllables, picks):
+            words.add(''.join(_SYLLABLES[i] for i in row[:count]))
+            if len(words) >= n_words:
+                break
+    return sorted(words)
+
+def generate_corpus(n_rows, seed=42, n_noise_words=20000, category_ratio=0.6,
+                    mean_terms=6, zipf_exponent=1.1, categories=None):
+    """生成与Udio抓取数据结构一致的合成数据 (title, artist, time, duration, prompt, song_path, tags)"""
+    rng = np.random.default_rng(seed)
+
+    # 词表: 分类词典词汇 + Zipf分布的噪声词，两者都按Zipf分布抽样
+    category_words = category_vocabulary(categories)
+    rng.shuffle(category_words)
+    noise_words = noise_vocabulary(n_noise_words, rng)
+    rng.shuffle(noise_words)
+    category_words = np.array(category_words, dtype=object)
+    noise_words = np.array(noise_words, dtype=object)
+
+    # 每条prompt的词条数量和每个词条的来源
+    term_counts = 1 + rng.poisson(mean_terms, size=n_rows)
+    total_terms = int(term_counts.sum())
+    is_category = rng.random(total_terms) < category_ratio
+    terms = np.where(
+        is_category,
+        category_words[rng.choice(len(category_words), total_terms, p=zipf_weights(len(category_words), zipf_exponent))],
+        noise_words[rng.choice(len(noise_words), total_terms, p=zipf_weights(len(noise_words), zipf_exponent))]
+    )
+    capitalize = rng.random(total_terms) < 0.5
+    terms = np.where(capitalize, np.char.capitalize(terms.astype(str)).astype(object), terms)
+
+    # tags 取 prompt 中的部分词条，并额外补充少量分类词汇
+    keep_in_tags = rng.random(total_terms) < 0.7
+    extra_counts = rng.integers(0, 3, size=n_rows)
+    extra_tags = category_words[rng.choice(len(category_words), int(extra_counts.sum()))]
+
+    prompts = []
+    tags = []
+    offsets = np.concatenate([[0], np.cumsum(term_counts)])
+    extra_offsets = np.concatenate([[0], np.cumsum(extra_counts)])
+    for i in range(n_rows):
+        row_terms = terms[offsets[i]:offsets[i + 1]]
+        prompts.append(', '.join(row_terms))
+        row_tags = list(row_terms[keep_in_tags[offsets[i]:offsets[i + 1]]])
+        row_tags.extend(extra_tags[extra_offsets[i]:extra_offsets[i + 1]])
+        tags.append('&'.join(row_tags))
+
+    # 其余元数据列
+    n_artists = max(50, n_rows // 20)
+    artist_ids = rng.choice(n_artists, n_rows, p=zipf_weights(n_artists, 1.0))
+    created = pd.Timestamp('2025-01-01', tz='UTC') + pd.to_timedelta(
+        rng.integers(0, 180 * 24 * 3600, size=n_rows), unit='s'
+    )
+    title_words = noise_words[rng.integers(0, len(noise_words), size=(n_rows, 2))]
+    titles = [f"{a.capitalize()} {b.capitalize()}" for a, b in title_words]
+    song_ids = rng.integers(0, 2 ** 63, size=n_rows, dtype=np.int64)
+
+    return pd.DataFrame({
+        'title': titles,
+        'artist': [f"artist{a:05d}" for a in artist_ids],
+        'time': created.strftime('%Y-%m-%dT%H:%M:%S.%f+00:00'),
+        'duration': np.round(rng.gamma(4.0, 40.0, size=n_rows) + 30, 6),
+        'prompt': prompts,
+        'song_path': [f"https://storage.googleapis.com/udio-artifacts-synthetic/samples/{s:016x}/1/song.mp3" for s in song_ids],
+        'tags': tags
+    })
+
+def main():
+    """命令行入口: 生成合成数据并保存"""
+    parser = argparse.ArgumentParser(description='生成Udio结构的合成数据')
+    parser.add_argument('rows', type=int, help='生成的行数')
+    parser.add_argument('-o', '--output', default='synthetic_corpus.xlsx', help='输出文件 (默认: synthetic_corpus.xlsx)')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子 (默认: 42)')
+    args = parser.parse_args()
+
+    df = generate_corpus(args.rows, args.seed)
+    df.to_excel(args.output, index=False)
+    print(f"已生成 {len(df)} 行合成数据: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import warnings
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# 每个批次重采样矩阵的元素数上限(批次数 x 行数 x 指标数)，控制单批内存
+BATCH_ELEMENTS = 4000000
+
+# 总重采样元素数低于该值时在当前进程中计算，进程启动开销比计算本身更大
+PARALLEL_MIN_ELEMENTS = 50000000
+
+STATISTICS = ('mean', 'median')
+
+# 工作进程中的数据，由进程池初始化函数设置，避免每个批次重复传输
+_worker_values = None
+
+def _init_worker(values):
+    """进程池初始化: 保存待重采样的数据"""
+    global _worker_values
+    _worker_values = values
+
+def _resample_batch(values, n_resamples, seed_sequence):
+    """一个批次的重采样: 一次生成 (批次数 x 行数) 的下标矩阵，返回各列的均值和中位数"""
+    rng = np.random.default_rng(seed_sequence)
+    n_rows = values.shape[0]
+    index = rng.integers(0, n_rows, size=(n_resamples, n_rows))
+    samples = values[index]  # (批次数, 行数, 指标数)，不适用的行为NaN
+    with warnings.catch_warnings():
+        # 某次重采样中某类别全为NaN时返回NaN，不需要警告
+        warnings.simplefilter('ignore', RuntimeWarning)
+        means = np.nanmean(samples, axis=1)
+        medians = np.nanmedian(samples, axis=1)
+    return np.stack([means, medians])  # (统计量, 批次数, 指标数)
+
+def _run_batch(args):
+    """工作进程中执行一个批次"""
+    n_resamples, seed_sequence = args
+    return _resample_batch(_worker_values, n_resamples, seed_sequence)
+
+def bootstrap_distribution(values, n_resamples=1000, seed=None, workers=None):
+    """按行重采样values(行 x 指标，缺失为NaN)，返回(统计量, 重采样次数, 指标)的自助分布
+
+    每个批次使用由seed派生的独立随机流，固定seed时结果与进程数无关。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    batch_size = max(1, BATCH_ELEMENTS // max(values.shape[0] * values.shape[1], 1))
+    sizes = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if values.size * n_resamples >= PARALLEL_MIN_ELEMENTS else 1
+    workers = min(workers, len(sizes))
+
+    if workers <= 1:
+        batches = [_resample_batch(values, size, s) for size, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(values,)) as executor:
+            batches = list(executor.map(_run_batch, zip(sizes, seeds)))
+
+    return np.concatenate(batches, axis=1)
+
+def _interval(samples, confidence):
+    """百分位置信区间"""
+    alpha = (1 - confidence) / 2
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lower, upper = np.nanquantile(samples, [alpha, 1 - alpha], axis=0)
+    return lower, upper
+
+def bootstrap_consistency(consistency_df, metrics=('jaccard_similarity', 'overlap_coefficient'),
+                          n_resamples=1000, confidence=0.95, seed=None, workers=None):
+    """一致性指标的自助法置信区间: 各类别的均值/中位数，以及类别两两之间的差值
+
+    以原数据行(row_id)为重采样单位，同一行在各类别中的得分一起被抽中，类别差值的区间保留了类别间的相关性。
+    """
+    wide = consistency_df.pivot_table(index='row_id', columns='category', values=list(metrics), aggfunc='first')
+    categories = list(wide.columns.levels[1].intersection(consistency_df['category'].unique()))
+    columns = [(metric, category) for metric in metrics for category in categories]
+    wide = wide.reindex(columns=pd.MultiIndex.from_tuples(columns))
+    values = wide.to_numpy(dtype=np.float64)
+
+    distribution = bootstrap_distribution(values, n_resamples, seed, workers)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        estimates = np.stack([np.nanmean(values, axis=0), np.nanmedian(values, axis=0)])
+
+    intervals = []
+    for s, statistic in enumerate(STATISTICS):
+        lower, upper = _interval(distribution[s], confidence)
+        for j, (metric, category) in enumerate(columns):
+            intervals.append({
+                'category': category,
+                'metric': metric,
+                'statistic': statistic,
+                'estimate': estimates[s, j],
+                'ci_lower': lower[j],
+                'ci_upper': upper[j]
+            })
+
+    differences = []
+    position = {column: j for j, column in enumerate(columns)}
+    for s, statistic in enumerate(STATISTICS):
+        for metric in metrics:
+            for category_a, category_b in combinations(categories, 2):
+                a, b = position[(metric, category_a)], position[(metric, category_b)]
+                samples = distribution[s][:, a] - distribution[s][:, b]
+                lower, upper = _interval(samples, confidence)
+                differences.append({
+                    'category_a': category_a,
+                    'category_b': category_b,
+                    'metric': metric,
+                    'statistic': statistic,
+                    'difference': estimates[s, a] - estimates[s, b],
+                    'ci_lower': lower,
+                    'ci_upper': upper,
+                    # 区间不包含0时认为差异显著
+                    'significant': bool(lower > 0 or upper < 0)
+                })
+
+    return pd.DataFrame(intervals), pd.DataFrame(differences)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+import tokenizer
+
+# 编译缓存格式版本，格式变化时旧缓存自动失效
+CACHE_FORMAT = 1
+
+CACHE_DIR_NAME = '.category_cache'
+
+def metadata_file(dictionary_file):
+    """词典文件对应的元数据文件(内容哈希、版本号、文件状态)"""
+    return f"{os.path.splitext(dictionary_file)[0]}.meta.json"
+
+def _file_state(path):
+    """文件的修改时间和大小，用于快速判断文件是否变化"""
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+def _read_json(path):
+    """读取JSON文件，不存在或损坏时返回None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    """原子写入JSON文件"""
+    temp_file = f"{path}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, path)
+
+def content_hash(categories):
+    """分类词典内容的SHA-256哈希(类别顺序有意义，后面的类别在冲突时覆盖前面的)"""
+    canonical = json.dumps(list(categories.items()), ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def validate_categories(categories):
+    """规范化并检查分类词典，返回(规范化后的词典, 问题列表)
+
+    词汇按分词规则规范化('Lo-Fi' -> 'lofi')，同一类别内的重复词只保留一次；
+    同一个词出现在多个类别中时按原有规则由后面的类别生效，并在问题列表中报告。
+    """
+    normalized = {}
+    issues = []
+    first_category = {}
+
+    for category, words in categories.items():
+        seen = set()
+        normalized[category] = []
+        for word in words:
+            if not isinstance(word, str) or not word.strip():
+                continue
+            term = tokenizer.normalize_text(word).strip()
+            if not term:
+                issues.append({'type': 'empty', 'word': word, 'categories': [category]})
+                continue
+            if ' ' in term:
+                # 分类按单词匹配，多词条目永远不会命中
+                issues.append({'type': 'multi_word', 'word': word, 'categories': [category]})
+            if term in seen:
+                issues.append({'type': 'duplicate', 'word': term, 'categories': [category]})
+                continue
+            seen.add(term)
+            normalized[category].append(term)
+
+            if term in first_category:
+                issues.append({'type': 'collision', 'word': term,
+                               'categories': [first_category[term], category], 'winner': category})
+            first_category[term] = category
+
+    return normalized, issues
+
+def compile_matcher(categories):
+    """编译单词到类别的映射(后面的类别覆盖前面的)"""
+    word_to_category = {}
+    for category, words in categories.items():
+        for word in words:
+            word_to_category[word] = category
+    return word_to_category
+
+class CategoryDictionary:
+    """经过校验的分类词典: 规范化的词表、编译后的单词->类别映射、内容哈希和版本号"""
+
+    def __init__(self, categories, issues=None, version=1, source=None, word_to_category=None, digest=None):
+        self.categories = categories
+        self.issues = issues or []
+        self.version = version
+        self.source = source
+        self.content_hash = digest or content_hash(categories)
+        self.word_to_category = word_to_category if word_to_category is not None else compile_matcher(categories)
+
+    @classmethod
+    def from_categories(cls, categories, source=None):
+        """从内存中的词典创建(会进行校验和规范化)"""
+        normalized, issues = validate_categories(categories)
+        return cls(normalized, issues, source=source)
+
+    @property
+    def collisions(self):
+        """跨类别冲突的词"""
+        return [issue for issue in self.issues if issue['type'] == 'collision']
+
+    def report(self):
+        """打印校验发现的问题"""
+        if not self.issues:
+            return
+        counts = {}
+        for issue in self.issues:
+            counts[issue['type']] = counts.get(issue['type'], 0) + 1
+        print(f"分类词典校验发现问题: {', '.join(f'{k}: {v}' for k, v in counts.items())}")
+        for issue in self.collisions:
+            print(f"  冲突: '{issue['word']}' 同时属于 {' 和 '.join(issue['categories'])}，按 {issue['winner']} 分类")
+
+    def to_dataframe(self):
+        """转换为每个类别一列的DataFrame(与词典Excel文件格式一致)"""
+        max_len = max((len(words) for words in self.categories.values()), default=0)
+        return pd.DataFrame({
+            category: words + [''] * (max_len - len(words))
+            for category, words in self.categories.items()
+        })
+
+    def save(self, output_file):
+        """保存为Excel文件，并写入元数据和编译缓存"""
+        self.to_dataframe().to_excel(output_file, index=False)
+        previous = _read_json(metadata_file(output_file)) or {}
+        if previous.get('content_hash') == self.content_hash:
+            # 内容未变化(如合并了空的差异)时保留原版本号
+            self.version = previous.get('version', self.version)
+        elif previous.get('content_hash') is not None:
+            self.version = previous.get('version', 0) + 1
+        self.source = output_file
+        self._write_sidecars(output_file)
+        return output_file
+
+    def _write_sidecars(self, dictionary_file):
+        """写入元数据和编译缓存；词典所在目录不可写时跳过(下次加载时重新解析Excel)"""
+        try:
+            self._write_metadata(dictionary_file)
+            self._write_cache(dictionary_file)
+        except OSError as e:
+            print(f"无法写入分类词典的元数据或缓存，跳过: {e}")
+
+    def _write_metadata(self, dictionary_file):
+        """写入元数据文件"""
+        _write_json(metadata_file(dictionary_file), {
+            'content_hash': self.content_hash,
+            'version': self.version,
+            'file': _file_state(dictionary_file),
+            'updated': datetime.now().isoformat(timespec='seconds'),
+            'issues': self.issues
+        })
+
+    def _write_cache(self, dictionary_file):
+        """把编译结果按内容哈希缓存到词典文件旁的缓存目录"""
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(dictionary_file)), CACHE_DIR_NAME)
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_json(os.path.join(cache_dir, f"{self.content_hash}.json"), {
+            'format': CACHE_FORMAT,
+            'categories': self.categories,
+            'word_to_category': self.word_to_category,
+            'issues': self.issues
+        })
+
+    @classmethod
+    def _from_cache(cls, dictionary_file, metadata):
+        """文件未变化时直接从编译缓存加载，不解析Excel"""
+        digest = metadata.get('content_hash')
+        cache_file = os.path.join(os.path.dirname(os.path.abspath(dictionary_file)), CACHE_DIR_NAME, f"{digest}.json")
+        cached = _read_json(cache_file)
+        if not cached or cached.get('format') != CACHE_FORMAT:
+            return None
+        return cls(cached['categories'], cached['issues'], metadata.get('version', 1), dictionary_file,
+                   cached['word_to_category'], digest)
+
+    @classmethod
+    def load(cls, dictionary_file):
+        """加载词典文件: 文件状态与元数据一致时使用编译缓存，否则解析Excel并在内容变化时递增版本号"""
+        metadata = _read_json(metadata_file(dictionary_file)) or {}
+        state = _file_state(dictionary_file)
+        if metadata.get('file') == state:
+            dictionary = cls._from_cache(dictionary_file, metadata)
+            if dictionary is not None:
+                return dictionary
+
+        categories_df = pd.read_excel(dictionary_file)
+        categories = {
+            str(column): [str(word) for word in categories_df[column].dropna().tolist()]
+            for column in categories_df.columns
+        }
+        dictionary = cls.from_categories(categories, source=dictionary_file)
+
+        version = metadata.get('version', 0)
+        dictionary.version = version if metadata.get('content_hash') == dictionary.content_hash else version + 1
+        dictionary._write_sidecars(dictionary_file)
+        return dictionary
+
+class CategoryDictionaryStore:
+    """长时间运行的进程中使用的词典: 定期检查文件状态，变化时热加载"""
+
+    def __init__(self, dictionary_file, check_interval=1.0):
+        self.dictionary_file = dictionary_file
+        self.check_interval = check_interval
+        self.dictionary = CategoryDictionary.load(dictionary_file)
+        self._state = _file_state(dictionary_file)
+        self._last_check = time.monotonic()
+
+    def reload_if_changed(self, force=False):
+        """文件修改时间或大小变化时重新加载，只有内容哈希变化才返回True"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        try:
+            state = _file_state(self.dictionary_file)
+        except OSError:
+            return False
+        if state == self._state and not force:
+            return False
+
+        self._state = state
+        dictionary = CategoryDictionary.load(self.dictionary_file)
+        if dictionary.content_hash == self.dictionary.content_hash:
+            return False
+
+        print(f"分类词典已更新: 版本 {self.dictionary.version} -> {dictionary.version}")
+        dictionary.report()
+        self.dictionary = dictionary
+        return True
+
+    def get(self):
+        """返回当前词典(必要时先热加载)"""
+        self.reload_if_changed()
+        return self.dictionary
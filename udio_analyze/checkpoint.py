@@ -0,0 +1,148 @@
+import os
+import json
+import shutil
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+import profiler
+
+# 分块检查点目录(位于输出目录中)，阶段完成后删除
+CHECKPOINT_DIR = '.checkpoints'
+
+# 分块阶段每块的行数
+DEFAULT_CHUNK_ROWS = 100000
+
+def file_hash(path, block_size=1 << 20):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _snapshot(output_dir):
+    """输出目录中文件的 (修改时间, 大小)，跳过隐藏目录、profile目录和运行清单"""
+    files = {}
+    for root, dirs, names in os.walk(output_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != 'profile']
+        for name in names:
+            if name.startswith(profiler.MANIFEST_FILE):
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files[os.path.relpath(path, output_dir)] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+class StageTracker:
+    """在运行清单中记录每个阶段的完成标记和输出文件哈希
+
+    resume=True时已完成且输出文件未被修改的阶段直接跳过；从第一个需要重新执行的阶段起，
+    之后的阶段全部重新执行(它们的输入可能已经改变)。
+    """
+
+    def __init__(self, output_dir, resume=False):
+        self.output_dir = output_dir
+        self.resume = resume
+        self._snapshots = {}
+
+    def _stages(self):
+        return profiler.load_run_manifest(self.output_dir).get('stages', {})
+
+    def _update(self, name, record):
+        stages = self._stages()
+        stages[name] = record
+        profiler.update_run_manifest(self.output_dir, {'stages': stages})
+
+    def completed(self, name):
+        """阶段已完成时返回它记录的结果(字典)，否则返回None"""
+        if not self.resume:
+            return None
+
+        record = self._stages().get(name)
+        if record is None or record.get('status') != 'completed':
+            self.resume = False
+            return None
+
+        for relative_path, expected in record.get('outputs', {}).items():
+            path = os.path.join(self.output_dir, relative_path)
+            if not os.path.exists(path) or file_hash(path) != expected:
+                print(f"阶段 {name} 的输出文件 {relative_path} 已改变或缺失，从该阶段重新执行")
+                self.resume = False
+                return None
+
+        print(f"从检查点恢复: 阶段 {name} 已完成 ({record.get('completed_at')})，跳过")
+        return record.get('result') or {}
+
+    def begin(self, name):
+        """开始执行阶段: 记录输出目录快照并标记为running"""
+        self._snapshots[name] = _snapshot(self.output_dir)
+        self._update(name, {'status': 'running', 'started_at': datetime.now().isoformat(timespec='seconds')})
+
+    def complete(self, name, result=None):
+        """阶段完成: 记录本阶段新建或修改的文件及其哈希，并删除该阶段的分块检查点"""
+        before = self._snapshots.pop(name, {})
+        outputs = {
+            relative_path: file_hash(os.path.join(self.output_dir, relative_path))
+            for relative_path, stat in _snapshot(self.output_dir).items()
+            if before.get(relative_path) != stat
+        }
+        self._update(name, {
+            'status': 'completed',
+            'completed_at': datetime.now().isoformat(timespec='seconds'),
+            'outputs': outputs,
+            'result': result or {}
+        })
+        shutil.rmtree(self.chunk_dir(name), ignore_errors=True)
+
+    def fail(self, name, error=None):
+        """阶段失败: 保留分块检查点，--resume时从这里继续"""
+        self._snapshots.pop(name, None)
+        self._update(name, {'status': 'failed', 'failed_at': datetime.now().isoformat(timespec='seconds'),
+                            'error': str(error) if error is not None else None})
+
+    def chunk_dir(self, name):
+        """阶段的分块检查点目录"""
+        return os.path.join(self.output_dir, CHECKPOINT_DIR, name)
+
+def process_in_chunks(df, func, chunk_dir=None, chunk_rows=DEFAULT_CHUNK_ROWS, key=None):
+    """按行分块执行 func(块) -> 与块行索引相同的DataFrame，结果按列拼接返回
+
+    指定chunk_dir时每完成一块就保存下来，再次运行时跳过已完成的块；key(如输入文件哈希)
+    或行数、块大小与之前不同时丢弃旧的分块结果。
+    """
+    if chunk_dir is None:
+        return func(df)
+
+    os.makedirs(chunk_dir, exist_ok=True)
+    meta_file = os.path.join(chunk_dir, 'chunks.json')
+    meta = {'rows': len(df), 'chunk_rows': chunk_rows, 'key': key}
+    previous = None
+    if os.path.exists(meta_file):
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    if previous != meta:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        os.makedirs(chunk_dir, exist_ok=True)
+        with open(meta_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    n_chunks = max(1, -(-len(df) // chunk_rows))
+    results = []
+    for i in range(n_chunks):
+        chunk_file = os.path.join(chunk_dir, f'chunk_{i:05d}.pkl')
+        if os.path.exists(chunk_file):
+            results.append(pd.read_pickle(chunk_file))
+            print(f"  第 {i + 1}/{n_chunks} 块已完成，从检查点读取")
+            continue
+
+        result = func(df.iloc[i * chunk_rows:(i + 1) * chunk_rows])
+        # 先写临时文件再替换，中断时不会留下不完整的块
+        result.to_pickle(chunk_file + '.tmp')
+        os.replace(chunk_file + '.tmp', chunk_file)
+        results.append(result)
+        if n_chunks > 1:
+            print(f"  第 {i + 1}/{n_chunks} 块完成")
+
+    return pd.concat(results)
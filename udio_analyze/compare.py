@@ -0,0 +1,271 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import corpus_merge
+import data_io
+import frequency_engine
+import profiler
+import segment_analyzer
+import tokenizer
+import word_frequency_analyzer
+import writers
+
+# 两侧输入合并后的语料文件名(无扩展名，格式见 data_io.write_corpus)和标记每行所属一侧的列
+COMPARE_CORPUS_NAME = 'compare_corpus'
+SIDE_COLUMN = 'compare_side'
+DEFAULT_LABELS = ('A', 'B')
+
+# 比较的列: 与词频分析相同
+COMPARE_COLUMNS = list(word_frequency_analyzer.FREQUENCY_OUTPUTS)
+
+# 对数优势比的Dirichlet先验: 每个词的先验计数 = PRIOR_SCALE x 两侧合并的频次
+# (先验总量为合并词数的PRIOR_SCALE倍)，低频词的差异被收缩，高频词基本不受影响。
+# 先验越大对数优势比的上限越小: 只出现在一侧的词约为 log(1 + 1/PRIOR_SCALE)
+PRIOR_SCALE = 0.1
+
+# 95%置信区间的正态分位数
+Z_95 = 1.959964
+
+def side_labels(sides):
+    """两侧的名称: 每侧为单个文件且文件名不同时用文件名，否则为 A/B"""
+    names = []
+    for inputs in sides:
+        files = corpus_merge.expand_inputs(inputs)
+        names.append(os.path.splitext(os.path.basename(files[0]))[0] if len(files) == 1 else None)
+    if None in names or names[0] == names[1]:
+        return DEFAULT_LABELS
+    return tuple(names)
+
+def split_labels(split):
+    """按时间切分时两侧的名称"""
+    return (f"<{split}", f">={split}")
+
+def tag_union(sides, output_file=None, labels=None):
+    """读取两侧的输入(各自可以是多个块文件，侧内按song_path去重)，添加compare_side列后合并为一个语料
+
+    两侧之间不去重: 同一首歌在两周的抓取中都出现时两侧都计入。返回(合并后的数据, 实际写入的文件)。
+    """
+    labels = tuple(labels) if labels else side_labels(sides)
+    print(f"正在合并比较的两侧: {labels[0]} / {labels[1]}")
+
+    try:
+        frames = []
+        for label, inputs in zip(labels, sides):
+            if corpus_merge.needs_merge(inputs):
+                df, _, _ = corpus_merge.merge_blocks(corpus_merge.expand_inputs(inputs))
+                if df is None:
+                    return None, None
+            else:
+                with profiler.span('read_data') as span:
+                    df = data_io.read_data(inputs)
+                    span['rows'] = len(df)
+            print(f"  {label}: {len(df)} 行")
+            frames.append(df.assign(**{SIDE_COLUMN: label}))
+
+        with profiler.span('concat') as span:
+            union = pd.concat(frames, ignore_index=True)
+            union[SIDE_COLUMN] = pd.Categorical(union[SIDE_COLUMN], categories=list(labels))
+            span['rows'] = len(union)
+
+        if output_file is not None:
+            with profiler.span('write_corpus', rows=len(union)):
+                output_file = data_io.write_corpus(union, output_file)
+            print(f"合并后的语料已保存到: {output_file}")
+        return union, output_file
+
+    except Exception as e:
+        print(f"合并比较的两侧时出错: {e}")
+        return None, None
+
+def side_codes(df, labels=None, split=None):
+    """每行属于哪一侧，返回(侧编号数组(0/1，无法判断为-1), 两侧名称)
+
+    指定split时按time列切分为两个时间窗口(早于split的为第一侧)，否则使用compare_side列，
+    labels给出两侧的顺序(未指定时按首次出现的顺序)。
+    """
+    if split is not None:
+        times = pd.to_datetime(df['time'], errors='coerce', utc=True)
+        boundary = pd.Timestamp(split)
+        boundary = boundary.tz_localize('UTC') if boundary.tz is None else boundary.tz_convert('UTC')
+        codes = np.where(times.isna(), -1, (times >= boundary).astype(np.int64))
+        return codes.astype(np.int64), np.asarray(labels or split_labels(split), dtype=object)
+
+    values = df[SIDE_COLUMN].astype(object)
+    if labels is None:
+        codes, labels = pd.factorize(values, sort=False)
+    else:
+        codes = pd.Categorical(values, categories=list(labels)).codes
+    if len(labels) != 2:
+        raise ValueError(f"{SIDE_COLUMN} 列应恰好包含两侧，实际为: {', '.join(map(str, labels))}")
+    return np.asarray(codes, dtype=np.int64), np.asarray(labels, dtype=object)
+
+class SideCounts:
+    """一列在两侧的词频: 2 x 词表大小的计数矩阵(有dedup_weight时为加权计数)和每侧的总词数"""
+
+    __slots__ = ('vocabulary', 'counts', 'totals')
+
+    def __init__(self, vocabulary, counts, totals):
+        self.vocabulary = vocabulary
+        self.counts = counts
+        self.totals = totals
+
+    def log_odds(self, prior_scale=PRIOR_SCALE):
+        """第二侧相对第一侧的对数优势比及z值(Monroe等的informative Dirichlet先验，先验取两侧合并的频次)"""
+        pooled = self.counts.sum(axis=0)
+        alpha = prior_scale * pooled
+        alpha_total = alpha.sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            numerator = self.counts + alpha
+            denominator = self.totals[:, None] + alpha_total - numerator
+            odds = np.log(numerator / denominator)
+            delta = odds[1] - odds[0]
+            z = delta / np.sqrt(1 / numerator[0] + 1 / numerator[1])
+        # 词表只有一个词时优势比无定义
+        return np.nan_to_num(delta), np.nan_to_num(z)
+
+    def compare(self, labels, top_n=30, prior_scale=PRIOR_SCALE):
+        """两侧各自最偏向的top_n个词(按z值)，返回按z值降序排列的表: 两侧频次、占比、占比差、对数优势比和z值"""
+        delta, z = self.log_odds(prior_scale)
+        order = np.argsort(-z, kind='stable')
+        leaning_second = order[:top_n][z[order[:top_n]] > 0]
+        leaning_first = order[::-1][:top_n][z[order[::-1][:top_n]] < 0]
+        index = np.concatenate([leaning_second, leaning_first[::-1]])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = np.nan_to_num(self.counts[:, index] / self.totals[:, None])
+        counts = self.counts[:, index]
+        if counts.dtype.kind == 'f':
+            counts = np.round(counts, 2)
+        first, second = labels
+        return pd.DataFrame({
+            'Word': self.vocabulary[index],
+            f'Frequency ({first})': counts[0],
+            f'Frequency ({second})': counts[1],
+            f'Share ({first})': np.round(shares[0], 4),
+            f'Share ({second})': np.round(shares[1], 4),
+            'Share Delta': np.round(shares[1] - shares[0], 4),
+            'Log-Odds': np.round(delta[index], 4),
+            'Z': np.round(z[index], 4),
+            'Leaning': np.where(z[index] > 0, second, first)
+        })
+
+def count_sides(df, column, codes, row_weights=None):
+    """一次遍历统计一列在两侧的词频: 侧编号 * 词表大小 + 词ID 用一次bincount计数"""
+    doc_index, words, vocabulary = frequency_engine.encode_tokens([tokenizer.split_words(text) for text in df[column]])
+    sides = codes[doc_index]
+    valid = sides >= 0
+    size = max(len(vocabulary), 1)
+    weights = row_weights[doc_index[valid]] if row_weights is not None else None
+    counts = np.bincount(sides[valid] * size + words[valid], weights=weights, minlength=2 * size)
+    counts = counts.reshape(2, size)[:, :len(vocabulary)]
+    return SideCounts(vocabulary, counts, counts.sum(axis=1))
+
+def consistency_shifts(scores, codes, labels):
+    """各类别一致性在两侧的均值、变化量及其95%置信区间(两样本均值差的正态近似)和z值"""
+    scores = scores.assign(side=codes[scores['row_id'].to_numpy()])
+    scores = scores[scores['side'] >= 0]
+    first, second = labels
+
+    rows = []
+    for category, group in scores.groupby('category', sort=True):
+        for metric, column in [('jaccard', 'jaccard_similarity'), ('overlap', 'overlap_coefficient')]:
+            stats = group.groupby('side')[column].agg(['mean', 'var', 'count']).reindex([0, 1])
+            mean, var, count = (stats[name].to_numpy(dtype=np.float64) for name in ['mean', 'var', 'count'])
+            count = np.nan_to_num(count)
+            shift = mean[1] - mean[0]
+            se = np.sqrt(np.sum(np.nan_to_num(var) / np.maximum(count, 1)))
+            rows.append({
+                'category': category, 'metric': metric,
+                f'mean ({first})': mean[0], f'mean ({second})': mean[1],
+                f'count ({first})': int(count[0]), f'count ({second})': int(count[1]),
+                'shift': shift,
+                'shift_ci_low': shift - Z_95 * se, 'shift_ci_high': shift + Z_95 * se,
+                'z': shift / se if se > 0 else np.nan
+            })
+    return pd.DataFrame(rows).round(4)
+
+def compare_frame(df, labels=None, split=None, top_n=30, prior_scale=PRIOR_SCALE):
+    """比较两侧的词频和一致性，返回 {表名: DataFrame}: summary、consistency和每列一个词频比较表"""
+    codes, labels = side_codes(df, labels, split)
+    row_weights = df['dedup_weight'].to_numpy(dtype=np.float64) if 'dedup_weight' in df.columns else None
+    rows = np.bincount(codes[codes >= 0], minlength=2)
+    print(f"{labels[0]}: {rows[0]} 行，{labels[1]}: {rows[1]} 行")
+    if rows.min() == 0:
+        raise ValueError("比较的一侧没有数据")
+
+    summary = pd.DataFrame({'Side': labels, 'Rows': rows})
+    sheets = {'summary': summary}
+
+    with profiler.span('consistency_shifts', rows=len(df)):
+        scores = segment_analyzer.row_consistency(df)
+        if scores is not None:
+            sheets['consistency'] = consistency_shifts(scores, codes, labels)
+
+    with profiler.span('side_counting', rows=len(df)):
+        for column in COMPARE_COLUMNS:
+            if column not in df.columns:
+                continue
+            side_counts = count_sides(df, column, codes, row_weights)
+            summary[f'{column}_tokens'] = np.round(side_counts.totals, 2)
+            sheets[column] = side_counts.compare(labels, top_n, prior_scale)
+
+    return sheets
+
+def analyze_comparison(input_file, output_dir=None, labels=None, split=None, top_n=30, prior_scale=PRIOR_SCALE):
+    """比较两个语料(compare_side列)或两个时间窗口(split)的词频和一致性，结果保存为 comparison 文件"""
+
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
+
+    try:
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='compare').reset_index(drop=True)
+            span['rows'] = len(df)
+
+        if output_dir is None:
+            output_dir = os.path.dirname(input_file)
+            if not output_dir:
+                output_dir = '.'
+
+        # 确保输出目录存在
+        os.makedirs(output_dir, exist_ok=True)
+
+        sheets = compare_frame(df, labels, split, top_n, prior_scale)
+
+        if 'consistency' in sheets:
+            print("\n一致性变化:")
+            for row in sheets['consistency'].itertuples(index=False):
+                print(f"  {row.category:<10} {row.metric:<8} {row.shift:+.4f} "
+                      f"[{row.shift_ci_low:+.4f}, {row.shift_ci_high:+.4f}]")
+
+        with profiler.span('write_output'):
+            output_file = writers.save_sheets(sheets, os.path.join(output_dir, 'comparison.xlsx'))
+        print(f"比较结果已保存到: {output_file}")
+
+        return sheets
+
+    except Exception as e:
+        print(f"比较分析过程中出错: {e}")
+        return None
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='比较两个语料或两个时间窗口的词频(对数优势比)和一致性')
+    parser.add_argument('input_file', help=f'分类后的数据文件 (包含{SIDE_COLUMN}列，或配合--split使用time列)')
+    parser.add_argument('-o', '--output', dest='output_dir', help='输出目录 (默认: 输入文件所在目录)')
+    parser.add_argument('--split', help='按time列在该时间点切分为两个时间窗口，如 2024-06-01')
+    parser.add_argument('--labels', nargs=2, help='两侧的名称 (使用compare_side列时也决定两侧的顺序)')
+    parser.add_argument('--top', type=int, default=30, help='每列每侧输出的偏向词数量 (默认: 30)')
+    parser.add_argument('--prior', type=float, default=PRIOR_SCALE,
+                        help=f'Dirichlet先验相对两侧合并频次的倍数，越大低频词的差异收缩越多 (默认: {PRIOR_SCALE})')
+    parser.add_argument('--format', dest='output_format', choices=list(writers.FORMATS), default=writers.DEFAULT_FORMAT,
+                        help='输出格式 (默认: xlsx)')
+    args = parser.parse_args()
+
+    writers.set_format(args.output_format)
+    analyze_comparison(args.input_file, args.output_dir, args.labels, args.split, args.top, args.prior)
+
+if __name__ == "__main__":
+    main()
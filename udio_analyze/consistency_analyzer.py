@@ -3,19 +3,86 @@ import matplotlib.pyplot as plt
 import os
 import numpy as np
 
-def analyze_tag_prompt_consistency(df, output_dir=None):
-    """分析标签和提示词之间的一致性"""
-    
-    print("开始分析标签和提示词的一致性...")
-    
-    if output_dir is None:
-        output_dir = '.'
-    
-    # 确保输出目录存在
-    os.makedirs(output_dir, exist_ok=True)
+import bootstrap
+import data_io
+import profiler
+import results
+import writers
+
+def _word_table(series):
+    """把', '连接的分类词列拆分为去重的 (row_id, word) 长表，非字符串和空值被丢弃"""
+    # 整列为空时读取为float列，.str 无法使用
+    series = series.where(series.map(lambda value: isinstance(value, str)))
+    if series.isna().all():
+        return pd.DataFrame({'row_id': pd.Series(dtype=series.index.dtype), 'word': pd.Series(dtype=object)})
+    words = series.str.replace(',', ' ', regex=False).str.lower().str.split().explode().dropna()
+    words = words[words != '']
+    return words.rename_axis('row_id').rename('word').reset_index().drop_duplicates()
+
+def consistency_metrics(common_count, prompt_count, tag_count):
+    """由交集大小和两侧的词数计算Jaccard相似度(交集/并集)和重叠系数(交集/较小集合)，可为标量或数组，两侧均不为空
+
+    批量分析(score_category)和在线评分(consistency_scorer)都使用这一个函数。
+    """
+    return common_count / (prompt_count + tag_count - common_count), common_count / np.minimum(prompt_count, tag_count)
+
+def score_category(df, prompt_col, tag_col):
+    """对一个类别的所有行计算一致性，按列整体计算(不逐行遍历)，两侧任一为空的行不计入"""
+    prompt_table = _word_table(df[prompt_col])
+    tag_table = _word_table(df[tag_col])
+
+    prompt_count = prompt_table.groupby('row_id').size()
+    tag_count = tag_table.groupby('row_id').size()
+    # 保持原数据的行顺序
+    row_ids = df.index[df.index.isin(prompt_count.index) & df.index.isin(tag_count.index)]
+    if len(row_ids) == 0:
+        return None
+
+    common_table = prompt_table.merge(tag_table, on=['row_id', 'word'])
+    common_count = common_table.groupby('row_id').size().reindex(row_ids, fill_value=0)
+    prompt_count = prompt_count.reindex(row_ids)
+    tag_count = tag_count.reindex(row_ids)
+
+    def _joined(table):
+        # 同一行的词在长表中是连续的，按行边界切片拼接，比 groupby().agg(', '.join) 快得多
+        if table.empty:
+            return pd.Series('', index=row_ids)
+        table_rows = table['row_id'].to_numpy()
+        words = table['word'].tolist()
+        starts = np.flatnonzero(np.r_[True, table_rows[1:] != table_rows[:-1]])
+        ends = np.r_[starts[1:], len(words)]
+        joined = pd.Series([', '.join(words[start:end]) for start, end in zip(starts, ends)], index=table_rows[starts])
+        return joined.reindex(row_ids, fill_value='')
+
+    jaccard, overlap = consistency_metrics(common_count, prompt_count, tag_count)
+    return pd.DataFrame({
+        'row_id': row_ids,
+        'prompt_words': _joined(prompt_table).values,
+        'tag_words': _joined(tag_table).values,
+        'common_words': _joined(common_table).values,
+        'prompt_count': prompt_count.values,
+        'tag_count': tag_count.values,
+        'common_count': common_count.values,
+        'jaccard_similarity': jaccard.values,
+        'overlap_coefficient': overlap.values
+    })
+
+def summarize_consistency(consistency_df):
+    """计算每个类别的平均一致性(均值、中位数、标准差和行数)"""
+    category_consistency = consistency_df.groupby('category').agg({
+        'jaccard_similarity': ['mean', 'median', 'std'],
+        'overlap_coefficient': ['mean', 'median', 'std'],
+        'row_id': 'count'
+    }).reset_index()
     
-    # 准备分析数据
-    consistency_data = []
+    # 重命名列
+    category_consistency.columns = ['category', 'jaccard_mean', 'jaccard_median', 'jaccard_std', 
+                                   'overlap_mean', 'overlap_median', 'overlap_std', 'count']
+    return category_consistency
+
+def consistency_results(df):
+    """对每个类别计算每行的一致性，返回 {类别: results.ConsistencyResult}(缺少列或没有可比较行的类别不包含在内)"""
+    consistency = {}
     
     # 对每个类别计算一致性
     for category in ['genres', 'emotions', 'narrative']:
@@ -29,112 +96,114 @@ def analyze_tag_prompt_consistency(df, output_dir=None):
         
         print(f"正在分析 {category} 类别的一致性...")
         
-        for i, row in df.iterrows():
-            if isinstance(row[prompt_col], str) and isinstance(row[tag_col], str):
-                # 分割词汇，并过滤掉空字符串
-                prompt_words = set([w for w in row[prompt_col].lower().split(', ') if w.strip()])
-                tag_words = set([w for w in row[tag_col].lower().split(', ') if w.strip()])
-                
-                if not prompt_words or not tag_words:
-                    continue
-                
-                # 计算交集
-                common_words = prompt_words.intersection(tag_words)
-                
-                # 计算Jaccard相似度 (交集/并集)
-                union_words = prompt_words.union(tag_words)
-                jaccard = len(common_words) / len(union_words) if union_words else 0
-                
-                # 计算重叠系数 (交集/较小集合)
-                overlap = len(common_words) / min(len(prompt_words), len(tag_words)) if min(len(prompt_words), len(tag_words)) > 0 else 0
-                
-                # 记录数据
-                consistency_data.append({
-                    'row_id': i,
-                    'category': category,
-                    'prompt_words': ', '.join(prompt_words),
-                    'tag_words': ', '.join(tag_words),
-                    'common_words': ', '.join(common_words),
-                    'prompt_count': len(prompt_words),
-                    'tag_count': len(tag_words),
-                    'common_count': len(common_words),
-                    'jaccard_similarity': jaccard,
-                    'overlap_coefficient': overlap
-                })
-    
-    if not consistency_data:
+        with profiler.span(f'consistency_scoring[{category}]', rows=len(df)):
+            scores = score_category(df, prompt_col, tag_col)
+            if scores is not None:
+                consistency[category] = results.ConsistencyResult.from_scores(category, scores)
+    
+    return consistency
+
+def analyze_tag_prompt_consistency(df, output_dir=None, bootstrap_resamples=0, seed=None, workers=None):
+    """分析标签和提示词之间的一致性，bootstrap_resamples>0时用自助法计算置信区间
+
+    返回 {类别: results.ConsistencyResult}，没有可以分析的数据时返回None。
+    """
+    
+    print("开始分析标签和提示词的一致性...")
+    
+    if output_dir is None:
+        output_dir = '.'
+    
+    # 确保输出目录存在
+    os.makedirs(output_dir, exist_ok=True)
+    
+    consistency = consistency_results(df)
+    if not consistency:
         print("没有找到可以分析的数据")
-        return None, None
+        return None
     
     # 创建DataFrame
-    consistency_df = pd.DataFrame(consistency_data)
+    consistency_df = results.AnalysisResults(consistency=consistency).consistency_details()
     
     # 计算每个类别的平均一致性
-    category_consistency = consistency_df.groupby('category').agg({
-        'jaccard_similarity': ['mean', 'median', 'std'],
-        'overlap_coefficient': ['mean', 'median', 'std'],
-        'row_id': 'count'
-    }).reset_index()
-    
-    # 重命名列
-    category_consistency.columns = ['category', 'jaccard_mean', 'jaccard_median', 'jaccard_std', 
-                                   'overlap_mean', 'overlap_median', 'overlap_std', 'count']
+    category_consistency = summarize_consistency(consistency_df)
     
     # 保存结果
     details_file = os.path.join(output_dir, 'tag_prompt_consistency_details.xlsx')
     summary_file = os.path.join(output_dir, 'tag_prompt_consistency_summary.xlsx')
     
-    consistency_df.to_excel(details_file, index=False)
-    category_consistency.to_excel(summary_file, index=False)
+    with profiler.span('write_output', rows=len(consistency_df)):
+        details_file = writers.save(consistency_df, details_file)
+        summary_file = writers.save(category_consistency, summary_file)
     
     print(f"一致性详细数据已保存到: {details_file}")
     print(f"一致性摘要数据已保存到: {summary_file}")
     
+    # 自助法置信区间
+    if bootstrap_resamples > 0:
+        print(f"正在进行 {bootstrap_resamples} 次自助法重采样...")
+        with profiler.span('bootstrap', rows=len(consistency_df)):
+            intervals_df, differences_df = bootstrap.bootstrap_consistency(
+                consistency_df, n_resamples=bootstrap_resamples, seed=seed, workers=workers
+            )
+        
+        bootstrap_file = writers.save_sheets(
+            {'intervals': intervals_df, 'differences': differences_df},
+            os.path.join(output_dir, 'tag_prompt_consistency_bootstrap.xlsx')
+        )
+        print(f"一致性置信区间已保存到: {bootstrap_file}")
+    
     # 创建一致性分布直方图
     try:
-        plt.figure(figsize=(10, 6))
-        for category in consistency_df['category'].unique():
-            subset = consistency_df[consistency_df['category'] == category]
-            plt.hist(subset['jaccard_similarity'], alpha=0.5, label=category, bins=20)
-        
-        plt.xlabel('Jaccard Similarity')
-        plt.ylabel('Frequency')
-        plt.title('Tag-Prompt Consistency Distribution')
-        plt.legend()
-        plt.tight_layout()
-        
-        chart_file = os.path.join(output_dir, 'tag_prompt_consistency.png')
-        plt.savefig(chart_file)
-        print(f"一致性分布图表已保存到: {chart_file}")
-        plt.close()
-        
-        # 创建箱线图
-        plt.figure(figsize=(10, 6))
-        data_to_plot = [consistency_df[consistency_df['category'] == cat]['jaccard_similarity'] 
-                        for cat in consistency_df['category'].unique()]
-        plt.boxplot(data_to_plot, labels=consistency_df['category'].unique())
-        plt.ylabel('Jaccard Similarity')
-        plt.title('Tag-Prompt Consistency by Category')
-        plt.grid(True, linestyle='--', alpha=0.7)
-        
-        boxplot_file = os.path.join(output_dir, 'tag_prompt_consistency_boxplot.png')
-        plt.savefig(boxplot_file)
-        print(f"一致性箱线图已保存到: {boxplot_file}")
-        plt.close()
-        
+        with profiler.span('chart'):
+            plt.figure(figsize=(10, 6))
+            for category in consistency_df['category'].unique():
+                subset = consistency_df[consistency_df['category'] == category]
+                plt.hist(subset['jaccard_similarity'], alpha=0.5, label=category, bins=20)
+            
+            plt.xlabel('Jaccard Similarity')
+            plt.ylabel('Frequency')
+            plt.title('Tag-Prompt Consistency Distribution')
+            plt.legend()
+            plt.tight_layout()
+            
+            chart_file = os.path.join(output_dir, 'tag_prompt_consistency.png')
+            plt.savefig(chart_file)
+            print(f"一致性分布图表已保存到: {chart_file}")
+            plt.close()
+            
+            # 创建箱线图
+            plt.figure(figsize=(10, 6))
+            data_to_plot = [consistency_df[consistency_df['category'] == cat]['jaccard_similarity'] 
+                            for cat in consistency_df['category'].unique()]
+            plt.boxplot(data_to_plot, labels=consistency_df['category'].unique())
+            plt.ylabel('Jaccard Similarity')
+            plt.title('Tag-Prompt Consistency by Category')
+            plt.grid(True, linestyle='--', alpha=0.7)
+            
+            boxplot_file = os.path.join(output_dir, 'tag_prompt_consistency_boxplot.png')
+            plt.savefig(boxplot_file)
+            print(f"一致性箱线图已保存到: {boxplot_file}")
+            plt.close()
+            
     except Exception as e:
         print(f"创建图表时出错: {e}")
     
-    return consistency_df, category_consistency
+    return consistency
+
+def analyze_consistency(input_file, output_dir=None, bootstrap_resamples=0, seed=None, workers=None):
+    """执行一致性分析，bootstrap_resamples为自助法重采样次数(0表示不计算置信区间)
 
-def analyze_consistency(input_file, output_dir=None):
-    """执行一致性分析"""
+    返回包含各类别一致性的 results.AnalysisResults，出错时返回False。
+    """
     
-    print(f"正在读取文件: {input_file}")
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
     
     try:
         # 读取Excel文件
-        df = pd.read_excel(input_file)
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='consistency')
+            span['rows'] = len(df)
         
         if output_dir is None:
             output_dir = os.path.dirname(input_file)
@@ -145,15 +214,17 @@ def analyze_consistency(input_file, output_dir=None):
         os.makedirs(output_dir, exist_ok=True)
         
         # 执行一致性分析
-        consistency_details, consistency_summary = analyze_tag_prompt_consistency(df, output_dir)
+        analysis_results = results.AnalysisResults(
+            consistency=analyze_tag_prompt_consistency(df, output_dir, bootstrap_resamples, seed, workers)
+        )
         
-        if consistency_summary is not None:
+        if analysis_results.consistency:
             print("\n=== 一致性分析摘要 ===")
-            print(consistency_summary)
+            print(analysis_results.consistency_summary())
         
         print("\n一致性分析完成！")
         
-        return True
+        return analysis_results
     
     except Exception as e:
         print(f"一致性分析过程中出错: {e}")
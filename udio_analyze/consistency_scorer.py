@@ -0,0 +1,332 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import contextlib
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import category_dictionary
+import consistency_analyzer
+import data_categorizer
+import data_cleaner
+import language_id
+import schema
+
+def set_consistency(prompt_words, tag_words):
+    """计算两个非空词集合的交集、Jaccard相似度和重叠系数(公式见 consistency_analyzer.consistency_metrics)"""
+    common_words = prompt_words & tag_words
+    jaccard, overlap = consistency_analyzer.consistency_metrics(len(common_words), len(prompt_words), len(tag_words))
+    return common_words, float(jaccard), float(overlap)
+
+class ConsistencyScorer:
+    """标签-提示词一致性评分器，分类词典只加载一次，可重复对批量数据评分"""
+
+    def __init__(self, categories=None, store=None, language_filter=None):
+        self._store = store
+        # 与批量分析的清洗步骤相同: 默认按英语词表过滤，指定language_id.LanguageFilter时按语言过滤
+        self.language_filter = language_filter
+        self._reload_lock = threading.Lock()
+        if store is not None:
+            self._set_dictionary(store.dictionary.categories, store.dictionary.word_to_category)
+        else:
+            if categories is None:
+                categories = data_categorizer.DEFAULT_CATEGORIES
+            self._set_dictionary(categories)
+
+    def _set_dictionary(self, categories, word_to_category=None):
+        """设置分类词典及编译后的映射"""
+        if word_to_category is None:
+            word_to_category = data_categorizer.build_word_to_category(categories)
+
+        # 词典类别名 -> 结果类别名，只保留参与评分的类别
+        result_names = {
+            dict_name: name for name, dict_name in schema.CONSISTENCY_CATEGORIES.items()
+            if dict_name in categories
+        }
+        self.categories = categories
+        self.word_to_category = word_to_category
+        self._result_names = result_names
+
+    @classmethod
+    def from_file(cls, category_file, hot_reload=False, language_filter=None):
+        """从分类词典文件创建评分器；hot_reload为True时词典文件变化后自动重新加载"""
+        if hot_reload:
+            return cls(store=category_dictionary.CategoryDictionaryStore(category_file), language_filter=language_filter)
+        return cls(data_categorizer.load_category_dictionary(category_file), language_filter=language_filter)
+
+    @property
+    def dictionary_version(self):
+        """当前词典的版本号和内容哈希(未使用词典文件时为None)"""
+        if self._store is None:
+            return None
+        return {'version': self._store.dictionary.version, 'content_hash': self._store.dictionary.content_hash}
+
+    def refresh(self):
+        """检查词典文件是否变化，变化时热加载"""
+        if self._store is None:
+            return False
+        with self._reload_lock:
+            if not self._store.reload_if_changed():
+                return False
+            dictionary = self._store.dictionary
+            self._set_dictionary(dictionary.categories, dictionary.word_to_category)
+            return True
+
+    def _category_words(self, cleaned_text):
+        """把清洗后的文本按类别拆分为词集合(与分类步骤相同，使用 data_categorizer.categorize_words)"""
+        categorized = data_categorizer.categorize_words(cleaned_text, self.categories, self.word_to_category)
+        return {name: set(categorized.get(dict_name, ())) for dict_name, name in self._result_names.items()}
+
+    def clean(self, texts):
+        """与批量分析相同的清洗(data_cleaner.clean_texts)"""
+        return data_cleaner.clean_texts(texts, self.language_filter)
+
+    def score(self, prompt, tags):
+        """对单条(prompt, tags)评分，两侧任一为空的类别返回None"""
+        cleaned_prompt, cleaned_tags = self.clean([prompt, tags])
+        return self.score_cleaned(cleaned_prompt, cleaned_tags)
+
+    def score_cleaned(self, cleaned_prompt, cleaned_tags):
+        """对已清洗的(prompt, tags)评分"""
+        prompt_words = self._category_words(cleaned_prompt)
+        tag_words = self._category_words(cleaned_tags)
+
+        scores = {}
+        for name in self._result_names.values():
+            p_words = prompt_words[name]
+            t_words = tag_words[name]
+            if not p_words or not t_words:
+                scores[name] = None
+                continue
+
+            common_words, jaccard, overlap = set_consistency(p_words, t_words)
+            scores[name] = {
+                'prompt_count': len(p_words),
+                'tag_count': len(t_words),
+                'common_count': len(common_words),
+                'jaccard_similarity': jaccard,
+                'overlap_coefficient': overlap
+            }
+        return scores
+
+    def score_batch(self, pairs):
+        """对一批(prompt, tags)评分，返回与输入顺序一致的结果列表；整批文本一次清洗"""
+        self.refresh()
+        if not pairs:
+            return []
+        cleaned = self.clean([text for pair in pairs for text in pair])
+        score_cleaned = self.score_cleaned
+        return [score_cleaned(cleaned[i], cleaned[i + 1]) for i in range(0, len(cleaned), 2)]
+
+def _parse_items(payload):
+    """把请求内容解析为(prompt, tags)列表，返回(列表, 是否为批量请求)"""
+    if isinstance(payload, dict) and 'items' in payload:
+        payload = payload['items']
+
+    if isinstance(payload, list):
+        return [(item.get('prompt'), item.get('tags')) for item in payload], True
+    return [(payload.get('prompt'), payload.get('tags'))], False
+
+def _attach_ids(payload, results):
+    """把请求中的id字段带回结果中"""
+    items = payload.get('items', payload) if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        items = [items]
+    return [
+        {'id': item.get('id'), 'scores': scores} if 'id' in item else {'scores': scores}
+        for item, scores in zip(items, results)
+    ]
+
+def handle_request(scorer, payload):
+    """处理一条JSON请求，单条请求返回对象，批量请求返回列表"""
+    pairs, is_batch = _parse_items(payload)
+    results = _attach_ids(payload, scorer.score_batch(pairs))
+    return results if is_batch else results[0]
+
+def serve_jsonl(scorer, infile=None, outfile=None):
+    """stdin/stdout JSONL服务模式: 每行一个请求(对象或对象列表)，每行一个响应"""
+    infile = infile or sys.stdin
+    outfile = outfile or sys.stdout
+
+    for line in infile:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            response = handle_request(scorer, json.loads(line))
+        except Exception as e:
+            response = {'error': str(e)}
+        outfile.write(json.dumps(response, ensure_ascii=False) + '\n')
+        outfile.flush()
+
+def make_http_server(scorer, host='127.0.0.1', port=8765):
+    """创建HTTP服务: POST /score 评分，GET /health 健康检查"""
+
+    class ScoreHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send_json(200, {'status': 'ok', 'categories': list(scorer._result_names.values()),
+                                      'dictionary': scorer.dictionary_version})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/score':
+                self._send_json(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                self._send_json(200, handle_request(scorer, payload))
+            except Exception as e:
+                self._send_json(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            # 关闭逐请求日志，避免影响吞吐
+            pass
+
+    return ThreadingHTTPServer((host, port), ScoreHandler)
+
+def serve_http(scorer, host='127.0.0.1', port=8765):
+    """启动HTTP服务并一直运行"""
+    server = make_http_server(scorer, host, port)
+    print(f"一致性评分服务已启动: http://{host}:{server.server_address[1]}/score")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("一致性评分服务已停止")
+    finally:
+        server.server_close()
+
+def load_benchmark_pairs(input_file=None, n_items=20000, seed=42):
+    """准备基准测试数据: 优先从Excel读取prompt/tags，否则用分类词典合成"""
+    pairs = []
+    if input_file:
+        import pandas as pd
+        df = pd.read_excel(input_file, usecols=['prompt', 'tags'])
+        pairs = list(df.itertuples(index=False, name=None))
+
+    rng = random.Random(seed)
+    if not pairs:
+        vocabulary = [w for words in data_categorizer.DEFAULT_CATEGORIES.values() for w in words]
+        for _ in range(min(n_items, 5000)):
+            prompt = ', '.join(rng.sample(vocabulary, rng.randint(3, 12)))
+            tags = '&'.join(rng.sample(vocabulary, rng.randint(2, 8)))
+            pairs.append((prompt, tags))
+
+    # 循环填充到所需数量
+    return [pairs[i % len(pairs)] for i in range(n_items)]
+
+def _percentiles(values, points=(50, 95, 99)):
+    """计算延迟分位数(毫秒)"""
+    ordered = sorted(values)
+    return {
+        f'p{p}_ms': ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+        for p in points
+    }
+
+def benchmark(scorer, pairs, batch_size=100, http=True):
+    """基准测试: 进程内评分吞吐，以及通过本地HTTP服务的延迟/吞吐"""
+    results = {'items': len(pairs), 'batch_size': batch_size}
+    batches = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+
+    # 进程内评分
+    latencies = []
+    start_time = time.perf_counter()
+    for batch in batches:
+        batch_start = time.perf_counter()
+        scorer.score_batch(batch)
+        latencies.append(time.perf_counter() - batch_start)
+    elapsed = time.perf_counter() - start_time
+    results['in_process'] = {
+        'us_per_item': elapsed / len(pairs) * 1e6,
+        'items_per_sec': len(pairs) / elapsed,
+        **_percentiles(latencies)
+    }
+
+    # 通过HTTP服务(临时端口)评分
+    if http:
+        server = make_http_server(scorer, '127.0.0.1', 0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/score"
+
+        try:
+            latencies = []
+            start_time = time.perf_counter()
+            for batch in batches:
+                body = json.dumps({'items': [{'prompt': p, 'tags': t} for p, t in batch]}).encode('utf-8')
+                request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+                batch_start = time.perf_counter()
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                latencies.append(time.perf_counter() - batch_start)
+            elapsed = time.perf_counter() - start_time
+            results['http'] = {
+                'us_per_item': elapsed / len(pairs) * 1e6,
+                'items_per_sec': len(pairs) / elapsed,
+                **_percentiles(latencies)
+            }
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    return results
+
+def main():
+    """命令行入口: 服务模式或基准测试"""
+    parser = argparse.ArgumentParser(description='标签-提示词一致性评分服务')
+    parser.add_argument('--categories', dest='category_file',
+                        help='分类词典Excel文件，服务模式下文件修改后自动热加载 (默认: 使用内置分类词典)')
+    parser.add_argument('--serve', choices=['jsonl', 'http'],
+                        help='服务模式: jsonl (stdin/stdout) 或 http')
+    parser.add_argument('--host', default='127.0.0.1', help='HTTP服务地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='HTTP服务端口 (默认: 8765)')
+    parser.add_argument('--language-filter', action='store_true',
+                        help='按语言清洗(与 main.py --language-filter 相同)，批量分析使用该选项时评分服务也应使用')
+    parser.add_argument('--benchmark', action='store_true', help='运行延迟/吞吐基准测试')
+    parser.add_argument('--input', dest='input_file', help='基准测试使用的Excel文件 (需包含prompt和tags列)')
+    parser.add_argument('-n', '--items', type=int, default=20000, help='基准测试评分条数 (默认: 20000)')
+    parser.add_argument('--batch-size', type=int, default=100, help='基准测试每批条数 (默认: 100)')
+
+    args = parser.parse_args()
+
+    # 清洗使用的资源: JSONL模式的stdout是响应通道，提示信息输出到stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        language_filter = None
+        if args.language_filter:
+            language_filter = language_id.LanguageFilter.from_category_file(args.category_file)
+        else:
+            data_cleaner.download_nltk_resources()
+
+    if args.category_file:
+        # 服务模式下词典文件修改后自动热加载
+        scorer = ConsistencyScorer.from_file(args.category_file, hot_reload=args.serve is not None,
+                                             language_filter=language_filter)
+    else:
+        scorer = ConsistencyScorer(language_filter=language_filter)
+
+    if args.benchmark:
+        pairs = load_benchmark_pairs(args.input_file, args.items)
+        results = benchmark(scorer, pairs, args.batch_size)
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    elif args.serve == 'jsonl':
+        serve_jsonl(scorer)
+    elif args.serve == 'http':
+        serve_http(scorer, args.host, args.port)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
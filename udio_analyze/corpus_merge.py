@@ -0,0 +1,107 @@
+import os
+import glob
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import data_io
+import profiler
+
+# 抓取块文件支持的扩展名
+BLOCK_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.parquet', '.jsonl')
+
+# 合并后的语料文件名(无扩展名，格式见 data_io.write_corpus)
+MERGED_CORPUS_NAME = 'merged_corpus'
+
+def expand_inputs(inputs):
+    """把文件、通配符和目录展开为块文件列表(去重并保持顺序)，目录中的块文件按文件名排序"""
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(
+                os.path.join(item, name) for name in os.listdir(item)
+                if name.lower().endswith(BLOCK_EXTENSIONS) and not name.startswith('~$')
+            )
+        elif glob.has_magic(item):
+            matches = sorted(path for path in glob.glob(item)
+                             if path.lower().endswith(BLOCK_EXTENSIONS) and not os.path.basename(path).startswith('~$'))
+        else:
+            matches = [item]
+        for path in matches:
+            if path not in files:
+                files.append(path)
+    return files
+
+def needs_merge(inputs):
+    """输入不止一个文件，或包含目录/通配符时需要先合并"""
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    return len(inputs) > 1 or any(os.path.isdir(item) or glob.has_magic(item) for item in inputs)
+
+def merge_blocks(files, output_file=None, workers=8, key='song_path'):
+    """并发读取多个块文件，按key去重(保留最先出现的块中的记录)，添加source_block列后合并为一个语料文件"""
+    print(f"正在合并 {len(files)} 个块文件...")
+
+    try:
+        seen = set()
+        blocks = []
+        stats = []
+        with profiler.span('read_blocks', rows=len(files)), ThreadPoolExecutor(max_workers=workers) as executor:
+            # map按提交顺序返回结果，读取并发进行，去重按块的顺序流式进行，结果与线程数无关
+            for path, block in zip(files, executor.map(data_io.read_data, files)):
+                name = os.path.splitext(os.path.basename(path))[0]
+                n_rows = len(block)
+
+                if key in block.columns:
+                    values = block[key]
+                    # 块内重复和与之前块重复的记录都丢弃；key为空的记录无法判断，全部保留
+                    duplicated = values.duplicated() & values.notna()
+                    duplicated |= values.isin(seen)
+                    block = block[~duplicated]
+                    seen.update(block[key].dropna())
+
+                block = block.assign(source_block=name)
+                blocks.append(block)
+                stats.append({'source_block': name, 'file': path, 'rows': n_rows, 'kept': len(block)})
+                print(f"  {os.path.basename(path)}: {n_rows} 行，保留 {len(block)} 行")
+
+        with profiler.span('concat') as span:
+            merged = pd.concat(blocks, ignore_index=True)
+            merged['source_block'] = pd.Categorical(merged['source_block'], categories=[s['source_block'] for s in stats])
+            span['rows'] = len(merged)
+
+        total = sum(s['rows'] for s in stats)
+        print(f"合并完成: 共 {total} 行，去除 {total - len(merged)} 条重复记录，剩余 {len(merged)} 行")
+
+        if output_file is not None:
+            with profiler.span('write_corpus', rows=len(merged)):
+                output_file = data_io.write_corpus(merged, output_file)
+            print(f"合并后的语料已保存到: {output_file}")
+
+        return merged, output_file, pd.DataFrame(stats)
+
+    except Exception as e:
+        print(f"合并块文件时出错: {e}")
+        return None, None, None
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='合并抓取的块文件')
+    parser.add_argument('inputs', nargs='+', help='块文件、通配符(如 "blocks/第*块.xlsx")或目录')
+    parser.add_argument('-o', '--output', dest='output_file', default=MERGED_CORPUS_NAME,
+                        help=f'输出文件 (默认: {MERGED_CORPUS_NAME}.parquet，无parquet引擎时为xlsx)')
+    parser.add_argument('--workers', type=int, default=8, help='读取线程数 (默认: 8)')
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("没有找到块文件")
+        return
+    merge_blocks(files, args.output_file, args.workers)
+
+if __name__ == "__main__":
+    main()
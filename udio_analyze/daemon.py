@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+import socketserver
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 后台进程不需要图形界面
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import data_categorizer
+import data_cleaner
+import main as pipeline
+import profiler
+import shared_artifacts
+import tokenizer
+
+# 默认的任务输出根目录和Unix socket路径
+DEFAULT_JOBS_DIR = 'daemon_jobs'
+DEFAULT_SOCKET = '/tmp/udio_analyze.sock'
+DEFAULT_PORT = 8766
+
+# 每个任务的日志文件(位于任务输出目录中)
+JOB_LOG_FILE = 'job.log'
+
+# run_full_analysis 接受的任务参数
+JOB_OPTIONS = ('skip_steps', 'min_support', 'dedup_mode', 'build_index', 'bootstrap_resamples', 'seed',
+               'category_file', 'mine_vocabulary', 'output_format', 'heatmap_words', 'heatmap_metric',
+               'heatmap_cluster', 'ngram_max', 'segments', 'language_filter',
+               'sample', 'sample_method', 'compare', 'compare_labels', 'compare_split')
+
+def _warm_worker(category_file, shared_dir=None):
+    """工作进程初始化: 打开共享英语词表(内存映射，不随进程数增加常驻内存)，预先加载分类词典和分词器"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        if shared_dir is not None:
+            data_cleaner.use_shared_lexicon(shared_dir)
+        data_cleaner.load_english_words()
+        if category_file:
+            data_categorizer.load_dictionary(category_file)
+        tokenizer.tokenize_batch(['warm up'])
+
+def _write_shared_lexicon(jobs_dir):
+    """把NLTK英语词表写为任务根目录中的共享数组，返回目录；词表不可用时返回None(工作进程使用简单过滤)"""
+    english_words = data_cleaner.load_english_words.__wrapped__()
+    if english_words is None:
+        return None
+    shared_dir = shared_artifacts.artifact_dir(jobs_dir)
+    shared_artifacts.write_lexicon(shared_dir, english_words)
+    return shared_dir
+
+def _run_job(input_file, output_dir, options):
+    """在工作进程中执行一个分析任务，输出写入任务目录的日志，返回状态和各阶段耗时"""
+    os.makedirs(output_dir, exist_ok=True)
+    started_at = datetime.now()
+    start_time = time.perf_counter()
+    with open(os.path.join(output_dir, JOB_LOG_FILE), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            success = pipeline.run_full_analysis(input_file, output_dir, **options)
+            error = None
+        except Exception as e:
+            print(f"任务执行出错: {e}")
+            success, error = False, str(e)
+
+    manifest = profiler.load_run_manifest(output_dir)
+    return {
+        'success': bool(success),
+        'error': error,
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'run_seconds': round(time.perf_counter() - start_time, 3),
+        'stage_seconds': {span['name']: span['duration_s'] for span in manifest.get('spans', [])}
+    }
+
+class JobQueue:
+    """分析任务队列: 任务在有上限的常驻进程池中执行，记录每个任务的状态和耗时"""
+
+    def __init__(self, workers=2, jobs_dir=DEFAULT_JOBS_DIR, category_file=None):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+        # 未指定分类词典时所有任务共用一个默认词典，工作进程中只需加载一次
+        if category_file is None:
+            category_file = os.path.join(self.jobs_dir, 'word_categories.xlsx')
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+                data_categorizer.create_category_dictionary(category_file)
+        self.category_file = os.path.abspath(category_file)
+
+        # 英语词表在主进程中只写出一次，工作进程以内存映射方式共享
+        self.shared_dir = _write_shared_lexicon(self.jobs_dir)
+
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker,
+                                             initargs=(self.category_file, self.shared_dir))
+        self._jobs = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def submit(self, input_file, output_dir=None, **options):
+        """提交任务，返回任务信息；options为 run_full_analysis 的参数(见 JOB_OPTIONS)"""
+        unknown = set(options) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"不支持的任务参数: {', '.join(sorted(unknown))}")
+        options.setdefault('category_file', self.category_file)
+
+        inputs = input_file if isinstance(input_file, list) else [input_file]
+        missing = [path for path in inputs if not os.path.exists(path)]
+        if missing:
+            raise ValueError(f"输入文件不存在: {missing[0]}")
+
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            if output_dir is None:
+                output_dir = os.path.join(self.jobs_dir, f"job_{job_id:05d}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+            job = {
+                'id': job_id,
+                'status': 'queued',
+                'input_file': input_file,
+                'output_dir': os.path.abspath(output_dir),
+                'options': options,
+                'submitted_at': datetime.now().isoformat(timespec='seconds'),
+                '_submitted': time.perf_counter()
+            }
+            self._jobs[job_id] = job
+            future = self._executor.submit(_run_job, input_file, job['output_dir'], options)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f, job_id=job_id: self._finish(job_id, f))
+        return self.status(job_id)
+
+    def _finish(self, job_id, future):
+        """任务结束时记录结果和耗时"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+            job['total_seconds'] = round(time.perf_counter() - job['_submitted'], 3)
+            try:
+                result = future.result()
+                job.update(result)
+                job['status'] = 'completed' if result['success'] else 'failed'
+            except Exception as e:
+                # 工作进程异常退出(如内存不足被杀死)
+                job['status'] = 'failed'
+                job['error'] = str(e) or type(e).__name__
+
+    def status(self, job_id):
+        """返回任务状态，任务不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            info = {key: value for key, value in job.items() if not key.startswith('_')}
+            if info['status'] == 'queued' and self._futures[job_id].running():
+                info['status'] = 'running'
+            if 'total_seconds' in info:
+                info['queued_seconds'] = round(info['total_seconds'] - info.get('run_seconds', 0), 3)
+            return info
+
+    def list(self):
+        """返回全部任务的状态(按提交顺序)"""
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def shutdown(self, wait=True):
+        """关闭进程池"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+def handle_command(queue, payload):
+    """处理一个请求: {"action": "submit"|"status"|"list"|"health", ...}，HTTP和Unix socket共用"""
+    action = payload.get('action', 'submit')
+    if action == 'submit':
+        options = {key: value for key, value in payload.items()
+                   if key not in ('action', 'input_file', 'output_dir')}
+        return queue.submit(payload['input_file'], payload.get('output_dir'), **options)
+    if action == 'status':
+        job = queue.status(int(payload['id']))
+        if job is None:
+            raise LookupError(f"任务 {payload['id']} 不存在")
+        return job
+    if action == 'list':
+        return {'jobs': queue.list()}
+    if action == 'health':
+        return {'status': 'ok', 'workers': queue.workers, 'category_file': queue.category_file}
+    raise ValueError(f"不支持的操作: {action}")
+
+def make_http_server(queue, host='127.0.0.1', port=DEFAULT_PORT):
+    """创建HTTP服务: POST /jobs 提交任务，GET /jobs、GET /jobs/<id> 查询，GET /health 健康检查"""
+
+    class JobHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            parts = [part for part in self.path.split('/') if part]
+            try:
+                if parts == ['health']:
+                    self._send_json(200, handle_command(queue, {'action': 'health'}))
+                elif parts == ['jobs']:
+                    self._send_json(200, handle_command(queue, {'action': 'list'}))
+                elif len(parts) == 2 and parts[0] == 'jobs':
+                    self._send_json(200, handle_command(queue, {'action': 'status', 'id': parts[1]}))
+                else:
+                    self._send_json(404, {'error': 'not found'})
+            except (LookupError, ValueError) as e:
+                self._send_json(404, {'error': str(e)})
+
+        def do_POST(self):
+            if self.path != '/jobs':
+                self._send_json(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                self._send_json(202, handle_command(queue, {**payload, 'action': 'submit'}))
+            except Exception as e:
+                self._send_json(400, {'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), JobHandler)
+
+def make_socket_server(queue, socket_path=DEFAULT_SOCKET):
+    """创建Unix socket服务: 每行一个JSON请求(见 handle_command)，每行返回一个JSON响应"""
+
+    class JobStreamHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    response = handle_command(queue, json.loads(line))
+                except Exception as e:
+                    response = {'error': str(e)}
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    return socketserver.ThreadingUnixStreamServer(socket_path, JobStreamHandler)
+
+def serve(queue, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None):
+    """启动HTTP或Unix socket服务并一直运行"""
+    if socket_path:
+        server = make_socket_server(queue, socket_path)
+        print(f"分析服务已启动: unix://{socket_path} ({queue.workers} 个工作进程)")
+    else:
+        server = make_http_server(queue, host, port)
+        print(f"分析服务已启动: http://{host}:{server.server_address[1]}/jobs ({queue.workers} 个工作进程)")
+    print(f"任务输出目录: {queue.jobs_dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("分析服务已停止")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+        queue.shutdown(wait=False)
+
+def send_command(payload, url=None, socket_path=None):
+    """客户端: 向运行中的服务发送请求并返回响应"""
+    if socket_path:
+        import socket
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall((json.dumps(payload, ensure_ascii=False) + '\n').encode('utf-8'))
+            with client.makefile('r', encoding='utf-8') as reader:
+                return json.loads(reader.readline())
+
+    url = (url or f'http://127.0.0.1:{DEFAULT_PORT}').rstrip('/')
+    action = payload.get('action')
+    if action == 'submit':
+        request = urllib.request.Request(f'{url}/jobs', data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+    elif action == 'status':
+        request = urllib.request.Request(f"{url}/jobs/{payload['id']}")
+    elif action == 'list':
+        request = urllib.request.Request(f'{url}/jobs')
+    else:
+        request = urllib.request.Request(f'{url}/health')
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read())
+
+def main():
+    """命令行入口: serve 启动服务，submit/status 作为客户端"""
+    parser = argparse.ArgumentParser(description='常驻分析服务: 预热词表和分类词典，通过HTTP或Unix socket接收分析任务')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='启动服务')
+    serve_parser.add_argument('--workers', type=int, default=2, help='工作进程数，同时执行的任务上限 (默认: 2)')
+    serve_parser.add_argument('--jobs-dir', default=DEFAULT_JOBS_DIR, help=f'任务输出根目录 (默认: {DEFAULT_JOBS_DIR})')
+    serve_parser.add_argument('--categories', dest='category_file', help='任务默认使用的分类词典')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='HTTP服务地址 (默认: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'HTTP服务端口 (默认: {DEFAULT_PORT})')
+    serve_parser.add_argument('--socket', dest='socket_path', nargs='?', const=DEFAULT_SOCKET,
+                              help=f'改用Unix socket (默认路径: {DEFAULT_SOCKET})')
+
+    for name, help_text in [('submit', '提交分析任务'), ('status', '查询任务状态')]:
+        client_parser = subparsers.add_parser(name, help=help_text)
+        client_parser.add_argument('--url', help=f'HTTP服务地址 (默认: http://127.0.0.1:{DEFAULT_PORT})')
+        client_parser.add_argument('--socket', dest='socket_path', nargs='?', const=DEFAULT_SOCKET,
+                                   help=f'通过Unix socket连接 (默认路径: {DEFAULT_SOCKET})')
+        if name == 'submit':
+            client_parser.add_argument('input_files', nargs='+', help='输入文件、多个块文件或目录')
+            client_parser.add_argument('-o', '--output', dest='output_dir', help='任务输出目录 (默认: 任务根目录下自动创建)')
+            client_parser.add_argument('-s', '--skip', dest='skip_steps', nargs='+',
+                                       choices=['clean', 'categorize', 'frequency', 'consistency', 'report'],
+                                       help='跳过指定的分析步骤')
+        else:
+            client_parser.add_argument('job_id', nargs='?', type=int, help='任务编号 (默认: 列出全部任务)')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        queue = JobQueue(args.workers, args.jobs_dir, args.category_file)
+        serve(queue, args.host, args.port, args.socket_path)
+    elif args.command == 'submit':
+        inputs = [os.path.abspath(path) for path in args.input_files]
+        payload = {'action': 'submit', 'input_file': inputs[0] if len(inputs) == 1 else inputs}
+        if args.output_dir:
+            payload['output_dir'] = os.path.abspath(args.output_dir)
+        if args.skip_steps:
+            payload['skip_steps'] = args.skip_steps
+        print(json.dumps(send_command(payload, args.url, args.socket_path), ensure_ascii=False, indent=2))
+    elif args.command == 'status':
+        payload = {'action': 'list'} if args.job_id is None else {'action': 'status', 'id': args.job_id}
+        print(json.dumps(send_command(payload, args.url, args.socket_path), ensure_ascii=False, indent=2))
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,14 @@ import pandas as pd
 import os
 import json
 
+import category_dictionary
+import checkpoint
+import data_io
+import profiler
+import shared_artifacts
+import tokenizer
+import writers
+
 # 预定义分类词典
 DEFAULT_CATEGORIES = {
     'music_genres': [
@@ -11,7 +19,7 @@ DEFAULT_CATEGORIES = {
         'reggae', 'funk', 'dance', 'electro', 'synth', 'bass', 'drum', 'instrumental',
         'orchestral', 'vocal', 'choir', 'acapella', 'acoustic', 'ballad', 'progressive',
         'alternative', 'experimental', 'psychedelic', 'industrial', 'grunge', 'hardcore',
-        'house', 'techno', 'dnb', 'drill', 'grime', 'garage', 'tropical', 'latin', 'salsa',
+        'dnb', 'drill', 'grime', 'garage', 'tropical', 'latin', 'salsa',
         'bossa', 'nova', 'flamenco', 'opera'
     ],
     
@@ -30,30 +38,28 @@ DEFAULT_CATEGORIES = {
     'narrative_elements': [
         'story', 'journey', 'adventure', 'love', 'night', 'day', 'summer', 'winter',
         'ocean', 'mountain', 'city', 'space', 'dream', 'memory', 'fantasy', 'party',
-        'dance', 'travel', 'nature', 'rain', 'sunset', 'morning', 'evening', 'time',
+        'travel', 'nature', 'rain', 'sunset', 'morning', 'evening', 'time',
         'life', 'death', 'birth', 'childhood', 'youth', 'age', 'future', 'past',
         'present', 'history', 'war', 'peace', 'fight', 'battle', 'victory', 'defeat',
         'success', 'failure', 'beginning', 'end', 'forest', 'desert', 'sea', 'river',
-        'lake', 'sky', 'stars', 'moon', 'sun', 'light', 'dark', 'shadow', 'fire', 'water',
+        'lake', 'sky', 'stars', 'moon', 'sun', 'light', 'shadow', 'fire', 'water',
         'earth', 'air', 'spring', 'autumn', 'fall', 'season', 'holiday', 'celebration',
-        'ritual', 'ceremony', 'wedding', 'funeral', 'birth', 'graduation', 'anniversary'
+        'ritual', 'ceremony', 'wedding', 'funeral', 'graduation', 'anniversary'
     ]
 }
 
-def create_category_dictionary(output_file='word_categories.xlsx'):
-    """创建分类词典并保存为Excel文件"""
+def create_category_dictionary(output_file='word_categories.xlsx', overwrite=False):
+    """创建默认分类词典并保存为Excel文件；文件已存在时保留用户修改，除非overwrite为True"""
     try:
-        # 创建DataFrame
-        max_len = max(len(v) for v in DEFAULT_CATEGORIES.values())
-        categories_df = pd.DataFrame()
+        if os.path.exists(output_file) and not overwrite:
+            print(f"分类词典 {output_file} 已存在，保留现有词典")
+            return output_file
         
-        for category, words in DEFAULT_CATEGORIES.items():
-            # 确保所有列长度一致
-            padded_words = words + [''] * (max_len - len(words))
-            categories_df[category] = padded_words
+        dictionary = category_dictionary.CategoryDictionary.from_categories(DEFAULT_CATEGORIES)
+        dictionary.report()
         
-        # 保存到Excel
-        categories_df.to_excel(output_file, index=False)
+        # 保存到Excel，同时写入内容哈希、版本号和编译缓存
+        dictionary.save(output_file)
         print(f"分类词典已保存到: {output_file}")
         
         return output_file
@@ -61,46 +67,56 @@ def create_category_dictionary(output_file='word_categories.xlsx'):
         print(f"创建分类词典时出错: {e}")
         return None
 
-def load_category_dictionary(input_file='word_categories.xlsx'):
-    """从Excel文件加载分类词典"""
+# 按文件缓存已加载的词典，长时间运行的进程(如 daemon.py 的工作进程)中文件未变化时不重新加载
+_dictionary_stores = {}
+
+def load_dictionary(input_file='word_categories.xlsx'):
+    """加载经过校验的分类词典对象；文件未变化时直接使用编译缓存"""
     try:
         if not os.path.exists(input_file):
             print(f"分类词典文件 {input_file} 不存在，使用默认分类词典")
-            return DEFAULT_CATEGORIES
-        
-        # 读取Excel文件
-        categories_df = pd.read_excel(input_file)
+            return category_dictionary.CategoryDictionary.from_categories(DEFAULT_CATEGORIES)
         
-        # 转换为字典
-        categories = {}
-        for column in categories_df.columns:
-            # 过滤掉空值和NaN
-            categories[column] = categories_df[column].dropna().tolist()
-            # 转换为小写
-            categories[column] = [str(word).lower() for word in categories[column] if str(word).strip()]
+        path = os.path.abspath(input_file)
+        store = _dictionary_stores.get(path)
+        if store is None:
+            store = _dictionary_stores[path] = category_dictionary.CategoryDictionaryStore(path, check_interval=0)
+        else:
+            store.reload_if_changed()
+        dictionary = store.dictionary
+        categories = dictionary.categories
         
-        print(f"从 {input_file} 加载了分类词典")
+        print(f"从 {input_file} 加载了分类词典 (版本 {dictionary.version}, 哈希 {dictionary.content_hash[:12]})")
         print(f"类别: {', '.join(categories.keys())}")
         print(f"每个类别的词汇数量: {', '.join([f'{k}: {len(v)}' for k, v in categories.items()])}")
+        dictionary.report()
         
-        return categories
+        return dictionary
     except Exception as e:
         print(f"加载分类词典时出错: {e}")
-        return DEFAULT_CATEGORIES
+        return category_dictionary.CategoryDictionary.from_categories(DEFAULT_CATEGORIES)
 
-def categorize_words(text, categories):
+def load_category_dictionary(input_file='word_categories.xlsx'):
+    """从Excel文件加载分类词典，返回 类别 -> 词汇列表 的字典"""
+    return load_dictionary(input_file).categories
+
+def build_word_to_category(categories):
+    """创建单词到类别的映射，供批量分类时复用"""
+    return category_dictionary.compile_matcher(categories)
+
+def categorize_words(text, categories, word_to_category=None):
     """将文本中的词汇按照预定义的类别进行分类"""
     if not isinstance(text, str) or not text.strip():
-        return {cat: [] for cat in categories.keys()}
+        result = {cat: [] for cat in categories.keys()}
+        result['other'] = []
+        return result
     
-    words = text.lower().split()
+    words = tokenizer.split_words(text)
     result = {cat: [] for cat in categories.keys()}
     
-    # 创建一个单词到类别的映射，加速查找
-    word_to_category = {}
-    for category, word_list in categories.items():
-        for word in word_list:
-            word_to_category[word] = category
+    # 单词到类别的映射，未传入时现场创建
+    if word_to_category is None:
+        word_to_category = build_word_to_category(categories)
     
     # 分类每个单词
     categorized_words = set()
@@ -116,51 +132,80 @@ def categorize_words(text, categories):
     
     return result
 
-def categorize_data(input_file, category_file='word_categories.xlsx', output_file=None):
-    """对Excel文件中的数据进行分类"""
-    print(f"正在读取文件: {input_file}")
+def categorize_frame(df, categories, word_to_category):
+    """对一批行的cleaned_prompt和cleaned_tags分类，返回各类别列(行索引与df相同)"""
+    result = pd.DataFrame(index=df.index)
+    
+    # 对prompt进行分类
+    if 'cleaned_prompt' in df.columns:
+        with profiler.span('categorize_words[prompt]', rows=len(df)):
+            prompt_categories = df['cleaned_prompt'].apply(lambda x: categorize_words(x, categories, word_to_category))
+        
+        # 将分类结果展开到单独的列
+        result['prompt_genres'] = prompt_categories.apply(lambda x: ', '.join(x['music_genres']))
+        result['prompt_emotions'] = prompt_categories.apply(lambda x: ', '.join(x['music_emotions']))
+        result['prompt_narrative'] = prompt_categories.apply(lambda x: ', '.join(x['narrative_elements']))
+        result['prompt_other'] = prompt_categories.apply(lambda x: ', '.join(x['other']))
+    
+    # 对tags进行分类
+    if 'cleaned_tags' in df.columns:
+        with profiler.span('categorize_words[tags]', rows=len(df)):
+            tag_categories = df['cleaned_tags'].apply(lambda x: categorize_words(x, categories, word_to_category))
+        
+        # 将分类结果展开到单独的列
+        result['tag_genres'] = tag_categories.apply(lambda x: ', '.join(x['music_genres']))
+        result['tag_emotions'] = tag_categories.apply(lambda x: ', '.join(x['music_emotions']))
+        result['tag_narrative'] = tag_categories.apply(lambda x: ', '.join(x['narrative_elements']))
+        result['tag_other'] = tag_categories.apply(lambda x: ', '.join(x['other']))
+    
+    return result
+
+def categorize_data(input_file, category_file='word_categories.xlsx', output_file=None,
+                    chunk_dir=None, chunk_rows=checkpoint.DEFAULT_CHUNK_ROWS):
+    """对Excel文件中的数据进行分类；指定chunk_dir时按块处理并保存每块结果，中断后再次运行从未完成的块继续"""
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
     
     try:
         # 读取Excel文件
-        df = pd.read_excel(input_file)
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='categorize')
+            span['rows'] = len(df)
         
         # 加载分类词典
-        categories = load_category_dictionary(category_file)
+        with profiler.span('load_category_dictionary'):
+            dictionary = load_dictionary(category_file)
+            categories = dictionary.categories
+            word_to_category = dictionary.word_to_category
         
-        # 对prompt进行分类
-        if 'cleaned_prompt' in df.columns:
-            print("正在对prompt进行分类...")
-            prompt_categories = df['cleaned_prompt'].apply(lambda x: categorize_words(x, categories))
-            
-            # 将分类结果展开到单独的列
-            df['prompt_genres'] = prompt_categories.apply(lambda x: ', '.join(x['music_genres']))
-            df['prompt_emotions'] = prompt_categories.apply(lambda x: ', '.join(x['music_emotions']))
-            df['prompt_narrative'] = prompt_categories.apply(lambda x: ', '.join(x['narrative_elements']))
-            df['prompt_other'] = prompt_categories.apply(lambda x: ', '.join(x['other']))
-            
-            print("prompt分类完成")
-        
-        # 对tags进行分类
-        if 'cleaned_tags' in df.columns:
-            print("正在对tags进行分类...")
-            tag_categories = df['cleaned_tags'].apply(lambda x: categorize_words(x, categories))
-            
-            # 将分类结果展开到单独的列
-            df['tag_genres'] = tag_categories.apply(lambda x: ', '.join(x['music_genres']))
-            df['tag_emotions'] = tag_categories.apply(lambda x: ', '.join(x['music_emotions']))
-            df['tag_narrative'] = tag_categories.apply(lambda x: ', '.join(x['narrative_elements']))
-            df['tag_other'] = tag_categories.apply(lambda x: ', '.join(x['other']))
-            
-            print("tags分类完成")
+        # 对prompt和tags进行分类(分块检查点随输入文件或词典变化而失效)
+        print("正在对prompt和tags进行分类...")
+        key = None
+        if chunk_dir is not None and isinstance(input_file, str):
+            key = f"{checkpoint.file_hash(input_file)}:{dictionary.content_hash}"
+        categorized = checkpoint.process_in_chunks(
+            df, lambda chunk: categorize_frame(chunk, categories, word_to_category), chunk_dir, chunk_rows, key
+        )
+        for column in categorized.columns:
+            df[column] = categorized[column]
+        print("prompt和tags分类完成")
         
         # 保存分类结果
         if output_file is None:
             base_name = os.path.splitext(input_file)[0]
             output_file = f"{base_name}_categorized.xlsx"
         
-        df.to_excel(output_file, index=False)
+        with profiler.span('write_output', rows=len(df)):
+            output_file = writers.save(df, output_file)
         print(f"分类后的数据已保存到: {output_file}")
         
+        # 分类词典的词和类别编号写为共享数组，供词频阶段和查询工具使用
+        try:
+            shared_artifacts.write_categories(
+                shared_artifacts.artifact_dir(os.path.dirname(os.path.abspath(output_file))), dictionary
+            )
+        except OSError as e:
+            print(f"无法写入共享分类词典，跳过: {e}")
+        
         return df, output_file
     
     except Exception as e:
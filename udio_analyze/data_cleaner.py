@@ -1,75 +1,159 @@
 import pandas as pd
-import re
-import string
 import os
+import functools
 import nltk
-from nltk.corpus import words, stopwords
+from nltk.corpus import words
+
+import checkpoint
+import data_io
+import profiler
+import shared_artifacts
+import tokenizer
+
+# 共享英语词表所在目录(见 shared_artifacts)；设置后从内存映射文件读取，不在每个进程中构建集合
+_shared_lexicon_dir = None
 
 def download_nltk_resources():
-    """下载必要的NLTK资源"""
+    """下载必要的NLTK资源(已存在时跳过，已加载的英语词表保持有效)"""
     try:
-        nltk.download('words', quiet=True)
-        nltk.download('stopwords', quiet=True)
+        missing = []
+        for resource in ['words', 'stopwords']:
+            try:
+                nltk.data.find(f'corpora/{resource}')
+            except LookupError:
+                missing.append(resource)
+        if not missing:
+            return
+        for resource in missing:
+            nltk.download(resource, quiet=True)
+        load_english_words.cache_clear()
         print("NLTK资源下载完成")
     except Exception as e:
         print(f"NLTK资源下载失败: {e}")
         print("继续使用简单的英文过滤方法")
 
+def use_shared_lexicon(artifact_dir):
+    """之后的清洗使用artifact_dir中的共享英语词表(多个工作进程共享同一份内存映射文件)"""
+    global _shared_lexicon_dir
+    _shared_lexicon_dir = artifact_dir
+    load_english_words.cache_clear()
+
+@functools.lru_cache(maxsize=1)
+def load_english_words():
+    """加载NLTK英语词表(只加载一次)，设置了共享词表时返回内存映射的 shared_artifacts.Lexicon，资源不可用时返回None"""
+    if _shared_lexicon_dir is not None:
+        lexicon = shared_artifacts.open_lexicon(_shared_lexicon_dir)
+        if lexicon is not None:
+            return lexicon
+    try:
+        return frozenset(words.words())
+    except Exception:
+        return None
+
+def filter_english(words_list, english_words=None):
+    """只保留英语词汇"""
+    if english_words is None:
+        english_words = load_english_words()
+    
+    if english_words is not None:
+        # 保留英语词汇和短词(可能是缩写或音乐术语)
+        return [word for word in words_list if word in english_words or len(word) <= 2]
+    
+    # 如果NLTK资源加载失败，使用简单的过滤方法
+    # 这里只是简单地过滤掉明显的非英文字符
+    return [word for word in words_list if word.isalpha()]
+
 def clean_text(text):
     """清洗文本，只保留英语词汇"""
     if not isinstance(text, str):
         return ""
     
-    # 转为小写
-    text = text.lower()
+    # 转为小写、移除标点符号并分词('&'和其他标点均视为词边界)
+    words_list = tokenizer.tokenize(text)
     
-    # 移除标点符号
-    text = text.translate(str.maketrans('', '', string.punctuation))
+    return ' '.join(filter_english(words_list))
+
+def clean_texts(texts, language_filter=None):
+    """批量清洗文本，英语词表只加载一次
+
+    指定language_filter(language_id.LanguageFilter)时改为按语言过滤: 每条文本识别一次语言，
+    英语文本保留全部字母词，其他语言的文本只保留分类词典中的领域词。
+    """
+    token_lists = tokenizer.tokenize_batch(texts)
+    if language_filter is not None:
+        filtered, _ = language_filter.filter(token_lists)
+        return [' '.join(words_list) for words_list in filtered]
+    english_words = load_english_words()
+    if isinstance(english_words, shared_artifacts.Lexicon):
+        # 共享词表: 这批文本中不同的词一次二分查找，得到一个小集合
+        english_words = english_words.subset({word for words_list in token_lists for word in words_list})
+    return [
+        ' '.join(filter_english(words_list, english_words))
+        for words_list in token_lists
+    ]
+
+def clean_frame(df, language_filter=None):
+    """清洗一批行的prompt和tags列，返回cleaned_prompt和cleaned_tags列(行索引与df相同)
+
+    按语言过滤时另外返回prompt_language列(每条prompt识别出的语言代码)。
+    """
+    result = pd.DataFrame(index=df.index)
     
-    # 分词
-    words_list = text.split()
+    if 'prompt' in df.columns:
+        with profiler.span('clean_text[prompt]', rows=len(df)):
+            if language_filter is not None:
+                filtered, languages = language_filter.filter(tokenizer.tokenize_batch(df['prompt']))
+                result['cleaned_prompt'] = [' '.join(words_list) for words_list in filtered]
+                result['prompt_language'] = languages
+            else:
+                result['cleaned_prompt'] = clean_texts(df['prompt'])
     
-    # 尝试使用NLTK过滤非英语词汇
-    try:
-        english_words = set(words.words())
-        # 保留英语词汇和短词(可能是缩写或音乐术语)
-        english_only = [word for word in words_list if word.lower() in english_words or len(word) <= 2]
-    except:
-        # 如果NLTK资源加载失败，使用简单的过滤方法
-        # 这里只是简单地过滤掉明显的非英文字符
-        english_only = [word for word in words_list if all(c.isalpha() or c.isspace() for c in word)]
+    if 'tags' in df.columns:
+        with profiler.span('clean_text[tags]', rows=len(df)):
+            result['cleaned_tags'] = clean_texts(df['tags'], language_filter)
     
-    return ' '.join(english_only)
+    return result
 
-def clean_data(input_file, output_file=None):
-    """清洗Excel文件数据"""
-    print(f"正在读取文件: {input_file}")
+def clean_data(input_file, output_file=None, chunk_dir=None, chunk_rows=checkpoint.DEFAULT_CHUNK_ROWS,
+               language_filter=None):
+    """清洗Excel文件数据；指定chunk_dir时按块处理并保存每块结果，中断后再次运行从未完成的块继续
+
+    language_filter见 clean_texts，不指定时按英语词表过滤。
+    """
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
     
     try:
         # 读取Excel文件
-        df = pd.read_excel(input_file)
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='clean')
+            span['rows'] = len(df)
         
         print(f"文件读取成功，共 {len(df)} 行数据")
         print(f"列名: {', '.join(df.columns)}")
         
-        # 清洗prompt列
-        if 'prompt' in df.columns:
-            print("正在清洗prompt列...")
-            df['cleaned_prompt'] = df['prompt'].apply(clean_text)
-            print(f"prompt列清洗完成，有效数据 {df['cleaned_prompt'].str.len().gt(0).sum()} 行")
-        
-        # 清洗tags列
-        if 'tags' in df.columns:
-            print("正在清洗tags列...")
-            df['cleaned_tags'] = df['tags'].apply(clean_text)
-            print(f"tags列清洗完成，有效数据 {df['cleaned_tags'].str.len().gt(0).sum()} 行")
+        # 清洗prompt和tags列(分块检查点随输入文件变化而失效)
+        print("正在清洗prompt和tags列...")
+        key = checkpoint.file_hash(input_file) if chunk_dir is not None and isinstance(input_file, str) else None
+        if key is not None and language_filter is not None:
+            key = f"{key}:language:{language_filter.digest()}"
+        cleaned = checkpoint.process_in_chunks(
+            df, functools.partial(clean_frame, language_filter=language_filter), chunk_dir, chunk_rows, key
+        )
+        for column in cleaned.columns:
+            df[column] = cleaned[column]
+            if column == 'prompt_language':
+                counts = df[column].value_counts()
+                print(f"prompt语言: {', '.join(f'{language} {count}' for language, count in counts.head(8).items())}")
+                continue
+            print(f"{column}列清洗完成，有效数据 {df[column].str.len().gt(0).sum()} 行")
         
         # 保存清洗后的数据
         if output_file is None:
             base_name = os.path.splitext(input_file)[0]
             output_file = f"{base_name}_cleaned.xlsx"
         
-        df.to_excel(output_file, index=False)
+        with profiler.span('to_excel', rows=len(df)):
+            df.to_excel(output_file, index=False)
         print(f"清洗后的数据已保存到: {output_file}")
         
         return df, output_file
@@ -0,0 +1,68 @@
+import os
+import importlib.util
+import pandas as pd
+
+import schema
+
+def parquet_available():
+    """是否安装了parquet引擎(pyarrow或fastparquet)"""
+    return any(importlib.util.find_spec(name) is not None for name in ('pyarrow', 'fastparquet'))
+
+def read_data(source, stage=None):
+    """读取分析数据: source可以是Excel/CSV/Parquet/JSON(记录列表)/JSONL文件路径，也可以是已加载的DataFrame
+
+    指定stage时只读取该阶段需要的列(见 schema.STAGE_COLUMNS)，并把列转换为紧凑类型。
+    """
+    columns = schema.stage_columns(stage) if stage else None
+
+    if isinstance(source, pd.DataFrame):
+        if columns is not None:
+            df = source[[c for c in source.columns if c in columns]]
+        else:
+            # 浅拷贝，后续步骤新增列时不会修改调用方的DataFrame
+            df = source.copy(deep=False)
+    else:
+        wanted = (lambda c: c in columns) if columns is not None else None
+        extension = os.path.splitext(source)[1].lower()
+        if extension == '.parquet':
+            df = pd.read_parquet(source)
+            if columns is not None:
+                df = df[[c for c in df.columns if c in columns]]
+        elif extension == '.csv':
+            df = pd.read_csv(source, usecols=wanted)
+        elif extension in ('.json', '.jsonl'):
+            # .jsonl 为每行一条记录
+            df = pd.read_json(source, orient='records', lines=extension == '.jsonl')
+            if columns is not None:
+                df = df[[c for c in df.columns if c in columns]]
+        else:
+            df = pd.read_excel(source, usecols=wanted)
+
+    if stage:
+        # 读取全部列的阶段会把整张表写回文件，只做不改变取值的类型转换
+        df = schema.optimize_dtypes(df, lossless=columns is None)
+    return df
+
+def write_corpus(df, output_file):
+    """保存列式语料: 优先Parquet，未安装parquet引擎时退回Excel，返回实际写入的文件路径"""
+    base_name, extension = os.path.splitext(output_file)
+    if extension.lower() in ('', '.parquet'):
+        if parquet_available():
+            output_file = f"{base_name}.parquet"
+            df.to_parquet(output_file, index=False)
+            return output_file
+        print("未安装pyarrow或fastparquet，语料改为保存为Excel文件")
+        extension = '.xlsx'
+
+    output_file = f"{base_name}{extension}"
+    if extension.lower() == '.csv':
+        df.to_csv(output_file, index=False)
+    else:
+        df.to_excel(output_file, index=False)
+    return output_file
+
+def source_name(source):
+    """返回数据来源的显示名称"""
+    if isinstance(source, pd.DataFrame):
+        return '<DataFrame>'
+    return os.path.basename(source)
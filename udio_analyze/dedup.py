@@ -0,0 +1,211 @@
+import os
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+import data_io
+import frequency_engine
+import profiler
+import tokenizer
+import writers
+
+_SPLITMIX_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_SPLITMIX_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_SPLITMIX_M2 = np.uint64(0x94D049BB133111EB)
+
+def _mix64(x):
+    """splitmix64混合函数，把整数键打散为均匀分布的64位哈希"""
+    with np.errstate(over='ignore'):
+        x = x + _SPLITMIX_GAMMA
+        x = (x ^ (x >> np.uint64(30))) * _SPLITMIX_M1
+        x = (x ^ (x >> np.uint64(27))) * _SPLITMIX_M2
+    return x ^ (x >> np.uint64(31))
+
+def shingle_keys(token_lists, shingle_size=2):
+    """把每行的词序列转换为k-词shingle的64位哈希键，返回(行号, 键)；不足k个词的行用单词作为shingle"""
+    doc_index, codes, vocabulary = frequency_engine.encode_tokens(token_lists)
+    codes = codes.astype(np.uint64)
+    base = np.uint64(len(vocabulary) + 1)
+    n_tokens = len(codes)
+
+    # 同一行内连续k个词组成的窗口
+    n_windows = max(n_tokens - shingle_size + 1, 0)
+    starts = np.arange(n_windows)
+    valid = doc_index[starts + shingle_size - 1] == doc_index[starts] if n_windows else np.zeros(0, dtype=bool)
+    starts = starts[valid]
+    keys = codes[starts].copy()
+    with np.errstate(over='ignore'):
+        for offset in range(1, shingle_size):
+            keys = keys * base + codes[starts + offset]
+    docs = doc_index[starts]
+
+    # 词数不足k的行: 每个词单独作为shingle(加盐区分)
+    lengths = np.bincount(doc_index, minlength=len(token_lists))
+    short = (lengths > 0) & (lengths < shingle_size)
+    if short.any():
+        short_pos = np.flatnonzero(short[doc_index])
+        keys = np.concatenate([keys, codes[short_pos] ^ np.uint64(0x5BD1E9955BD1E995)])
+        docs = np.concatenate([docs, doc_index[short_pos]])
+        order = np.argsort(docs, kind='stable')
+        keys, docs = keys[order], docs[order]
+
+    return docs, _mix64(keys)
+
+def minhash_signatures(docs, keys, n_docs, num_perm=64, seed=42, chunk_shingles=50000):
+    """计算每行的MinHash签名(n_docs x num_perm, uint32)，没有shingle的行签名全为最大值"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    signatures = np.full((n_docs, num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    if len(keys) == 0:
+        return signatures
+
+    # 按行切块，避免一次生成 shingle数 x num_perm 的大矩阵
+    doc_starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+    chunk_bounds = [0]
+    for start in doc_starts:
+        if start - chunk_bounds[-1] >= chunk_shingles:
+            chunk_bounds.append(start)
+    chunk_bounds.append(len(keys))
+
+    for lo, hi in zip(chunk_bounds[:-1], chunk_bounds[1:]):
+        chunk_keys = keys[lo:hi]
+        with np.errstate(over='ignore'):
+            hashes = ((chunk_keys[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)).astype(np.uint32)
+        chunk_docs = docs[lo:hi]
+        starts = np.flatnonzero(np.r_[True, chunk_docs[1:] != chunk_docs[:-1]])
+        signatures[chunk_docs[starts]] = np.minimum.reduceat(hashes, starts, axis=0)
+
+    return signatures
+
+def lsh_clusters(signatures, has_shingles, bands=16, threshold=0.8, groups=None):
+    """用LSH分桶找近似重复，返回每行的簇编号；同一桶内每行只与桶中第一行比较签名相似度
+
+    groups为每行的分组编号时桶哈希包含分组，近似重复簇不会跨组。
+    """
+    n_docs, num_perm = signatures.shape
+    rows_per_band = num_perm // bands
+    candidates = np.flatnonzero(has_shingles)
+    sources = []
+    targets = []
+    # 分组作为每个桶哈希的初值
+    group_hash = np.zeros(len(candidates), dtype=np.uint64) if groups is None else _mix64(groups[candidates].astype(np.uint64))
+
+    for band in range(bands):
+        band_values = signatures[candidates, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+        band_hash = group_hash.copy()
+        for j in range(rows_per_band):
+            band_hash = _mix64(band_hash ^ band_values[:, j])
+
+        # 桶内所有行指向桶中的第一行
+        order = np.argsort(band_hash, kind='stable')
+        sorted_hash = band_hash[order]
+        is_start = np.r_[True, sorted_hash[1:] != sorted_hash[:-1]]
+        first = order[np.maximum.accumulate(np.where(is_start, np.arange(len(order)), 0))]
+        linked = first != order
+        members = candidates[order[linked]]
+        heads = candidates[first[linked]]
+
+        # 用签名估计的Jaccard相似度过滤桶碰撞
+        similarity = (signatures[members] == signatures[heads]).mean(axis=1)
+        keep = similarity >= threshold
+        sources.append(members[keep])
+        targets.append(heads[keep])
+
+    sources = np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64)
+    targets = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64)
+    graph = coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n_docs, n_docs))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+def find_near_duplicates(df, column='cleaned_prompt', shingle_size=2, num_perm=64, bands=16,
+                         threshold=0.8, seed=42, groups=None):
+    """为每行计算近似重复簇，返回(簇编号, 簇大小, 是否为簇代表行)三个数组；groups为每行的分组编号时只在组内去重"""
+    with profiler.span('shingling', rows=len(df)):
+        token_lists = [tokenizer.split_words(text) for text in df[column]]
+        docs, keys = shingle_keys(token_lists, shingle_size)
+
+    with profiler.span('minhash', rows=len(df)):
+        signatures = minhash_signatures(docs, keys, len(df), num_perm, seed)
+
+    with profiler.span('lsh', rows=len(df)):
+        has_shingles = np.zeros(len(df), dtype=bool)
+        has_shingles[docs] = True
+        labels = lsh_clusters(signatures, has_shingles, bands, threshold, groups)
+
+    # 以簇内第一行作为代表，簇编号按代表行的顺序重新编号
+    n_clusters = labels.max() + 1 if len(labels) else 0
+    first_row = np.full(n_clusters, len(df), dtype=np.int64)
+    np.minimum.at(first_row, labels, np.arange(len(df)))
+    cluster_order = np.argsort(first_row)
+    renumber = np.empty(n_clusters, dtype=np.int64)
+    renumber[cluster_order] = np.arange(n_clusters)
+
+    cluster_ids = renumber[labels]
+    cluster_sizes = np.bincount(cluster_ids, minlength=n_clusters)[cluster_ids]
+    is_representative = first_row[labels] == np.arange(len(df))
+    return cluster_ids, cluster_sizes, is_representative
+
+def deduplicate_data(input_file, output_file=None, mode='collapse', column='cleaned_prompt',
+                     shingle_size=2, num_perm=64, bands=16, threshold=0.8, seed=42, group_by=None):
+    """近似重复检测: mode='collapse'每簇只保留一行，mode='weight'保留全部行并按1/簇大小加权
+
+    group_by为 DataFrame -> 每行分组编号 的函数时(如比较模式的两侧)，只在同组内合并近似重复。
+    """
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
+
+    try:
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='dedup')
+            span['rows'] = len(df)
+
+        if column not in df.columns:
+            print(f"列 {column} 不存在于数据中，跳过去重")
+            return df, input_file
+
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) 必须能被 bands ({bands}) 整除")
+
+        print(f"正在计算 {column} 列的MinHash签名 (shingle={shingle_size}, num_perm={num_perm}, bands={bands})...")
+        groups = np.asarray(group_by(df), dtype=np.int64) if group_by is not None else None
+        cluster_ids, cluster_sizes, is_representative = find_near_duplicates(
+            df, column, shingle_size, num_perm, bands, threshold, seed, groups
+        )
+
+        df['dup_cluster'] = cluster_ids
+        df['dup_cluster_size'] = cluster_sizes
+        n_duplicates = int((~is_representative).sum())
+        print(f"发现 {int((cluster_sizes > 1).sum())} 行属于近似重复簇，共 {n_duplicates} 行为重复行")
+
+        # 近似重复簇摘要
+        clusters = df.loc[is_representative & (cluster_sizes > 1), ['dup_cluster', 'dup_cluster_size', 'prompt' if 'prompt' in df.columns else column]]
+        clusters = clusters.sort_values('dup_cluster_size', ascending=False)
+
+        if mode == 'collapse':
+            df = df[is_representative].reset_index(drop=True)
+            print(f"合并近似重复后剩余 {len(df)} 行")
+        elif mode == 'weight':
+            df['dedup_weight'] = 1.0 / cluster_sizes
+            print("已添加 dedup_weight 列 (1/簇大小)，词频分析将按权重计数")
+        else:
+            raise ValueError(f"未知的去重模式: {mode}")
+
+        # 保存结果
+        if output_file is None:
+            base_name = os.path.splitext(input_file)[0]
+            output_file = f"{base_name}_deduplicated.xlsx"
+
+        with profiler.span('write_output', rows=len(df)):
+            output_file = writers.save(df, output_file)
+            clusters_file = writers.save(
+                clusters, os.path.join(os.path.dirname(output_file) or '.', 'near_duplicate_clusters.xlsx')
+            )
+        print(f"去重后的数据已保存到: {output_file}")
+        print(f"近似重复簇摘要已保存到: {clusters_file}")
+
+        return df, output_file
+
+    except Exception as e:
+        print(f"去重过程中出错: {e}")
+        return None, None
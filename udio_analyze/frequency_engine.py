@@ -0,0 +1,312 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+import tokenizer
+
+def encode_tokens(token_lists):
+    """把多行词汇列表编码为整数ID，返回(每个词所在行号, 词ID, 词表)"""
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+    flat = list(chain.from_iterable(token_lists))
+    codes, vocabulary = pd.factorize(pd.Series(flat, dtype=object), sort=False)
+    doc_index = np.repeat(np.arange(len(token_lists), dtype=np.int64), lengths)
+    return doc_index, codes.astype(np.int64, copy=False), np.asarray(vocabulary, dtype=object)
+
+def prune_vocabulary(codes, vocabulary, min_support, weights=None):
+    """删除总频次(有权重时为加权频次)低于min_support的词，返回(保留位置掩码, 重新编号后的词ID, 新词表)"""
+    totals = np.bincount(codes, weights=weights, minlength=len(vocabulary))
+    keep = totals >= min_support
+    remap = np.full(len(vocabulary), -1, dtype=np.int64)
+    remap[keep] = np.arange(int(keep.sum()), dtype=np.int64)
+    mask = keep[codes]
+    return mask, remap[codes[mask]], vocabulary[keep]
+
+def select_top_n(counts, n, min_count=1):
+    """从计数数组中选出前n个元素的下标(argpartition)，按计数降序、同频次按ID(首次出现顺序)升序"""
+    candidates = np.flatnonzero(counts >= min_count)
+    if n <= 0 or len(candidates) == 0:
+        return np.array([], dtype=np.int64)
+
+    if len(candidates) > n:
+        values = counts[candidates]
+        part = np.argpartition(-values, n - 1)[:n]
+        threshold = values[part].min()
+        # 与 Counter.most_common 一致: 阈值上的并列项取最先出现的
+        above = candidates[values > threshold]
+        ties = candidates[values == threshold][:n - len(above)]
+        candidates = np.concatenate([above, ties])
+
+    order = np.lexsort((candidates, -counts[candidates]))
+    return candidates[order]
+
+# 分块计数时每块的行数: 内存只与块内词数和词表大小有关，与总词数无关
+DEFAULT_CHUNK_ROWS = 50000
+
+class ColumnCounts:
+    """多列词频计数: 各列共享一个词表(按首次出现编号)，每列保存一行计数，按列计算top N"""
+
+    __slots__ = ('columns', 'vocabulary', 'column_counts', 'totals', 'min_support', 'weighted')
+
+    def __init__(self, columns, vocabulary, column_counts, totals, min_support=1, weighted=False):
+        self.columns = list(columns)
+        self.vocabulary = vocabulary
+        self.column_counts = column_counts
+        self.totals = totals
+        self.min_support = min_support
+        self.weighted = weighted
+
+    def counts(self, column):
+        """返回某一列在共享词表上的计数数组(有行权重时为加权计数)"""
+        return self.column_counts[self.columns.index(column)]
+
+    def top_n(self, column, n):
+        """返回某一列出现最多的n个词及其频次"""
+        counts = self.counts(column)
+        index = select_top_n(counts, n, self.min_support)
+        if self.weighted:
+            return self.vocabulary[index], np.round(counts[index], 2)
+        return self.vocabulary[index], counts[index]
+
+    def total(self, column):
+        """返回某一列的词汇总数(剪枝前)"""
+        return self.totals[self.columns.index(column)]
+
+def _chunk_words(texts, row_weights=None):
+    """切分一块文本，返回(词列表, 每个词的权重或None)"""
+    if row_weights is None:
+        # 词频不需要行号: 整块拼接后一次切分，避免为每行创建列表
+        return tokenizer.split_words(' '.join(text for text in texts if isinstance(text, str))), None
+
+    # 加权计数需要知道每个词来自哪一行
+    token_lists = [tokenizer.split_words(text) for text in texts]
+    lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+    return list(chain.from_iterable(token_lists)), np.repeat(row_weights, lengths)
+
+def count_columns(df, columns, min_support=1, row_weights=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """统计多列的词频；min_support>1时剪除总频次低于它的词，row_weights为每行的计数权重
+
+    按列、按块切分和编码: 每块的词在块内factorize，再映射到共享词表并用bincount累加到该列的计数中，
+    内存占用与词表大小和块大小有关，而不是与全部词数成正比。
+    """
+    columns = [c for c in columns if c in df.columns]
+    weighted = row_weights is not None
+    if weighted:
+        row_weights = np.asarray(row_weights, dtype=np.float64)
+    dtype = np.float64 if weighted else np.int64
+
+    word_ids = {}
+    column_counts = []
+    totals = []
+    for column in columns:
+        values = df[column]
+        counts = np.zeros(0, dtype=dtype)
+        total = 0
+        for start in range(0, len(values), chunk_rows):
+            words, token_weights = _chunk_words(
+                values.iloc[start:start + chunk_rows],
+                row_weights[start:start + chunk_rows] if weighted else None
+            )
+            total += len(words)
+            if not words:
+                continue
+
+            # 块内编码后只把块内的不同词映射到共享词表(新词按首次出现顺序编号)
+            local_codes, local_vocabulary = pd.factorize(pd.Series(words, dtype=object), sort=False)
+            ids = np.fromiter((word_ids.setdefault(word, len(word_ids)) for word in local_vocabulary),
+                              dtype=np.int64, count=len(local_vocabulary))
+            if len(counts) < len(word_ids):
+                counts = np.concatenate([counts, np.zeros(max(len(word_ids), 2 * len(counts)) - len(counts), dtype=dtype)])
+            counts[ids] += np.bincount(local_codes, weights=token_weights, minlength=len(local_vocabulary))
+
+        column_counts.append(counts)
+        totals.append(total)
+
+    vocabulary = np.empty(len(word_ids), dtype=object)
+    vocabulary[:] = list(word_ids)
+    matrix = np.zeros((len(columns), len(vocabulary)), dtype=dtype)
+    for i, counts in enumerate(column_counts):
+        size = min(len(counts), len(vocabulary))
+        matrix[i, :size] = counts[:size]
+
+    if min_support > 1:
+        keep = matrix.sum(axis=0) >= min_support
+        matrix = matrix[:, keep]
+        vocabulary = vocabulary[keep]
+
+    return ColumnCounts(columns, vocabulary, matrix, np.asarray(totals, dtype=np.int64), min_support, weighted)
+
+# 短语(n-gram)统计默认的最低频次: 只出现一次的词序列不算短语，也不必为它们保留计数
+DEFAULT_NGRAM_MIN_SUPPORT = 2
+
+# 分层计数时每次处理的词位置数
+DEFAULT_CHUNK_TOKENS = 1000000
+
+class NgramCounts:
+    """多层n-gram计数: 第k层的每个n-gram编码为 前缀((k-1)-gram)编号 * 词表大小 + 末尾词ID 的int64键
+
+    每层只保存达到最低频次的键(升序)和计数，前缀编号即上一层键数组中的下标，解码时逐层还原为词序列。
+    """
+
+    __slots__ = ('vocabulary', 'word_counts', 'keys', 'counts', 'min_support', 'weighted', 'totals')
+
+    def __init__(self, vocabulary, word_counts, keys, counts, min_support=1, weighted=False, totals=None):
+        self.vocabulary = vocabulary
+        self.word_counts = word_counts
+        self.keys = keys
+        self.counts = counts
+        self.min_support = min_support
+        self.weighted = weighted
+        # totals[n-1]为文本中n词短语(含剪除的低频短语)的总数，有行权重时为加权总数
+        self.totals = totals
+
+    @property
+    def max_n(self):
+        return len(self.keys) + 1
+
+    def total(self, n):
+        """n词短语的总数(剪枝前)"""
+        if self.totals is None or n - 1 >= len(self.totals):
+            return 0
+        return self.totals[n - 1]
+
+    def decode(self, n, index):
+        """把第n层的键下标还原为词序列，返回每个位置一列的词数组列表"""
+        size = len(self.vocabulary)
+        columns = []
+        for level in range(n, 1, -1):
+            keys = self.keys[level - 2][index]
+            columns.append(self.vocabulary[keys % size])
+            index = keys // size
+        columns.append(self.vocabulary[index])
+        return columns[::-1]
+
+    def top_n(self, n, k=30):
+        """返回出现最多的k个n词短语及其频次(同频次按键升序)"""
+        if n == 1:
+            counts = self.word_counts
+            index = select_top_n(counts, k, self.min_support)
+            phrases = self.vocabulary[index]
+        else:
+            counts = self.counts[n - 2] if n - 2 < len(self.counts) else np.zeros(0)
+            index = select_top_n(counts, k, self.min_support)
+            phrases = np.array([' '.join(words) for words in zip(*self.decode(n, index))], dtype=object)
+        frequency = np.round(counts[index], 2) if self.weighted else counts[index]
+        return pd.DataFrame({'Phrase': phrases, 'Frequency': frequency})
+
+def _level_keys(stream, prefix_codes, start, stop, n, size):
+    """计算从start到stop位置开始的n-gram键，前缀或末尾词无效(跨行、低频)的位置返回-1"""
+    last = np.full(stop - start, -1, dtype=np.int64)
+    end = min(stop, len(stream) - n + 1)
+    if end > start:
+        last[:end - start] = stream[start + n - 1:end + n - 1]
+    prefix = prefix_codes[start:stop].astype(np.int64)
+    valid = (prefix >= 0) & (last >= 0)
+    return np.where(valid, prefix * size + last, -1)
+
+def _merge_counts(keys, counts):
+    """合并多块的(键, 计数)"""
+    keys = np.concatenate(keys)
+    counts = np.concatenate(counts)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=counts, minlength=len(unique)).astype(counts.dtype, copy=False)
+
+def count_ngrams(texts, max_n=4, min_support=DEFAULT_NGRAM_MIN_SUPPORT, row_weights=None,
+                 chunk_rows=DEFAULT_CHUNK_ROWS, chunk_tokens=DEFAULT_CHUNK_TOKENS):
+    """统计2..max_n词的有序短语频次，不为任何n-gram创建Python元组
+
+    文本按块切分并编码为一条int32词ID流，行与行之间插入-1分隔。按层计数(Apriori剪枝):
+    低于min_support的词在流中置为-1，第k层只扩展达到min_support的(k-1)-gram前缀，
+    键为 前缀编号 * 词表大小 + 末尾词ID(不会溢出int64)，按块用np.unique计数后合并。
+    """
+    texts = pd.Series(texts).tolist()
+    weighted = row_weights is not None
+    if weighted:
+        row_weights = np.asarray(row_weights, dtype=np.float64)
+    dtype = np.float64 if weighted else np.int64
+
+    # 1. 编码: 每块在块内factorize，再映射到共享词表
+    word_ids = {}
+    parts = []
+    weight_parts = []
+    length_parts = []
+    for start in range(0, len(texts), chunk_rows):
+        token_lists = [tokenizer.split_words(text) for text in texts[start:start + chunk_rows]]
+        doc_index, local_codes, local_vocabulary = encode_tokens(token_lists)
+        ids = np.fromiter((word_ids.setdefault(word, len(word_ids)) for word in local_vocabulary),
+                          dtype=np.int32, count=len(local_vocabulary))
+        # 每行末尾插入一个-1分隔符: 第r行的词在块中的位置向后移r个
+        lengths = np.bincount(doc_index, minlength=len(token_lists))
+        length_parts.append(lengths)
+        chunk = np.full(len(local_codes) + len(token_lists), -1, dtype=np.int32)
+        chunk[np.arange(len(local_codes)) + doc_index] = ids[local_codes]
+        parts.append(chunk)
+        if weighted:
+            weight_parts.append(np.repeat(row_weights[start:start + chunk_rows], lengths + 1))
+
+    stream = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+    weights = np.concatenate(weight_parts) if weighted and weight_parts else None
+    vocabulary = np.empty(len(word_ids), dtype=object)
+    vocabulary[:] = list(word_ids)
+
+    # 每行有 max(词数 - n + 1, 0) 个n词短语
+    row_lengths = np.concatenate(length_parts) if length_parts else np.zeros(0, dtype=np.int64)
+    totals = np.array([
+        np.dot(np.maximum(row_lengths - n + 1, 0), row_weights) if weighted else np.maximum(row_lengths - n + 1, 0).sum()
+        for n in range(1, max_n + 1)
+    ], dtype=dtype)
+
+    # 2. 单词计数，低频词不可能出现在高频短语中: 剪除后重新编号
+    valid = stream >= 0
+    word_counts = np.bincount(stream[valid], weights=None if weights is None else weights[valid],
+                              minlength=len(vocabulary)).astype(dtype, copy=False)
+    keep = word_counts >= min_support
+    remap = np.full(len(vocabulary) + 1, -1, dtype=np.int32)
+    remap[:-1][keep] = np.arange(int(keep.sum()), dtype=np.int32)
+    # 分隔符-1经remap[-1]仍为-1
+    stream = remap[stream]
+    vocabulary = vocabulary[keep]
+    word_counts = word_counts[keep]
+    size = max(len(vocabulary), 1)
+
+    # 3. 逐层扩展: 第k层的前缀编号是第k-1层保留的键中的下标(第1层即词ID)
+    prefix_codes = stream
+    level_keys = []
+    level_counts = []
+    for n in range(2, max_n + 1):
+        chunk_keys, chunk_counts = [], []
+        for start in range(0, len(stream), chunk_tokens):
+            stop = min(start + chunk_tokens, len(stream))
+            keys = _level_keys(stream, prefix_codes, start, stop, n, size)
+            mask = keys >= 0
+            if weights is None:
+                unique, counts = np.unique(keys[mask], return_counts=True)
+            else:
+                unique, inverse = np.unique(keys[mask], return_inverse=True)
+                counts = np.bincount(inverse, weights=weights[start:stop][mask], minlength=len(unique))
+            chunk_keys.append(unique)
+            chunk_counts.append(counts.astype(dtype, copy=False))
+        if not chunk_keys:
+            break
+
+        keys, counts = _merge_counts(chunk_keys, chunk_counts)
+        kept = counts >= min_support
+        keys, counts = keys[kept], counts[kept]
+        if len(keys) == 0:
+            break
+        level_keys.append(keys)
+        level_counts.append(counts)
+
+        # 下一层的前缀编号: 位置上的n-gram在保留键中的下标，未保留的为-1
+        if n < max_n:
+            next_codes = np.full(len(stream), -1, dtype=np.int32)
+            for start in range(0, len(stream), chunk_tokens):
+                stop = min(start + chunk_tokens, len(stream))
+                position_keys = _level_keys(stream, prefix_codes, start, stop, n, size)
+                positions = np.flatnonzero(position_keys >= 0)
+                found = np.minimum(np.searchsorted(keys, position_keys[positions]), len(keys) - 1)
+                hit = keys[found] == position_keys[positions]
+                next_codes[start + positions[hit]] = found[hit]
+            prefix_codes = next_codes
+
+    return NgramCounts(vocabulary, word_counts, level_keys, level_counts, min_support, weighted, totals)
@@ -12,6 +12,7 @@ def install_dependencies():
         'pandas',
         'matplotlib',
         'numpy',
+        'scipy',  # 用于近似重复检测的连通分量计算
         'nltk',
         'xlsxwriter',
         'openpyxl'  # 用于读写Excel文件
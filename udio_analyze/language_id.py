@@ -0,0 +1,221 @@
+import os
+import json
+import hashlib
+import argparse
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+import category_dictionary
+import data_categorizer
+import tokenizer
+
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 随代码提供的字符n-gram模型和训练文本(language_samples/<语言代码>.txt)
+MODEL_FILE = os.path.join(_MODULE_DIR, 'language_model.json')
+SAMPLES_DIR = os.path.join(_MODULE_DIR, 'language_samples')
+
+ENGLISH = 'en'
+# 非拉丁字母为主的文本(韩文、中日文、西里尔字母等)直接判为其他语言
+OTHER_SCRIPT = 'other'
+# 没有可判断字符的文本
+UNDETERMINED = 'und'
+
+NGRAM = 3
+PROFILE_SIZE = 1500
+# 每条文本只用前MAX_CHARS个字符判断语言，长文本的开头已经足够
+MAX_CHARS = 300
+# 码位小于它的视为拉丁字母(含扩展A/B)
+LATIN_LIMIT = 0x250
+# 英语先验: 每个n-gram给英语加的对数似然。提示词以英语为主，短的风格/艺术家列表不应被判为其他语言
+ENGLISH_PRIOR = 0.3
+
+def _detection_text(words):
+    """用于判断语言的文本: 规范化的字母词以空格连接，首尾加空格使词边界成为n-gram的一部分。
+    数字和符号不属于任何语言，只含数字的文本(如'1984')没有可判断字符"""
+    return f" {' '.join(word for word in words if word.isalpha())[:MAX_CHARS]} "
+
+def _gram_key(gram):
+    """把n个字符打包为int64键(每个码位21位)"""
+    key = 0
+    for char in gram:
+        key = (key << 21) | ord(char)
+    return key
+
+def _profile(text, size=PROFILE_SIZE):
+    """训练文本中最常见的size个字符n-gram及其计数"""
+    counts = Counter()
+    for line in text.splitlines():
+        padded = _detection_text(tokenizer.tokenize(line))
+        counts.update(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+    return dict(counts.most_common(size))
+
+def build_model(samples_dir=SAMPLES_DIR, output_file=MODEL_FILE, profile_size=PROFILE_SIZE):
+    """从每种语言的训练文本构建模型文件: 每种语言保留最常见的n-gram，平滑后的对数概率四舍五入保存"""
+    languages = sorted(os.path.splitext(name)[0] for name in os.listdir(samples_dir) if name.endswith('.txt'))
+    profiles = {}
+    for language in languages:
+        with open(os.path.join(samples_dir, f"{language}.txt"), 'r', encoding='utf-8') as f:
+            profiles[language] = _profile(f.read(), profile_size)
+
+    grams = sorted(set().union(*profiles.values()))
+    log_probs = {}
+    unseen = {}
+    for language, profile in profiles.items():
+        # 加一平滑: 模型中没有的n-gram按出现0次计
+        denominator = sum(profile.values()) + len(grams)
+        unseen[language] = round(float(np.log(1 / denominator)), 4)
+        log_probs[language] = [round(float(np.log((profile.get(gram, 0) + 1) / denominator)), 4) for gram in grams]
+
+    model = {'ngram': NGRAM, 'languages': languages, 'grams': grams, 'log_probs': log_probs, 'unseen': unseen}
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(model, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"语言模型已保存到: {output_file} ({len(languages)} 种语言，{len(grams)} 个n-gram)")
+    return output_file
+
+class LanguageModel:
+    """字符n-gram朴素贝叶斯语言识别: 字符映射为模型字母表中的序号，n-gram直接索引稠密的行号表，一批文本一次查表和按行求和"""
+
+    __slots__ = ('languages', 'keys', 'log_probs', 'unseen', 'char_index', 'gram_rows')
+
+    def __init__(self, languages, keys, log_probs, unseen):
+        self.languages = languages
+        self.keys = keys
+        self.log_probs = log_probs
+        self.unseen = unseen
+        # 模型字母表: 码位 -> 序号(从1开始)，0表示字母表外的字符(含非拉丁字母)
+        grams = [[(int(key) >> (21 * (NGRAM - 1 - i))) & 0x1FFFFF for i in range(NGRAM)] for key in keys]
+        alphabet = sorted({code for gram in grams for code in gram})
+        self.char_index = np.zeros(LATIN_LIMIT, dtype=np.int64)
+        self.char_index[alphabet] = np.arange(1, len(alphabet) + 1)
+        # 稠密的n-gram -> 表行号，字母表只有几十个字符，(字母表+1)^NGRAM的表比哈希查找快；模型外的n-gram指向最后一行(unseen)
+        size = len(alphabet) + 1
+        self.gram_rows = np.full(size ** NGRAM, len(keys), dtype=np.int32)
+        gram_ids = np.zeros(len(keys), dtype=np.int64)
+        for i in range(NGRAM):
+            gram_ids = gram_ids * size + self.char_index[[gram[i] for gram in grams]]
+        self.gram_rows[gram_ids] = np.arange(len(keys))
+
+    @classmethod
+    def load(cls, model_file=MODEL_FILE):
+        """加载模型文件"""
+        with open(model_file, 'r', encoding='utf-8') as f:
+            model = json.load(f)
+        languages = model['languages']
+        keys = np.array([_gram_key(gram) for gram in model['grams']], dtype=np.int64)
+        order = np.argsort(keys)
+        log_probs = np.array([model['log_probs'][language] for language in languages], dtype=np.float64).T[order]
+        unseen = np.array([model['unseen'][language] for language in languages], dtype=np.float64)
+        return cls(np.asarray(languages, dtype=object), keys[order], log_probs, unseen)
+
+    def detect_words(self, word_lists):
+        """识别每行(已切分的词列表)的语言，返回语言代码数组"""
+        texts = [_detection_text(words) for words in word_lists]
+        result = np.full(len(texts), UNDETERMINED, dtype=object)
+        if not texts:
+            return result
+
+        # 整批文本编码为一个码位数组，行之间用0分隔
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+        codes = np.frombuffer('\0'.join(texts).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+        doc_index = np.repeat(np.arange(len(texts)), lengths + 1)[:len(codes)]
+
+        # 以非拉丁字母为主的行
+        letters = (codes != 0) & (codes != ord(' '))
+        n_letters = np.bincount(doc_index[letters], minlength=len(texts))
+        n_other = np.bincount(doc_index[letters & (codes >= LATIN_LIMIT)], minlength=len(texts))
+
+        # 每个位置开始的n-gram在稠密表中的编号，跨行(含分隔符)的无效
+        chars = self.char_index[np.minimum(codes, LATIN_LIMIT - 1)]
+        chars[codes >= LATIN_LIMIT] = 0
+        size = int(self.char_index.max()) + 1
+        span = max(len(codes) - NGRAM + 1, 0)
+        gram_ids = np.zeros(span, dtype=np.int64)
+        valid = np.ones(span, dtype=bool)
+        for offset in range(NGRAM):
+            gram_ids = gram_ids * size + chars[offset:offset + span]
+            valid &= codes[offset:offset + span] != 0
+        position, grams_doc = self.gram_rows[gram_ids[valid]], doc_index[:span][valid]
+
+        # n-gram按行有序，直接构造CSR的行指针(不需要排序)；行 x n-gram的计数矩阵乘以对数概率表得到各语言得分
+        n_grams = np.bincount(grams_doc, minlength=len(texts))
+        indptr = np.concatenate([[0], np.cumsum(n_grams)])
+        counts = sparse.csr_matrix(
+            (np.ones(len(position), dtype=np.float64), position, indptr), shape=(len(texts), len(self.keys) + 1)
+        )
+        scores = counts @ np.vstack([self.log_probs, self.unseen])
+
+        if ENGLISH in self.languages:
+            scores[:, list(self.languages).index(ENGLISH)] += ENGLISH_PRIOR * n_grams
+        detected = n_letters > 0
+        result[detected] = self.languages[np.argmax(scores[detected], axis=1)]
+        result[detected & (n_grams == 0)] = UNDETERMINED
+        result[detected & (n_other * 2 > n_letters)] = OTHER_SCRIPT
+        return result
+
+    def detect(self, texts):
+        """识别每条原始文本的语言"""
+        return self.detect_words(tokenizer.tokenize_batch(texts))
+
+def allow_list(category_file=None):
+    """领域词白名单: 分类词典中的全部词(默认词典或指定的词典文件)，非英语文本中也保留"""
+    if category_file is not None and os.path.exists(category_file):
+        dictionary = category_dictionary.CategoryDictionary.load(category_file)
+    else:
+        dictionary = category_dictionary.CategoryDictionary.from_categories(data_categorizer.DEFAULT_CATEGORIES)
+    return frozenset(dictionary.word_to_category)
+
+class LanguageFilter:
+    """按语言清洗: 每行只识别一次语言，英语行保留全部字母词，其他语言的行只保留白名单中的领域词"""
+
+    __slots__ = ('model', 'allowed')
+
+    def __init__(self, model=None, allowed=None):
+        self.model = model if model is not None else LanguageModel.load()
+        self.allowed = allowed if allowed is not None else allow_list()
+
+    @classmethod
+    def from_category_file(cls, category_file=None, model_file=MODEL_FILE):
+        return cls(LanguageModel.load(model_file), allow_list(category_file))
+
+    def digest(self):
+        """白名单和模型的内容哈希: 任一变化时清洗结果不同，用于区分分块检查点"""
+        digest = hashlib.sha256('\n'.join(sorted(self.allowed)).encode('utf-8'))
+        digest.update(self.model.log_probs.tobytes())
+        return digest.hexdigest()
+
+    def filter(self, word_lists):
+        """返回(过滤后的词列表, 每行的语言代码)"""
+        languages = self.model.detect_words(word_lists)
+        allowed = self.allowed
+        filtered = [
+            [word for word in words if word.isalpha()] if language in (ENGLISH, UNDETERMINED)
+            else [word for word in words if word in allowed]
+            for words, language in zip(word_lists, languages)
+        ]
+        return filtered, languages
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='字符n-gram语言识别')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='从 language_samples/ 中的训练文本重新构建模型文件')
+    build_parser.add_argument('--samples', default=SAMPLES_DIR, help='训练文本目录 (每种语言一个<代码>.txt)')
+    build_parser.add_argument('-o', '--output', default=MODEL_FILE, help='模型文件')
+
+    detect_parser = subparsers.add_parser('detect', help='识别文本的语言')
+    detect_parser.add_argument('texts', nargs='+', help='要识别的文本')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build_model(args.samples, args.output)
+    else:
+        model = LanguageModel.load()
+        for text, language in zip(args.texts, model.detect(args.texts)):
+            print(f"{language}\t{text}")
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,23 @@ import argparse
 from datetime import datetime
 
 # 导入各个模块
+import checkpoint
+import corpus_merge
 import data_cleaner
+import language_id
+import dedup
 import data_categorizer
 import word_frequency_analyzer
 import consistency_analyzer
 import report_generator
+import similarity_index
+import vocab_mining
+import segment_analyzer
+import sampling
+import compare
+import profiler
+import results
+import writers
 
 def create_output_dir(base_dir=None):
     """创建输出目录"""
@@ -23,8 +35,18 @@ def create_output_dir(base_dir=None):
     os.makedirs(output_dir, exist_ok=True)
     return output_dir
 
-def run_full_analysis(input_file, output_dir=None, skip_steps=None):
-    """运行完整的分析流程"""
+def run_full_analysis(input_file, output_dir=None, skip_steps=None, profile=None, min_support=1, dedup_mode=None,
+                      build_index=False, bootstrap_resamples=0, seed=None, category_file=None, mine_vocabulary=False,
+                      output_format='xlsx', heatmap_words=30, heatmap_metric='Frequency', heatmap_cluster=False,
+                      ngram_max=4, segments=None, language_filter=False, sample=None, sample_method='uniform',
+                      compare=None, compare_labels=None, compare_split=None, resume=False):
+    """运行完整的分析流程，可选参数与命令行选项一一对应(profile 可选 'cprofile' 或 'pyinstrument'，dedup_mode 可选 'collapse' 或 'weight')
+
+    compare为另一侧的输入(文件、块文件列表、通配符或目录)时把input_file与它合并为一个标记了两侧的语料，
+    compare_split为时间点时按time列把输入切分为两个时间窗口，两种方式都在最后输出两侧的比较结果。
+    resume=True时在已有的output_dir中继续之前失败或中断的运行。成功时返回本次运行各阶段结果的
+    results.AnalysisResults(继续运行时已完成的阶段不包含在内)，失败时返回False。
+    """
     
     if skip_steps is None:
         skip_steps = []
@@ -35,95 +57,422 @@ def run_full_analysis(input_file, output_dir=None, skip_steps=None):
     print("音乐提示词偏好分析系统")
     print("="*60)
     
-    # 检查输入文件是否存在
-    if not os.path.exists(input_file):
-        print(f"错误: 输入文件 '{input_file}' 不存在")
+    # 检查输入文件是否存在(input_file可以是多个块文件、通配符或目录)
+    input_files = corpus_merge.expand_inputs(input_file)
+    missing = [path for path in input_files if not os.path.exists(path)]
+    if not input_files or missing:
+        print(f"错误: 输入文件 '{missing[0] if missing else input_file}' 不存在")
         return False
     
     # 创建输出目录
     if output_dir is None:
         output_dir = create_output_dir()
+    else:
+        os.makedirs(output_dir, exist_ok=True)
     
     print(f"分析结果将保存到: {output_dir}\n")
     
+    # 记录各阶段耗时，--profile时额外采集性能剖析数据
+    run_profiler = profiler.RunProfiler(profile, os.path.join(output_dir, 'profile'))
+    previous_profiler = profiler.activate(run_profiler)
+    previous_format = writers.get_format()
+    try:
+        output_format = writers.set_format(output_format)
+        options = {
+            'profile': profile, 'min_support': min_support, 'dedup_mode': dedup_mode, 'build_index': build_index,
+            'bootstrap_resamples': bootstrap_resamples, 'seed': seed, 'category_file': category_file,
+            'mine_vocabulary': mine_vocabulary, 'output_format': output_format, 'heatmap_words': heatmap_words,
+            'heatmap_metric': heatmap_metric, 'heatmap_cluster': heatmap_cluster, 'ngram_max': ngram_max,
+            'segments': segments, 'language_filter': language_filter, 'sample': sample,
+            'sample_method': sample_method, 'compare': compare, 'compare_labels': compare_labels,
+            'compare_split': compare_split
+        }
+        return _run_steps(input_file, output_dir, skip_steps, run_profiler, start_time, options, resume)
+    finally:
+        writers.set_format(previous_format)
+        profiler.activate(previous_profiler)
+
+def _run_steps(input_file, output_dir, skip_steps, run_profiler, start_time, options, resume=False):
+    """依次执行各分析步骤，并把运行清单和每个阶段的完成标记写入输出目录
+
+    resume=True时跳过清单中已完成且输出文件未改变的阶段，从第一个未完成的阶段继续。
+    """
+    min_support = options['min_support']
+    dedup_mode = options['dedup_mode']
+    category_file = options['category_file']
+    
+    input_files = corpus_merge.expand_inputs(input_file)
+    profiler.update_run_manifest(output_dir, {
+        'input_file': [os.path.abspath(path) for path in input_files] if len(input_files) > 1 else os.path.abspath(input_files[0]),
+        'output_dir': os.path.abspath(output_dir),
+        'skip_steps': list(skip_steps),
+        'dedup_mode': dedup_mode,
+        'bootstrap_resamples': options['bootstrap_resamples'],
+        'seed': options['seed'],
+        'category_file': os.path.abspath(category_file) if category_file else None,
+        'output_format': options['output_format'],
+        # --resume 时按这里记录的参数继续运行(路径保存为绝对路径，可在任意目录下继续)
+        'options': {
+            **options,
+            'input_file': _absolute_inputs(input_file),
+            'skip_steps': list(skip_steps),
+            'category_file': os.path.abspath(category_file) if category_file else None,
+            'compare': _absolute_inputs(options.get('compare'))
+        },
+        'status': 'running'
+    })
+    tracker = checkpoint.StageTracker(output_dir, resume)
+    # 各阶段返回的结果，报告直接使用，不再从输出目录重新读取
+    analysis_results = results.AnalysisResults()
+    
+    # 蓄水池抽样直接流式读取各块文件，不先合并
+    reservoir = bool(options.get('sample')) and options.get('sample_method') == 'reservoir'
+    
+    # 比较两个语料: 两侧合并为一个语料，之后的步骤只运行一次，最后按compare_side列比较
+    compare_labels = options.get('compare_labels')
+    if options.get('compare'):
+        compare_labels = tuple(compare_labels or compare.side_labels([input_file, options['compare']]))
+        print("\n" + "-"*60)
+        print(f"合并比较的两侧 - {compare_labels[0]} / {compare_labels[1]}")
+        print("-"*60)
+        
+        restored = tracker.completed('compare_union')
+        if restored is not None:
+            input_file = restored['file']
+        else:
+            tracker.begin('compare_union')
+            with profiler.span('compare_union', capture=True):
+                union_df, input_file = compare.tag_union(
+                    [input_file, options['compare']], os.path.join(output_dir, compare.COMPARE_CORPUS_NAME),
+                    compare_labels
+                )
+            
+            if union_df is None:
+                print("合并比较的两侧失败，无法继续分析")
+                return _stage_failed(output_dir, run_profiler, tracker, 'compare_union')
+            tracker.complete('compare_union', {'file': os.path.abspath(input_file)})
+    
+    # 多个块文件: 并发读取、按song_path去重后合并为一个语料文件
+    elif corpus_merge.needs_merge(input_file) and not reservoir:
+        print("\n" + "-"*60)
+        print("合并块文件 - 按song_path去重并记录来源块")
+        print("-"*60)
+        
+        restored = tracker.completed('merge')
+        if restored is not None:
+            input_file = restored['file']
+        else:
+            tracker.begin('merge')
+            with profiler.span('merge', capture=True):
+                merged_df, input_file, _ = corpus_merge.merge_blocks(
+                    input_files, os.path.join(output_dir, corpus_merge.MERGED_CORPUS_NAME)
+                )
+            
+            if merged_df is None:
+                print("合并块文件失败，无法继续分析")
+                return _stage_failed(output_dir, run_profiler, tracker, 'merge')
+            tracker.complete('merge', {'file': os.path.abspath(input_file)})
+    
+    # 可选步骤: 抽样，之后的各步骤只处理样本，最后由样本估计总体词频和一致性
+    if options.get('sample'):
+        print("\n" + "-"*60)
+        print(f"抽样 - {options['sample_method']}，样本大小 {options['sample']:g}")
+        print("-"*60)
+        
+        restored = tracker.completed('sample')
+        if restored is not None:
+            input_file = restored['file']
+        else:
+            tracker.begin('sample')
+            with profiler.span('sample', capture=True):
+                sample_df, sample_file = sampling.draw_sample(
+                    input_file, os.path.join(output_dir, sampling.SAMPLE_CORPUS_NAME), options['sample'],
+                    options['sample_method'], options['seed']
+                )
+            
+            if sample_df is None:
+                print("抽样失败，无法继续分析")
+                return _stage_failed(output_dir, run_profiler, tracker, 'sample')
+            input_file = sample_file
+            tracker.complete('sample', {'file': os.path.abspath(input_file)})
+    
     # 步骤1: 数据清洗
     if 'clean' not in skip_steps:
         print("\n" + "-"*60)
         print("步骤1: 数据清洗 - 排除非英语词汇")
         print("-"*60)
         
-        data_cleaner.download_nltk_resources()
-        cleaned_df, cleaned_file = data_cleaner.clean_data(input_file, os.path.join(output_dir, 'music_prompt_cleaned.xlsx'))
-        
-        if cleaned_df is None:
-            print("数据清洗失败，无法继续分析")
-            return False
+        restored = tracker.completed('clean')
+        if restored is not None:
+            cleaned_file = restored['file']
+        else:
+            tracker.begin('clean')
+            with profiler.span('clean', capture=True):
+                language_filter = None
+                if options.get('language_filter'):
+                    # 按语言过滤: 领域词白名单来自分类词典(未指定时为默认词典)
+                    language_filter = language_id.LanguageFilter.from_category_file(category_file)
+                else:
+                    data_cleaner.download_nltk_resources()
+                cleaned_df, cleaned_file = data_cleaner.clean_data(
+                    input_file, os.path.join(output_dir, 'music_prompt_cleaned.xlsx'), tracker.chunk_dir('clean'),
+                    language_filter=language_filter
+                )
+            
+            if cleaned_df is None:
+                print("数据清洗失败，无法继续分析")
+                return _stage_failed(output_dir, run_profiler, tracker, 'clean')
+            tracker.complete('clean', {'file': os.path.abspath(cleaned_file)})
     else:
         print("\n跳过数据清洗步骤...")
         cleaned_file = input_file
     
+    # 可选步骤: 近似重复检测(合并或加权重新生成/重新混音产生的近似重复prompt)
+    if dedup_mode is not None:
+        print("\n" + "-"*60)
+        print(f"近似重复检测 - MinHash/LSH ({dedup_mode})")
+        print("-"*60)
+        
+        restored = tracker.completed('dedup')
+        if restored is not None:
+            cleaned_file = restored['file']
+        else:
+            tracker.begin('dedup')
+            # 比较模式只在每一侧内合并近似重复，不跨侧合并
+            group_by = None
+            if options.get('compare') or options.get('compare_split'):
+                group_by = lambda df: compare.side_codes(df, compare_labels, options.get('compare_split'))[0]
+            try:
+                with profiler.span('dedup', capture=True), writers.background():
+                    deduplicated_df, deduplicated_file = dedup.deduplicate_data(
+                        cleaned_file, os.path.join(output_dir, 'music_prompt_deduplicated.xlsx'), dedup_mode,
+                        group_by=group_by
+                    )
+            except writers.WriteError as e:
+                print(f"写出去重结果时出错: {e}")
+                deduplicated_df = None
+            
+            if deduplicated_df is None:
+                print("近似重复检测失败，无法继续分析")
+                return _stage_failed(output_dir, run_profiler, tracker, 'dedup')
+            cleaned_file = deduplicated_file
+            tracker.complete('dedup', {'file': os.path.abspath(cleaned_file)})
+    
     # 步骤2: 数据分类
     if 'categorize' not in skip_steps:
         print("\n" + "-"*60)
         print("步骤2: 数据分类 - 将词汇分为音乐类型、音乐情绪、场景叙述和其他四个类别")
         print("-"*60)
         
-        # 创建分类词典
-        category_file = os.path.join(output_dir, 'word_categories.xlsx')
-        data_categorizer.create_category_dictionary(category_file)
-        
-        # 对数据进行分类
-        categorized_df, categorized_file = data_categorizer.categorize_data(
-            cleaned_file, 
-            category_file,
-            os.path.join(output_dir, 'music_prompt_categorized.xlsx')
-        )
-        
-        if categorized_df is None:
-            print("数据分类失败，无法继续分析")
-            return False
+        restored = tracker.completed('categorize')
+        if restored is not None:
+            categorized_file = restored['file']
+            category_file = restored['category_file']
+        else:
+            tracker.begin('categorize')
+            # 中间结果由后台线程写出，退出with块时等待写入完成，后续步骤读取的文件已完整
+            try:
+                with profiler.span('categorize', capture=True), writers.background():
+                    # 未指定分类词典时在输出目录中创建默认词典(已存在则保留)
+                    if category_file is None:
+                        category_file = os.path.join(output_dir, 'word_categories.xlsx')
+                        data_categorizer.create_category_dictionary(category_file)
+                
+                    # 对数据进行分类
+                    categorized_df, categorized_file = data_categorizer.categorize_data(
+                        cleaned_file, 
+                        category_file,
+                        os.path.join(output_dir, 'music_prompt_categorized.xlsx'),
+                        tracker.chunk_dir('categorize')
+                    )
+            except writers.WriteError as e:
+                print(f"写出分类结果时出错: {e}")
+                categorized_df = None
+            
+            if categorized_df is None:
+                print("数据分类失败，无法继续分析")
+                return _stage_failed(output_dir, run_profiler, tracker, 'categorize')
+            analysis_results.data = categorized_df
+            tracker.complete('categorize', {'file': os.path.abspath(categorized_file),
+                                             'category_file': os.path.abspath(category_file)})
     else:
         print("\n跳过数据分类步骤...")
         categorized_file = cleaned_file
     
+    # 可选步骤: 构建提示词相似度索引
+    if options['build_index']:
+        print("\n" + "-"*60)
+        print("构建提示词相似度索引")
+        print("-"*60)
+        
+        if tracker.completed('similarity_index') is None:
+            tracker.begin('similarity_index')
+            with profiler.span('similarity_index', capture=True):
+                index_dir = similarity_index.build_index(
+                    categorized_file, os.path.join(output_dir, similarity_index.INDEX_DIR_NAME)
+                )
+            
+            if index_dir is None:
+                print("构建相似度索引失败，但将继续执行后续步骤")
+                tracker.fail('similarity_index')
+            else:
+                tracker.complete('similarity_index', {'dir': os.path.abspath(index_dir)})
+    
     # 步骤3: 词频分析
     if 'frequency' not in skip_steps:
         print("\n" + "-"*60)
         print("步骤3: 词频分析 - 分析词频、高频搭配")
         print("-"*60)
         
-        success = word_frequency_analyzer.analyze_all_word_frequencies(categorized_file, output_dir)
-        
-        if not success:
-            print("词频分析失败，但将继续执行后续步骤")
+        if tracker.completed('frequency') is None:
+            tracker.begin('frequency')
+            try:
+                with profiler.span('frequency', capture=True), writers.background():
+                    success = word_frequency_analyzer.analyze_all_word_frequencies(
+                        categorized_file, output_dir, min_support,
+                        options['heatmap_words'], options['heatmap_metric'], options['heatmap_cluster'],
+                        options['ngram_max']
+                    )
+            except writers.WriteError as e:
+                print(f"写出词频分析结果时出错: {e}")
+                success = False
+            
+            if not success:
+                print("词频分析失败，但将继续执行后续步骤")
+                tracker.fail('frequency')
+            else:
+                analysis_results.update(success)
+                tracker.complete('frequency')
     else:
         print("\n跳过词频分析步骤...")
     
+    # 可选步骤: 从other列挖掘分类词典候选词
+    if options['mine_vocabulary']:
+        print("\n" + "-"*60)
+        print("词汇挖掘 - 为高频未分类词推荐类别")
+        print("-"*60)
+        
+        if tracker.completed('vocab_mining') is None:
+            tracker.begin('vocab_mining')
+            with profiler.span('vocab_mining', capture=True):
+                candidates = vocab_mining.mine_vocabulary(
+                    categorized_file, output_dir, category_file, pairs=analysis_results.pairs
+                )
+            
+            if candidates is None:
+                print("没有生成候选词，但将继续执行后续步骤")
+                tracker.fail('vocab_mining')
+            else:
+                tracker.complete('vocab_mining')
+    
     # 步骤4: 一致性分析
     if 'consistency' not in skip_steps:
         print("\n" + "-"*60)
         print("步骤4: 一致性分析 - 分析tag和prompt的一致性")
         print("-"*60)
         
-        success = consistency_analyzer.analyze_consistency(categorized_file, output_dir)
-        
-        if not success:
-            print("一致性分析失败，但将继续执行后续步骤")
+        if tracker.completed('consistency') is None:
+            tracker.begin('consistency')
+            try:
+                with profiler.span('consistency', capture=True), writers.background():
+                    success = consistency_analyzer.analyze_consistency(
+                        categorized_file, output_dir, options['bootstrap_resamples'], options['seed']
+                    )
+            except writers.WriteError as e:
+                print(f"写出一致性分析结果时出错: {e}")
+                success = False
+            
+            if not success:
+                print("一致性分析失败，但将继续执行后续步骤")
+                tracker.fail('consistency')
+            else:
+                analysis_results.update(success)
+                tracker.complete('consistency')
     else:
         print("\n跳过一致性分析步骤...")
     
+    # 可选步骤: 按艺术家、时长区间、来源块分组统计
+    if options.get('segments'):
+        print("\n" + "-"*60)
+        print("分组分析 - 按艺术家、时长区间或来源块统计分布和一致性")
+        print("-"*60)
+        
+        if tracker.completed('segments') is None:
+            tracker.begin('segments')
+            try:
+                with profiler.span('segments', capture=True), writers.background():
+                    success = segment_analyzer.analyze_segments(categorized_file, output_dir, options['segments'])
+            except writers.WriteError as e:
+                print(f"写出分组分析结果时出错: {e}")
+                success = False
+            
+            if not success:
+                print("分组分析失败，但将继续执行后续步骤")
+                tracker.fail('segments')
+            else:
+                tracker.complete('segments')
+    
+    # 可选步骤: 由样本估计总体词频和一致性
+    if options.get('sample'):
+        print("\n" + "-"*60)
+        print("抽样估计 - 总体词频和一致性的估计值及95%置信区间")
+        print("-"*60)
+        
+        if tracker.completed('sample_estimates') is None:
+            tracker.begin('sample_estimates')
+            try:
+                with profiler.span('sample_estimates', capture=True), writers.background():
+                    success = sampling.analyze_sample_estimates(categorized_file, output_dir)
+            except writers.WriteError as e:
+                print(f"写出抽样估计结果时出错: {e}")
+                success = False
+            
+            if not success:
+                print("抽样估计失败，但将继续执行后续步骤")
+                tracker.fail('sample_estimates')
+            else:
+                tracker.complete('sample_estimates')
+    
+    # 可选步骤: 比较两个语料或两个时间窗口
+    if options.get('compare') or options.get('compare_split'):
+        print("\n" + "-"*60)
+        print("比较分析 - 两侧的词频差异(对数优势比)和一致性变化")
+        print("-"*60)
+        
+        if tracker.completed('compare') is None:
+            tracker.begin('compare')
+            try:
+                with profiler.span('compare', capture=True), writers.background():
+                    success = compare.analyze_comparison(
+                        categorized_file, output_dir, compare_labels, options.get('compare_split')
+                    )
+            except writers.WriteError as e:
+                print(f"写出比较结果时出错: {e}")
+                success = None
+            
+            if success is None:
+                print("比较分析失败，但将继续执行后续步骤")
+                tracker.fail('compare')
+            else:
+                tracker.complete('compare')
+    
     # 步骤5: 生成报告
     if 'report' not in skip_steps:
         print("\n" + "-"*60)
         print("步骤5: 生成报告 - 整合所有分析结果")
         print("-"*60)
         
-        report_file = report_generator.generate_report(categorized_file, output_dir)
-        
-        if report_file:
-            print(f"分析报告已成功生成: {report_file}")
-        else:
-            print("生成报告失败")
+        if tracker.completed('report') is None:
+            tracker.begin('report')
+            with profiler.span('report', capture=True):
+                report_file = report_generator.generate_report(categorized_file, output_dir, analysis_results)
+            
+            if report_file:
+                print(f"分析报告已成功生成: {report_file}")
+                tracker.complete('report', {'file': os.path.abspath(report_file)})
+            else:
+                print("生成报告失败")
+                tracker.fail('report')
     else:
         print("\n跳过报告生成步骤...")
     
@@ -131,12 +480,38 @@ def run_full_analysis(input_file, output_dir=None, skip_steps=None):
     end_time = time.time()
     total_time = end_time - start_time
     
+    manifest_file = _write_run_manifest(output_dir, run_profiler, 'completed')
+    
     print("\n" + "="*60)
+    run_profiler.print_summary()
+    print(f"运行清单已保存到: {manifest_file}")
     print(f"分析完成! 总耗时: {total_time:.2f} 秒")
     print(f"结果保存在: {output_dir}")
     print("="*60 + "\n")
     
-    return True
+    return analysis_results
+
+def _absolute_inputs(inputs):
+    """把输入路径(单个或列表)转换为绝对路径"""
+    if inputs is None:
+        return None
+    if isinstance(inputs, list):
+        return [os.path.abspath(path) for path in inputs]
+    return os.path.abspath(inputs)
+
+def _stage_failed(output_dir, run_profiler, tracker, stage):
+    """记录阶段失败并结束运行，之后可用 --resume 从该阶段继续"""
+    tracker.fail(stage)
+    _write_run_manifest(output_dir, run_profiler, 'failed')
+    print(f"可使用 --resume {output_dir} 从 {stage} 阶段继续")
+    return False
+
+def _write_run_manifest(output_dir, run_profiler, status):
+    """把运行状态和各阶段计时写入运行清单"""
+    return profiler.update_run_manifest(output_dir, {
+        'status': status,
+        **run_profiler.summary()
+    })
 
 def main():
     """主函数，处理命令行参数"""
@@ -144,8 +519,8 @@ def main():
     # 创建命令行参数解析器
     parser = argparse.ArgumentParser(description='音乐提示词偏好分析系统')
     
-    parser.add_argument('input_file', nargs='?', default="F:\\ai_program_2\\udio_analyze\\music_prompt.xlsx",
-                        help='输入Excel文件路径 (默认: F:\\ai_program_2\\udio_analyze\\music_prompt.xlsx)')
+    parser.add_argument('input_files', nargs='*',
+                        help='输入Excel文件路径，也可以是多个块文件、通配符或目录，会先合并去重 (默认: F:\\ai_program_2\\udio_analyze\\music_prompt.xlsx)')
     
     parser.add_argument('-o', '--output', dest='output_dir',
                         help='输出目录路径 (默认: 自动创建时间戳目录)')
@@ -154,11 +529,95 @@ def main():
                         choices=['clean', 'categorize', 'frequency', 'consistency', 'report'],
                         help='跳过指定的分析步骤 (可选: clean, categorize, frequency, consistency, report)')
     
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'pyinstrument'],
+                        help='采集各阶段性能剖析数据并保存到输出目录的profile子目录 (默认引擎: cprofile)')
+    
+    parser.add_argument('--min-support', type=int, default=1,
+                        help='词频统计中保留的最低频次，低于该频次的长尾词在计数时剪除 (默认: 1)')
+    
+    parser.add_argument('--dedup', dest='dedup_mode', choices=['collapse', 'weight'],
+                        help='在清洗和分类之间检测近似重复prompt: collapse每簇只保留一行，weight按1/簇大小加权词频')
+    
+    parser.add_argument('--build-index', action='store_true',
+                        help='构建提示词相似度索引并保存到输出目录的similarity_index子目录')
+    
+    parser.add_argument('--bootstrap', dest='bootstrap_resamples', type=int, default=0,
+                        help='一致性指标的自助法重采样次数，计算均值、中位数及类别差值的置信区间 (默认: 0，不计算)')
+    
+    parser.add_argument('--seed', type=int,
+                        help='随机种子，固定后自助法结果可复现且与进程数无关')
+    
+    parser.add_argument('--categories', dest='category_file',
+                        help='使用自定义分类词典Excel文件 (默认: 在输出目录中创建默认词典)')
+    
+    parser.add_argument('--mine-vocabulary', action='store_true',
+                        help='从other列挖掘高频未分类词并生成候选词典差异')
+    
+    parser.add_argument('--format', dest='output_format', choices=list(writers.FORMATS), default=writers.DEFAULT_FORMAT,
+                        help='分类结果、词频、词对和一致性等中间结果的文件格式 (默认: xlsx，综合报告始终为xlsx)')
+    
+    parser.add_argument('--heatmap-words', type=int, default=30,
+                        help='词对热力图包含的高频词数量K，绘制K x K共现矩阵 (默认: 30)')
+    
+    parser.add_argument('--heatmap-metric', choices=['Frequency', 'NPMI'], default='Frequency',
+                        help='词对热力图的取值: 共现行数或NPMI (默认: Frequency)')
+    
+    parser.add_argument('--heatmap-cluster', action='store_true',
+                        help='按层次聚类顺序排列热力图的行列，使关联紧密的词相邻')
+    
+    parser.add_argument('--ngram-max', type=int, default=4,
+                        help='prompt有序短语分析的最大词数，统计2~N词的短语频率 (默认: 4，小于2时不分析)')
+    
+    parser.add_argument('--segments', nargs='*', choices=segment_analyzer.DIMENSIONS,
+                        help='按艺术家(artist)、时长区间(duration)或来源块(block)分组统计分布和一致性 (不带参数时为全部)')
+    
+    parser.add_argument('--language-filter', action='store_true',
+                        help='清洗时按字符n-gram识别每条prompt的语言: 英语保留全部字母词，其他语言只保留分类词典中的词 (代替英语词表过滤)')
+    
+    parser.add_argument('--sample', type=float,
+                        help='只分析一个样本: 小于1为比例，否则为行数；输出 sample_estimates 给出总体词频和一致性的估计值及95%%置信区间')
+    
+    parser.add_argument('--sample-method', choices=sampling.SAMPLE_METHODS, default='uniform',
+                        help='抽样方式: uniform简单随机，month/artist按月份/艺术家分层，reservoir流式读取输入的蓄水池抽样(样本大小需为行数) (默认: uniform)')
+    
+    parser.add_argument('--compare', nargs='+', metavar='INPUT',
+                        help='与另一组输入(文件、块文件、通配符或目录)比较: 两侧合并后只运行一次分析，输出comparison比较结果')
+    
+    parser.add_argument('--compare-labels', nargs=2, metavar=('FIRST', 'SECOND'),
+                        help='比较的两侧名称 (默认: 两侧各为单个文件时用文件名，否则为A和B；按时间切分时为<时间和>=时间)')
+    
+    parser.add_argument('--compare-split', metavar='TIME',
+                        help='按time列在该时间点(如 2024-06-01)把输入切分为两个时间窗口并比较')
+    
+    parser.add_argument('--resume', dest='resume_dir',
+                        help='在指定的输出目录中继续之前失败或中断的运行，使用运行清单中记录的参数，跳过已完成的阶段')
+    
     # 解析命令行参数
     args = parser.parse_args()
     
+    if args.compare and args.compare_split:
+        parser.error('--compare 和 --compare-split 不能同时使用')
+    
+    # 继续之前的运行: 参数全部取自运行清单
+    if args.resume_dir:
+        options = profiler.load_run_manifest(args.resume_dir).get('options')
+        if not options:
+            print(f"错误: {args.resume_dir} 中没有可继续的运行清单")
+            sys.exit(1)
+        run_full_analysis(output_dir=args.resume_dir, resume=True, **options)
+        return
+    
     # 运行分析
-    run_full_analysis(args.input_file, args.output_dir, args.skip_steps)
+    input_files = args.input_files or ["F:\\ai_program_2\\udio_analyze\\music_prompt.xlsx"]
+    input_file = input_files[0] if len(input_files) == 1 else input_files
+    run_full_analysis(input_file, args.output_dir, args.skip_steps, args.profile, args.min_support,
+                      args.dedup_mode, args.build_index, args.bootstrap_resamples, args.seed, args.category_file,
+                      args.mine_vocabulary, args.output_format, args.heatmap_words, args.heatmap_metric,
+                      args.heatmap_cluster, args.ngram_max,
+                      list(segment_analyzer.DIMENSIONS) if args.segments == [] else args.segments,
+                      args.language_filter, args.sample, args.sample_method,
+                      (args.compare[0] if len(args.compare) == 1 else args.compare) if args.compare else None,
+                      args.compare_labels, args.compare_split)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
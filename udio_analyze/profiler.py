@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import platform
+import contextlib
+import functools
+import inspect
+import cProfile
+import pstats
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MANIFEST_FILE = 'run_manifest.json'
+
+# 当前激活的profiler，各模块通过 profiler.span() 记录计时区段
+_active_profiler = None
+
+def peak_rss_mb():
+    """返回当前进程的内存峰值(MB)，无法获取时返回None"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS单位为字节
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    return None
+
+def load_run_manifest(output_dir):
+    """读取输出目录中的运行清单，不存在或损坏时返回空字典"""
+    manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_file):
+        try:
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def update_run_manifest(output_dir, updates):
+    """把updates合并写入输出目录中的运行清单(JSON)"""
+    manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = load_run_manifest(output_dir)
+    manifest.update(updates)
+
+    # 先写临时文件再替换，避免中途失败留下损坏的清单
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_file, manifest_file)
+    return manifest_file
+
+class RunProfiler:
+    """记录分析流程中嵌套的计时区段、数据行数和内存峰值，可选采集cProfile/pyinstrument数据"""
+
+    def __init__(self, profile_engine=None, profile_dir=None):
+        self.profile_engine = profile_engine
+        self.profile_dir = profile_dir
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self.root = self._new_node('run')
+        self._stack = [self.root]
+        self._capture_count = 0
+
+    def _new_node(self, name, rows=None):
+        return {
+            'name': name,
+            'start_s': round(time.perf_counter() - self._t0, 6),
+            'duration_s': None,
+            'rows': rows,
+            'peak_rss_mb': None,
+            'children': []
+        }
+
+    @contextlib.contextmanager
+    def span(self, name, rows=None, capture=False):
+        """记录一个计时区段；capture=True时对该区段采集性能剖析数据"""
+        node = self._new_node(name, rows)
+        self._stack[-1]['children'].append(node)
+        self._stack.append(node)
+
+        capture_state = self._start_capture() if capture and self.profile_engine else None
+        start_time = time.perf_counter()
+        try:
+            yield node
+        finally:
+            node['duration_s'] = round(time.perf_counter() - start_time, 6)
+            node['peak_rss_mb'] = peak_rss_mb()
+            if capture_state is not None:
+                node['profile_files'] = self._stop_capture(capture_state, name)
+            self._stack.pop()
+
+    def _start_capture(self):
+        """开始采集性能剖析数据"""
+        if self.profile_engine == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("未安装pyinstrument，改用cProfile采集性能数据")
+                self.profile_engine = 'cprofile'
+            else:
+                capture = Profiler()
+                capture.start()
+                return capture
+
+        capture = cProfile.Profile()
+        capture.enable()
+        return capture
+
+    def _stop_capture(self, capture, name):
+        """停止采集并把剖析数据写入profile目录，返回生成的文件列表"""
+        self._capture_count += 1
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base_name = os.path.join(self.profile_dir, f"{self._capture_count:02d}_{name}")
+        files = []
+
+        if isinstance(capture, cProfile.Profile):
+            capture.disable()
+            # .prof 可用 snakeviz / flameprof / gprof2dot 生成火焰图
+            capture.dump_stats(base_name + '.prof')
+            files.append(base_name + '.prof')
+            with open(base_name + '.txt', 'w', encoding='utf-8') as f:
+                stats = pstats.Stats(capture, stream=f)
+                stats.sort_stats('cumulative').print_stats(40)
+            files.append(base_name + '.txt')
+        else:
+            capture.stop()
+            with open(base_name + '.html', 'w', encoding='utf-8') as f:
+                f.write(capture.output_html())
+            files.append(base_name + '.html')
+            try:
+                from pyinstrument.renderers import SpeedscopeRenderer
+                # speedscope格式的火焰图数据，可在 https://www.speedscope.app 打开
+                with open(base_name + '.speedscope.json', 'w', encoding='utf-8') as f:
+                    f.write(capture.output(renderer=SpeedscopeRenderer()))
+                files.append(base_name + '.speedscope.json')
+            except ImportError:
+                pass
+
+        return [os.path.basename(f) for f in files]
+
+    def summary(self):
+        """返回运行清单中的性能部分"""
+        self.root['duration_s'] = round(time.perf_counter() - self._t0, 6)
+        self.root['peak_rss_mb'] = peak_rss_mb()
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'total_seconds': self.root['duration_s'],
+            'peak_rss_mb': self.root['peak_rss_mb'],
+            'profile_engine': self.profile_engine,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'spans': self.root['children']
+        }
+
+    def print_summary(self, max_depth=2):
+        """打印各阶段耗时"""
+        def _print(nodes, depth):
+            for node in nodes:
+                rows = f"  {node['rows']} 行" if node['rows'] is not None else ''
+                duration = node['duration_s'] or 0
+                print(f"{'  ' * depth}{node['name']:<{40 - 2 * depth}} {duration:>9.3f} 秒{rows}")
+                if depth + 1 < max_depth:
+                    _print(node['children'], depth + 1)
+
+        print("各阶段耗时:")
+        _print(self.root['children'], 0)
+
+def activate(run_profiler):
+    """设置当前激活的profiler，返回之前的profiler"""
+    global _active_profiler
+    previous = _active_profiler
+    _active_profiler = run_profiler
+    return previous
+
+def span(name, rows=None, capture=False):
+    """在当前激活的profiler中记录计时区段，没有激活的profiler时不做任何记录"""
+    if _active_profiler is None:
+        return contextlib.nullcontext({})
+    return _active_profiler.span(name, rows, capture)
+
+def current_span():
+    """返回当前激活的profiler中正在记录的区段(字典)，没有时返回None"""
+    if _active_profiler is None or len(_active_profiler._stack) < 2:
+        return None
+    return _active_profiler._stack[-1]
+
+def traced(name_template):
+    """装饰器: 把函数调用记录为计时区段，区段名可引用函数参数，如 'word_pairs[{column_name}]'"""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active_profiler is None:
+                return func(*args, **kwargs)
+            bound = signature.bind_partial(*args, **kwargs)
+            try:
+                name = name_template.format(**bound.arguments)
+            except (KeyError, IndexError):
+                name = name_template
+            with _active_profiler.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,6 +1,7 @@
 import pandas as pd
 from collections import Counter
-import re
+
+import tokenizer
 
 def analyze_prompts():
     try:
@@ -22,15 +23,13 @@ def analyze_prompts():
         avg_length = sum(prompt_lengths) / len(prompt_lengths) if prompt_lengths else 0
         print(f"提示词平均长度: {avg_length:.1f} 字符")
         
-        # 提取常见词汇
-        all_words = []
-        for prompt in prompts:
-            # 将提示词分割成单词
-            words = re.findall(r'\b\w+\b', prompt.lower())
-            all_words.extend(words)
+        # 提取常见词汇: 批量分词后直接计数
+        word_counts = Counter()
+        for words in tokenizer.tokenize_batch(prompts):
+            word_counts.update(words)
         
         # 计算最常见的词
-        common_words = Counter(all_words).most_common(20)
+        common_words = word_counts.most_common(20)
         
         # 输出结果
         print("\n最常见的20个词:")
@@ -1,11 +1,43 @@
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
-import numpy as np
+import functools
 from datetime import datetime
 
-def generate_analysis_report(input_file, output_dir=None):
-    """生成综合分析报告"""
+import data_io
+import profiler
+import shared_artifacts
+import writers
+
+def _result_tables(output_dir, suffix, in_memory=None):
+    """报告中的一组结果表 {名称: 返回DataFrame的函数}
+
+    有内存中的分析结果(results.FrequencyResult/PairResult的字典)时直接使用，否则读取输出目录中
+    名称以suffix结尾的结果文件。
+    """
+    if in_memory:
+        return {name: result.to_frame for name, result in in_memory.items()}
+    return {
+        name: functools.partial(data_io.read_data, file_path)
+        for name, file_path in writers.list_outputs(output_dir).items() if name.endswith(suffix)
+    }
+
+def corpus_summary(df):
+    """报告摘要中的数据统计: 总行数、有效提示词数量和平均提示词长度"""
+    if 'cleaned_prompt' not in df.columns:
+        return {'rows': len(df), 'valid_prompts': 0, 'avg_prompt_length': 0}
+    return {
+        'rows': len(df),
+        'valid_prompts': int(df['cleaned_prompt'].notna().sum()),
+        'avg_prompt_length': df['cleaned_prompt'].str.len().mean()
+    }
+
+def generate_analysis_report(input_file, output_dir=None, analysis_results=None, summary=None):
+    """生成综合分析报告
+
+    analysis_results为同一次运行中各阶段返回的 results.AnalysisResults，其中已有的词频、短语、词对和
+    一致性结果直接写入报告，缺少的部分(如继续之前的运行时已完成的阶段)从输出目录中的结果文件读取。
+    summary为 corpus_summary 格式的数据统计时(如监视模式的聚合结果)不再读取input_file。
+    """
     
     print("开始生成综合分析报告...")
     
@@ -19,7 +51,11 @@ def generate_analysis_report(input_file, output_dir=None):
     
     try:
         # 读取原始数据
-        df = pd.read_excel(input_file)
+        if summary is None:
+            with profiler.span('read_data') as span:
+                df = data_io.read_data(input_file, stage='report')
+                span['rows'] = len(df)
+            summary = corpus_summary(df)
         
         # 报告文件名
         report_file = os.path.join(output_dir, 'music_prompt_analysis_report.xlsx')
@@ -32,30 +68,53 @@ def generate_analysis_report(input_file, output_dir=None):
         print("正在生成数据摘要...")
         
         # 计算基本统计信息
-        total_rows = len(df)
-        valid_prompts = df['cleaned_prompt'].notna().sum() if 'cleaned_prompt' in df.columns else 0
-        avg_prompt_len = df['cleaned_prompt'].str.len().mean() if 'cleaned_prompt' in df.columns else 0
+        total_rows = summary['rows']
+        valid_prompts = summary['valid_prompts']
+        avg_prompt_len = summary['avg_prompt_length']
+        
+        # 词频阶段写出了共享计数时直接从内存映射的数组取最常见的词
+        column_counts = shared_artifacts.open_counts(shared_artifacts.artifact_dir(output_dir))
+        
+        def top_counted(column):
+            result = analysis_results.frequency(column) if analysis_results is not None else None
+            if result is not None:
+                return result.words[0] if len(result) > 0 else '未知'
+            if column_counts is None or column not in column_counts.columns:
+                return '未知'
+            words, _ = column_counts.top_n(column, 1)
+            return words[0] if len(words) > 0 else '未知'
+        
+        has_counts = column_counts is not None or (analysis_results is not None and analysis_results.frequencies)
         
         # 尝试加载词频数据
         try:
-            prompt_freq_file = os.path.join(output_dir, "prompt_word_frequency.xlsx")
-            if os.path.exists(prompt_freq_file):
-                prompt_freq = pd.read_excel(prompt_freq_file)
-                top_word = prompt_freq['Word'].iloc[0] if len(prompt_freq) > 0 else '未知'
+            if has_counts:
+                top_word = top_counted('cleaned_prompt')
             else:
-                top_word = '未知'
+                # 中间结果可能是任一输出格式(xlsx/csv/parquet/json)
+                prompt_freq_file = writers.find_output(output_dir, "prompt_word_frequency")
+                if prompt_freq_file is not None:
+                    prompt_freq = data_io.read_data(prompt_freq_file)
+                    top_word = prompt_freq['Word'].iloc[0] if len(prompt_freq) > 0 else '未知'
+                else:
+                    top_word = '未知'
         except:
             top_word = '未知'
         
         # 尝试加载类别词频数据
         try:
-            genres_file = os.path.join(output_dir, "prompt_genres_frequency.xlsx")
-            emotions_file = os.path.join(output_dir, "prompt_emotions_frequency.xlsx")
-            narrative_file = os.path.join(output_dir, "prompt_narrative_frequency.xlsx")
+            if has_counts:
+                top_genre = top_counted('prompt_genres')
+                top_emotion = top_counted('prompt_emotions')
+                top_narrative = top_counted('prompt_narrative')
+            else:
+                genres_file = writers.find_output(output_dir, "prompt_genres_frequency")
+                emotions_file = writers.find_output(output_dir, "prompt_emotions_frequency")
+                narrative_file = writers.find_output(output_dir, "prompt_narrative_frequency")
             
-            top_genre = pd.read_excel(genres_file)['Word'].iloc[0] if os.path.exists(genres_file) else '未知'
-            top_emotion = pd.read_excel(emotions_file)['Word'].iloc[0] if os.path.exists(emotions_file) else '未知'
-            top_narrative = pd.read_excel(narrative_file)['Word'].iloc[0] if os.path.exists(narrative_file) else '未知'
+                top_genre = data_io.read_data(genres_file)['Word'].iloc[0] if genres_file else '未知'
+                top_emotion = data_io.read_data(emotions_file)['Word'].iloc[0] if emotions_file else '未知'
+                top_narrative = data_io.read_data(narrative_file)['Word'].iloc[0] if narrative_file else '未知'
         except:
             top_genre = top_emotion = top_narrative = '未知'
         
@@ -98,14 +157,18 @@ def generate_analysis_report(input_file, output_dir=None):
         print("正在添加词频分析结果...")
         
         # 加载词频数据
-        for file_name in os.listdir(output_dir):
-            if file_name.endswith('_frequency.xlsx') and not file_name.endswith('_heatmap.xlsx'):
+        frequency_tables = _result_tables(
+            output_dir, '_frequency',
+            {**analysis_results.frequencies, **analysis_results.phrases} if analysis_results is not None else None
+        )
+        with profiler.span('frequency_sheets'):
+            for name, load_table in frequency_tables.items():
                 try:
-                    sheet_name = os.path.splitext(file_name)[0]
+                    sheet_name = name
                     if len(sheet_name) > 31:  # Excel工作表名称长度限制
                         sheet_name = sheet_name[:31]
                     
-                    freq_df = pd.read_excel(os.path.join(output_dir, file_name))
+                    freq_df = load_table()
                     freq_df.to_excel(writer, sheet_name=sheet_name, index=False)
                     
                     # 格式化工作表
@@ -137,20 +200,22 @@ def generate_analysis_report(input_file, output_dir=None):
                     sheet.insert_chart('D2', chart, {'x_scale': 1.5, 'y_scale': 1})
                     
                 except Exception as e:
-                    print(f"添加 {file_name} 时出错: {e}")
+                    print(f"添加 {name} 时出错: {e}")
         
         # 添加词对分析结果
         print("正在添加词对分析结果...")
         
         # 加载词对数据
-        for file_name in os.listdir(output_dir):
-            if '_pairs.xlsx' in file_name and not '_heatmap.xlsx' in file_name:
+        pair_tables = _result_tables(output_dir, '_pairs',
+                                     analysis_results.pairs if analysis_results is not None else None)
+        with profiler.span('pair_sheets'):
+            for name, load_table in pair_tables.items():
                 try:
-                    sheet_name = os.path.splitext(file_name)[0]
+                    sheet_name = name
                     if len(sheet_name) > 31:  # Excel工作表名称长度限制
                         sheet_name = sheet_name[:31]
                     
-                    pairs_df = pd.read_excel(os.path.join(output_dir, file_name))
+                    pairs_df = load_table()
                     pairs_df.to_excel(writer, sheet_name=sheet_name, index=False)
                     
                     # 格式化工作表
@@ -164,47 +229,50 @@ def generate_analysis_report(input_file, output_dir=None):
                         sheet.write(0, col_num, value, header_format)
                     
                 except Exception as e:
-                    print(f"添加 {file_name} 时出错: {e}")
+                    print(f"添加 {name} 时出错: {e}")
         
         # 添加一致性分析结果
         print("正在添加一致性分析结果...")
         
         # 加载一致性摘要数据
-        consistency_file = os.path.join(output_dir, 'tag_prompt_consistency_summary.xlsx')
-        if os.path.exists(consistency_file):
-            try:
-                consistency_df = pd.read_excel(consistency_file)
-                consistency_df.to_excel(writer, sheet_name='一致性摘要', index=False)
+        with profiler.span('consistency_sheet'):
+            consistency_df = analysis_results.consistency_summary() if analysis_results is not None else None
+            consistency_file = writers.find_output(output_dir, 'tag_prompt_consistency_summary') if consistency_df is None else None
+            if consistency_df is not None or consistency_file is not None:
+                try:
+                    if consistency_df is None:
+                        consistency_df = data_io.read_data(consistency_file)
+                    consistency_df.to_excel(writer, sheet_name='一致性摘要', index=False)
                 
-                # 格式化工作表
-                sheet = writer.sheets['一致性摘要']
-                sheet.set_column('A:H', 12)
+                    # 格式化工作表
+                    sheet = writer.sheets['一致性摘要']
+                    sheet.set_column('A:H', 12)
                 
-                # 应用标题格式
-                for col_num, value in enumerate(consistency_df.columns.values):
-                    sheet.write(0, col_num, value, header_format)
+                    # 应用标题格式
+                    for col_num, value in enumerate(consistency_df.columns.values):
+                        sheet.write(0, col_num, value, header_format)
                 
-                # 添加条形图
-                chart = workbook.add_chart({'type': 'column'})
+                    # 添加条形图
+                    chart = workbook.add_chart({'type': 'column'})
                 
-                # 设置图表数据范围
-                row_count = len(consistency_df)
-                chart.add_series({
-                    'name': 'Jaccard相似度',
-                    'categories': f'=一致性摘要!$A$2:$A${row_count+1}',
-                    'values': f'=一致性摘要!$B$2:$B${row_count+1}',
-                })
+                    # 设置图表数据范围
+                    row_count = len(consistency_df)
+                    chart.add_series({
+                        'name': 'Jaccard相似度',
+                        'categories': f'=一致性摘要!$A$2:$A${row_count+1}',
+                        'values': f'=一致性摘要!$B$2:$B${row_count+1}',
+                    })
                 
-                # 设置图表标题和标签
-                chart.set_title({'name': '各类别Jaccard相似度'})
-                chart.set_x_axis({'name': '类别'})
-                chart.set_y_axis({'name': '相似度'})
+                    # 设置图表标题和标签
+                    chart.set_title({'name': '各类别Jaccard相似度'})
+                    chart.set_x_axis({'name': '类别'})
+                    chart.set_y_axis({'name': '相似度'})
                 
-                # 插入图表
-                sheet.insert_chart('J2', chart, {'x_scale': 1.2, 'y_scale': 1})
+                    # 插入图表
+                    sheet.insert_chart('J2', chart, {'x_scale': 1.2, 'y_scale': 1})
                 
-            except Exception as e:
-                print(f"添加一致性摘要时出错: {e}")
+                except Exception as e:
+                    print(f"添加一致性摘要时出错: {e}")
         
         # 添加信息工作表
         print("正在添加报告信息...")
@@ -214,7 +282,7 @@ def generate_analysis_report(input_file, output_dir=None):
             '项目': ['报告生成时间', '数据文件', '分析脚本版本'],
             '值': [
                 datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                os.path.basename(input_file),
+                data_io.source_name(input_file),
                 '1.0'
             ]
         }
@@ -233,7 +301,8 @@ def generate_analysis_report(input_file, output_dir=None):
             info_sheet.write(0, col_num, value, header_format)
         
         # 保存并关闭
-        writer.close()
+        with profiler.span('save_workbook'):
+            writer.close()
         
         print(f"综合分析报告已生成: {report_file}")
         
@@ -243,15 +312,15 @@ def generate_analysis_report(input_file, output_dir=None):
         print(f"生成报告过程中出错: {e}")
         return None
 
-def generate_report(input_file, output_dir=None):
-    """生成分析报告的入口函数"""
+def generate_report(input_file, output_dir=None, analysis_results=None, summary=None):
+    """生成分析报告的入口函数，analysis_results和summary见 generate_analysis_report"""
     
     if output_dir is None:
         output_dir = os.path.dirname(input_file)
         if not output_dir:
             output_dir = '.'
     
-    return generate_analysis_report(input_file, output_dir)
+    return generate_analysis_report(input_file, output_dir, analysis_results, summary)
 
 if __name__ == "__main__":
     # 测试函数
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+# 一致性摘要的列(与 consistency_analyzer.summarize_consistency 相同)
+SUMMARY_COLUMNS = ['category', 'jaccard_mean', 'jaccard_median', 'jaccard_std',
+                   'overlap_mean', 'overlap_median', 'overlap_std', 'count']
+
+class FrequencyResult:
+    """一列的高频词(或短语)及频次，name为对应的输出文件名(不含扩展名)，total为该列的总词数"""
+
+    __slots__ = ('name', 'column', 'words', 'counts', 'total', 'label')
+
+    def __init__(self, name, column, words, counts, total, label='Word'):
+        self.name = name
+        self.column = column
+        self.words = words
+        self.counts = counts
+        self.total = total
+        self.label = label
+
+    @classmethod
+    def from_counts(cls, name, column, column_counts, top_n=30):
+        """由 frequency_engine.ColumnCounts 取一列的前top_n个词"""
+        words, counts = column_counts.top_n(column, top_n)
+        return cls(name, column, np.asarray(words, dtype=object), np.asarray(counts),
+                   column_counts.total(column))
+
+    @classmethod
+    def from_ngrams(cls, name, column, ngram_counts, n, top_n=30):
+        """由 frequency_engine.NgramCounts 取n词短语的前top_n个，total为文本中n词短语的总数"""
+        phrases_df = ngram_counts.top_n(n, top_n)
+        return cls(name, column, phrases_df['Phrase'].to_numpy(dtype=object), phrases_df['Frequency'].to_numpy(),
+                   ngram_counts.total(n), label='Phrase')
+
+    def __len__(self):
+        return len(self.words)
+
+    def to_frame(self):
+        """与写出的词频文件相同的表: Word(或Phrase)、Frequency"""
+        return pd.DataFrame({self.label: self.words, 'Frequency': self.counts})
+
+class PairResult:
+    """按共现次数排列的前n个词对及其关联度指标；associations为完整的 association.PairAssociations，可按其他指标重新排序"""
+
+    __slots__ = ('name', 'columns', 'labels', 'first', 'second', 'metrics', 'associations')
+
+    def __init__(self, name, columns, labels, first, second, metrics, associations=None):
+        self.name = name
+        self.columns = columns
+        self.labels = labels
+        self.first = first
+        self.second = second
+        self.metrics = metrics
+        self.associations = associations
+
+    @classmethod
+    def from_associations(cls, name, columns, associations, top_n=30, labels=('Word 1', 'Word 2')):
+        index = associations.top_index('Frequency', top_n)
+        return cls(
+            name, tuple(columns), tuple(labels),
+            associations.row_vocabulary[associations.rows[index]],
+            associations.col_vocabulary[associations.cols[index]],
+            {metric: values[index] for metric, values in associations.metrics.items()},
+            associations
+        )
+
+    def __len__(self):
+        return len(self.first)
+
+    @property
+    def total_pairs(self):
+        """所有词对的共现次数之和"""
+        return int(self.associations.metrics['Frequency'].sum()) if self.associations is not None else None
+
+    def to_frame(self):
+        """与写出的词对文件相同的表: 两个词、Frequency和各关联度指标(保留4位小数)"""
+        result = pd.DataFrame({self.labels[0]: self.first, self.labels[1]: self.second})
+        for metric, values in self.metrics.items():
+            result[metric] = values if metric == 'Frequency' else np.round(values, 4)
+        return result
+
+    def rank(self, metric, n=30, min_count=1):
+        """按其他指标(PMI、NPMI、Lift、Chi2)排序的前n个词对"""
+        return self.associations.top_n(metric, n, min_count, self.labels)
+
+class ConsistencyResult:
+    """一个类别每行的prompt/tag词数、共同词数、Jaccard相似度和重叠系数(两侧任一为空的行不计入)"""
+
+    __slots__ = ('category', 'row_ids', 'prompt_words', 'tag_words', 'common_words',
+                 'prompt_count', 'tag_count', 'common_count', 'jaccard', 'overlap')
+
+    def __init__(self, category, row_ids, prompt_words, tag_words, common_words,
+                 prompt_count, tag_count, common_count, jaccard, overlap):
+        self.category = category
+        self.row_ids = row_ids
+        self.prompt_words = prompt_words
+        self.tag_words = tag_words
+        self.common_words = common_words
+        self.prompt_count = prompt_count
+        self.tag_count = tag_count
+        self.common_count = common_count
+        self.jaccard = jaccard
+        self.overlap = overlap
+
+    @classmethod
+    def from_scores(cls, category, scores):
+        """由 consistency_analyzer.score_category 的结果构建"""
+        return cls(category, *(scores[column].to_numpy() for column in [
+            'row_id', 'prompt_words', 'tag_words', 'common_words', 'prompt_count', 'tag_count', 'common_count',
+            'jaccard_similarity', 'overlap_coefficient'
+        ]))
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def to_frame(self):
+        """与一致性详细数据文件相同的表"""
+        return pd.DataFrame({
+            'row_id': self.row_ids, 'category': self.category, 'prompt_words': self.prompt_words,
+            'tag_words': self.tag_words, 'common_words': self.common_words, 'prompt_count': self.prompt_count,
+            'tag_count': self.tag_count, 'common_count': self.common_count,
+            'jaccard_similarity': self.jaccard, 'overlap_coefficient': self.overlap
+        })
+
+    def summary(self):
+        """均值、中位数、标准差(样本标准差)和行数"""
+        def _std(values):
+            return float(np.std(values, ddof=1)) if len(values) > 1 else np.nan
+        return {
+            'category': self.category,
+            'jaccard_mean': float(np.mean(self.jaccard)), 'jaccard_median': float(np.median(self.jaccard)),
+            'jaccard_std': _std(self.jaccard),
+            'overlap_mean': float(np.mean(self.overlap)), 'overlap_median': float(np.median(self.overlap)),
+            'overlap_std': _std(self.overlap),
+            'count': len(self)
+        }
+
+class AnalysisResults:
+    """一次分析的全部结果: 分类后的数据、各列词频、短语、词对和各类别一致性(均按名称索引的字典)"""
+
+    __slots__ = ('data', 'frequencies', 'phrases', 'pairs', 'consistency')
+
+    def __init__(self, data=None, frequencies=None, phrases=None, pairs=None, consistency=None):
+        self.data = data
+        self.frequencies = frequencies if frequencies is not None else {}
+        self.phrases = phrases if phrases is not None else {}
+        self.pairs = pairs if pairs is not None else {}
+        self.consistency = consistency if consistency is not None else {}
+
+    def update(self, other):
+        """合并另一个阶段的结果(对方非空的部分覆盖本对象)"""
+        if other.data is not None:
+            self.data = other.data
+        self.frequencies.update(other.frequencies)
+        self.phrases.update(other.phrases)
+        self.pairs.update(other.pairs)
+        self.consistency.update(other.consistency)
+        return self
+
+    def frequency(self, column):
+        """按列名查找词频结果"""
+        for result in self.frequencies.values():
+            if result.column == column:
+                return result
+        return None
+
+    def consistency_details(self):
+        """各类别每行一致性的长表"""
+        frames = [result.to_frame() for result in self.consistency.values()]
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    def consistency_summary(self):
+        """每个类别一行的一致性摘要(按类别名排序)"""
+        if not self.consistency:
+            return None
+        return pd.DataFrame([self.consistency[category].summary() for category in sorted(self.consistency)],
+                            columns=SUMMARY_COLUMNS)
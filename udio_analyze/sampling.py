@@ -0,0 +1,388 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import consistency_analyzer
+import corpus_merge
+import data_io
+import frequency_engine
+import profiler
+import tokenizer
+import writers
+
+# 抽样方式: 简单随机、按月份分层、按艺术家分层、流式读取输入的蓄水池抽样
+SAMPLE_METHODS = ('uniform', 'month', 'artist', 'reservoir')
+STRATUM_COLUMNS = {'month': 'time', 'artist': 'artist'}
+
+# 样本语料文件名(无扩展名，格式见 data_io.write_corpus)
+SAMPLE_CORPUS_NAME = 'sample_corpus'
+
+# 按比例分配时预期样本少于该行数的层合并为一层，保证每层至少2行以估计方差
+MIN_STRATUM_SAMPLE = 2
+POOLED_STRATUM = '(合并的小层)'
+MISSING_STRATUM = '(缺失)'
+
+# 95%置信区间的正态分位数
+Z_95 = 1.959964
+
+# 估计总体频次的列
+ESTIMATE_COLUMNS = ['cleaned_prompt', 'cleaned_tags', 'prompt_genres', 'prompt_emotions', 'prompt_narrative',
+                    'tag_genres', 'tag_emotions', 'tag_narrative']
+
+# 流式读取CSV/JSONL输入时每次读取的行数
+DEFAULT_CHUNK_ROWS = 50000
+
+def target_size(size, n_rows):
+    """样本行数: size小于1时为比例，否则为行数(不超过总行数)"""
+    if size <= 0:
+        raise ValueError(f"样本大小必须大于0: {size}")
+    n = int(round(size * n_rows)) if size < 1 else int(size)
+    return max(1, min(n, n_rows))
+
+def stratum_labels(df, method):
+    """每行所属的层: uniform为同一层，month为time列的年月，artist为艺术家"""
+    if method not in STRATUM_COLUMNS:
+        return np.full(len(df), 'all', dtype=object)
+    column = STRATUM_COLUMNS[method]
+    if column not in df.columns:
+        raise ValueError(f"按 {method} 分层需要 {column} 列")
+    if method == 'month':
+        times = pd.to_datetime(df[column], errors='coerce', utc=True)
+        labels = times.dt.strftime('%Y-%m')
+    else:
+        labels = df[column].astype(object).astype(str).where(df[column].notna())
+    return labels.fillna(MISSING_STRATUM).to_numpy(dtype=object)
+
+def allocate(population, n):
+    """按比例把n行分配到各层(population为每层行数)，每层至少min(MIN_STRATUM_SAMPLE, 层行数)行"""
+    expected = n * population / population.sum()
+    allocation = np.rint(expected).astype(np.int64)
+    return np.clip(allocation, np.minimum(MIN_STRATUM_SAMPLE, population), population)
+
+def stratified_sample(df, size, method='uniform', seed=None):
+    """分层简单随机抽样(不放回)，返回样本并添加 sample_stratum 列和 sample_weight 列(该层总行数/样本行数)
+
+    预期样本不足 MIN_STRATUM_SAMPLE 行的小层合并为一层；uniform 只有一层，即简单随机抽样。
+    """
+    n = target_size(size, len(df))
+    labels = stratum_labels(df, method)
+    codes, names = pd.factorize(labels, sort=True)
+    population = np.bincount(codes, minlength=len(names))
+
+    small = n * population / len(df) < MIN_STRATUM_SAMPLE
+    if small.sum() > 1:
+        labels = np.where(small[codes], POOLED_STRATUM, labels)
+        codes, names = pd.factorize(labels, sort=True)
+        population = np.bincount(codes, minlength=len(names))
+    allocation = allocate(population, n)
+
+    # 每行一个随机键，按(层, 随机键)排序后取每层的前allocation行
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(df)), codes))
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, np.arange(len(names)))
+    rank = np.arange(len(df)) - starts[sorted_codes]
+    chosen = np.sort(order[rank < allocation[sorted_codes]])
+
+    sample = df.iloc[chosen].reset_index(drop=True)
+    sample['sample_stratum'] = np.asarray(names, dtype=object)[codes[chosen]]
+    sample['sample_weight'] = (population / np.maximum(allocation, 1))[codes[chosen]]
+    return sample
+
+def iter_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """按块读取一个输入文件: CSV和JSONL流式读取，其他格式整体读取为一块"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+    elif extension == '.jsonl':
+        with pd.read_json(path, orient='records', lines=True, chunksize=chunk_rows) as reader:
+            yield from reader
+    else:
+        yield data_io.read_data(path)
+
+def reservoir_sample(files, size, seed=None, chunk_rows=DEFAULT_CHUNK_ROWS, key='song_path'):
+    """蓄水池抽样: 逐块读取输入文件，只在内存中保留size行
+
+    每行一个均匀随机键，始终保留键最小的size行，结果与一次性简单随机抽样同分布。多个文件时
+    与 corpus_merge.merge_blocks 一样按key去重并添加source_block列，返回(样本, 去重后的总行数)。
+    """
+    if size < 1:
+        raise ValueError("蓄水池抽样需要指定样本行数(输入总行数事先未知)")
+    size = int(size)
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    reservoir_keys = np.zeros(0)
+    seen = set()
+    total = 0
+
+    for path in files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        for chunk in iter_chunks(path, chunk_rows):
+            if key in chunk.columns:
+                values = chunk[key]
+                duplicated = (values.duplicated() & values.notna()) | values.isin(seen)
+                chunk = chunk[~duplicated]
+                seen.update(chunk[key].dropna())
+            if len(files) > 1:
+                chunk = chunk.assign(source_block=name)
+            total += len(chunk)
+
+            candidates = chunk if reservoir is None else pd.concat([reservoir, chunk], ignore_index=True)
+            keys = np.concatenate([reservoir_keys, rng.random(len(chunk))])
+            if len(candidates) > size:
+                keep = np.sort(np.argpartition(keys, size - 1)[:size])
+                candidates, keys = candidates.iloc[keep], keys[keep]
+            reservoir, reservoir_keys = candidates.reset_index(drop=True), keys
+
+    if reservoir is None:
+        return pd.DataFrame(), 0
+    sample = reservoir.assign(sample_stratum='all', sample_weight=total / max(len(reservoir), 1))
+    return sample, total
+
+def draw_sample(input_file, output_file, size, method='uniform', seed=None):
+    """抽取样本并保存为语料文件(见 data_io.write_corpus)，返回(样本, 实际写入的文件)"""
+    print(f"正在抽样 ({method})...")
+
+    try:
+        if method == 'reservoir':
+            files = corpus_merge.expand_inputs(input_file)
+            with profiler.span('reservoir_sample') as span:
+                sample, total = reservoir_sample(files, size, seed)
+                span['rows'] = total
+        else:
+            if corpus_merge.needs_merge(input_file):
+                df, _, _ = corpus_merge.merge_blocks(corpus_merge.expand_inputs(input_file))
+                if df is None:
+                    return None, None
+            else:
+                with profiler.span('read_data') as span:
+                    df = data_io.read_data(input_file)
+                    span['rows'] = len(df)
+            total = len(df)
+            with profiler.span('stratified_sample', rows=total):
+                sample = stratified_sample(df, size, method, seed)
+
+        n_strata = sample['sample_stratum'].nunique()
+        print(f"从 {total} 行中抽取 {len(sample)} 行 ({len(sample) / max(total, 1):.2%})，共 {n_strata} 层")
+
+        with profiler.span('write_corpus', rows=len(sample)):
+            output_file = data_io.write_corpus(sample, output_file)
+        print(f"样本已保存到: {output_file}")
+        return sample, output_file
+
+    except Exception as e:
+        print(f"抽样过程中出错: {e}")
+        return None, None
+
+class SampleDesign:
+    """样本的分层设计: 每行的层编号，每层的总体行数和样本行数"""
+
+    __slots__ = ('codes', 'names', 'population', 'sampled')
+
+    def __init__(self, codes, names, population, sampled):
+        self.codes = codes
+        self.names = names
+        self.population = population
+        self.sampled = sampled
+
+    @classmethod
+    def from_frame(cls, df):
+        """从 sample_stratum 和 sample_weight 列恢复分层设计(每层权重之和即该层总体行数)"""
+        codes, names = pd.factorize(df['sample_stratum'], sort=True)
+        sampled = np.bincount(codes, minlength=len(names))
+        population = np.rint(np.bincount(codes, weights=df['sample_weight'].to_numpy(np.float64),
+                                         minlength=len(names)))
+        return cls(codes.astype(np.int64, copy=False), np.asarray(names, dtype=object), population, sampled)
+
+    def variance_factor(self):
+        """每层 N_h^2 (1 - n_h/N_h) / n_h，乘以层内样本方差即为该层对总量估计方差的贡献"""
+        n = np.maximum(self.sampled, 1)
+        return self.population ** 2 * (1 - self.sampled / np.maximum(self.population, 1)) / n
+
+    def summary(self):
+        return pd.DataFrame({
+            'Stratum': self.names,
+            'Population Rows': self.population.astype(np.int64),
+            'Sample Rows': self.sampled,
+            'Weight': np.round(self.population / np.maximum(self.sampled, 1), 4)
+        })
+
+def _stratum_variance(sums, squares, sampled):
+    """由层内总和与平方和计算样本方差(层内样本少于2行时为0)"""
+    return np.where(sampled > 1, (squares - sums ** 2 / np.maximum(sampled, 1)) / np.maximum(sampled - 1, 1), 0.0)
+
+def estimate_totals(encoded, design, row_weights=None):
+    """分层估计每个词在总体中的出现次数及其方差
+
+    encoded为 frequency_engine.encode_tokens 的结果。每个(行, 词)的次数y只在非零处计算，
+    每层的 sum(y) 和 sum(y^2) 由(层, 词)打包的int64键一次汇总，不展开 层 x 词表 的稠密矩阵。
+    返回(样本频次, 估计总体频次, 方差)，均按词ID索引。
+    """
+    doc_index, words, vocabulary = encoded
+    size = max(len(vocabulary), 1)
+    keys, y = np.unique(doc_index * size + words, return_counts=True)
+    rows, row_words = keys // size, keys % size
+    y = y.astype(np.float64)
+    if row_weights is not None:
+        y *= row_weights[rows]
+
+    pair_keys, inverse = np.unique(design.codes[rows] * size + row_words, return_inverse=True)
+    sums = np.bincount(inverse, weights=y)
+    squares = np.bincount(inverse, weights=y * y)
+    strata, pair_words = pair_keys // size, pair_keys % size
+
+    sampled = design.sampled[strata]
+    expansion = design.population[strata] / sampled
+    variance = _stratum_variance(sums, squares, sampled) * design.variance_factor()[strata]
+
+    return (np.bincount(row_words, weights=y, minlength=len(vocabulary)),
+            np.bincount(pair_words, weights=expansion * sums, minlength=len(vocabulary)),
+            np.bincount(pair_words, weights=variance, minlength=len(vocabulary)))
+
+def frequency_estimates(df, column, design, top_n=20, row_weights=None):
+    """一列估计频次最高的top_n个词: 样本频次、估计总体频次、95%置信区间、相对误差和估计占比"""
+    encoded = frequency_engine.encode_tokens([tokenizer.split_words(text) for text in df[column]])
+    vocabulary = encoded[2]
+    if len(vocabulary) == 0:
+        return None
+    sample, total, variance = estimate_totals(encoded, design, row_weights)
+
+    top = np.argsort(-total, kind='stable')[:top_n]
+    half_width = Z_95 * np.sqrt(variance[top])
+    return pd.DataFrame({
+        'Word': np.asarray(vocabulary, dtype=object)[top],
+        'Sample Frequency': np.round(sample[top], 4),
+        'Estimated Frequency': np.round(total[top], 1),
+        # 总体频次不会低于样本中观察到的频次
+        'Lower': np.round(np.maximum(total[top] - half_width, sample[top]), 1),
+        'Upper': np.round(total[top] + half_width, 1),
+        'Relative Error': np.round(half_width / np.maximum(total[top], 1e-12), 4),
+        'Estimated Share': np.round(total[top] / total.sum(), 4)
+    })
+
+def mean_estimate(values, design):
+    """分层样本中一个指标的总体均值估计(比率估计)，values中的NaN为不属于该子总体的行
+
+    方差用线性化: u = d(y - R)，d为是否属于子总体，Var(R) = sum_h N_h^2 (1-f_h) s_u,h^2 / n_h / N_d^2。
+    返回(样本行数, 估计均值, 置信下限, 置信上限)。
+    """
+    domain = ~np.isnan(values)
+    if not domain.any():
+        return 0, np.nan, np.nan, np.nan
+    weights = (design.population / np.maximum(design.sampled, 1))[design.codes]
+    domain_size = weights[domain].sum()
+    ratio = (weights[domain] * values[domain]).sum() / domain_size
+
+    u = np.where(domain, np.nan_to_num(values) - ratio, 0.0)
+    sums = np.bincount(design.codes, weights=u, minlength=len(design.names))
+    squares = np.bincount(design.codes, weights=u * u, minlength=len(design.names))
+    variance = (_stratum_variance(sums, squares, design.sampled) * design.variance_factor()).sum() / domain_size ** 2
+    half_width = Z_95 * np.sqrt(variance)
+    return int(domain.sum()), ratio, ratio - half_width, ratio + half_width
+
+def consistency_estimates(df, design):
+    """各类别Jaccard相似度和重叠系数的总体均值估计及95%置信区间"""
+    rows = []
+    for category in ['genres', 'emotions', 'narrative']:
+        prompt_col, tag_col = f'prompt_{category}', f'tag_{category}'
+        if prompt_col not in df.columns or tag_col not in df.columns:
+            continue
+        scores = consistency_analyzer.score_category(df, prompt_col, tag_col)
+        if scores is None:
+            continue
+        for metric in ['jaccard_similarity', 'overlap_coefficient']:
+            values = np.full(len(df), np.nan)
+            values[scores['row_id'].to_numpy()] = scores[metric].to_numpy(np.float64)
+            n, estimate, lower, upper = mean_estimate(values, design)
+            rows.append({'Category': category, 'Metric': metric, 'Sample Rows': n,
+                         'Estimate': estimate, 'Lower': lower, 'Upper': upper})
+    return pd.DataFrame(rows).round(4) if rows else None
+
+def analyze_sample_estimates(input_file, output_dir=None, top_n=20):
+    """由分类后的样本估计总体的词频和一致性(带95%置信区间)，结果保存为 sample_estimates 文件"""
+
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
+
+    try:
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='sample_estimates').reset_index(drop=True)
+            span['rows'] = len(df)
+
+        if 'sample_stratum' not in df.columns or 'sample_weight' not in df.columns:
+            print("数据中没有 sample_stratum/sample_weight 列，不是抽样运行的结果")
+            return False
+
+        if output_dir is None:
+            output_dir = os.path.dirname(input_file)
+            if not output_dir:
+                output_dir = '.'
+
+        # 确保输出目录存在
+        os.makedirs(output_dir, exist_ok=True)
+
+        design = SampleDesign.from_frame(df)
+        print(f"样本 {len(df)} 行，估计总体 {int(design.population.sum())} 行，共 {len(design.names)} 层")
+        row_weights = df['dedup_weight'].to_numpy(np.float64) if 'dedup_weight' in df.columns else None
+
+        sheets = {'design': design.summary()}
+        with profiler.span('frequency_estimates', rows=len(df)):
+            for column in ESTIMATE_COLUMNS:
+                if column in df.columns:
+                    estimates = frequency_estimates(df, column, design, top_n, row_weights)
+                    if estimates is not None:
+                        sheets[column] = estimates
+
+        with profiler.span('consistency_estimates', rows=len(df)):
+            consistency = consistency_estimates(df, design)
+        if consistency is not None:
+            sheets['consistency'] = consistency
+
+        for column in ['prompt_genres', 'tag_genres']:
+            if column in sheets:
+                top = sheets[column].head(5)
+                print(f"{column} 估计频次最高的词: " + ', '.join(
+                    f"{word} {estimate:.0f} [{lower:.0f}, {upper:.0f}]"
+                    for word, estimate, lower, upper in zip(top['Word'], top['Estimated Frequency'], top['Lower'], top['Upper'])
+                ))
+
+        with profiler.span('write_output'):
+            output_file = writers.save_sheets(sheets, os.path.join(output_dir, 'sample_estimates.xlsx'))
+        print(f"抽样估计结果已保存到: {output_file}")
+
+        return True
+
+    except Exception as e:
+        print(f"抽样估计过程中出错: {e}")
+        return False
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='抽取样本或由分类后的样本估计总体词频和一致性')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    draw_parser = subparsers.add_parser('draw', help='抽取样本')
+    draw_parser.add_argument('inputs', nargs='+', help='输入文件(蓄水池抽样时可以是多个块文件、通配符或目录)')
+    draw_parser.add_argument('--size', type=float, required=True, help='样本大小: 小于1为比例，否则为行数')
+    draw_parser.add_argument('--method', choices=SAMPLE_METHODS, default='uniform', help='抽样方式 (默认: uniform)')
+    draw_parser.add_argument('--seed', type=int, help='随机种子')
+    draw_parser.add_argument('-o', '--output', dest='output_file', default=SAMPLE_CORPUS_NAME, help='样本语料文件')
+
+    estimate_parser = subparsers.add_parser('estimate', help='由分类后的样本估计总体词频和一致性')
+    estimate_parser.add_argument('input_file', help='分类后的样本数据文件')
+    estimate_parser.add_argument('-o', '--output', dest='output_dir', help='输出目录 (默认: 输入文件所在目录)')
+    estimate_parser.add_argument('--top', type=int, default=20, help='每列输出的词数 (默认: 20)')
+    estimate_parser.add_argument('--format', dest='output_format', choices=list(writers.FORMATS),
+                                 default=writers.DEFAULT_FORMAT, help='输出格式 (默认: xlsx)')
+
+    args = parser.parse_args()
+    if args.command == 'draw':
+        inputs = args.inputs[0] if len(args.inputs) == 1 else args.inputs
+        draw_sample(inputs, args.output_file, args.size, args.method, args.seed)
+    else:
+        writers.set_format(args.output_format)
+        analyze_sample_estimates(args.input_file, args.output_dir, args.top)
+
+if __name__ == "__main__":
+    main()
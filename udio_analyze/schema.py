@@ -0,0 +1,113 @@
+import os
+import sys
+import argparse
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+# get_data.py 抓取的原始列
+RAW_COLUMNS = ['title', 'artist', 'time', 'duration', 'prompt', 'song_path', 'tags']
+
+CATEGORY_COLUMNS = [f"{prefix}_{category}" for prefix in ['prompt', 'tag']
+                    for category in ['genres', 'emotions', 'narrative', 'other']]
+
+# 参与一致性评分和词汇挖掘的类别: 结果中的类别名 -> 分类词典中的类别名
+CONSISTENCY_CATEGORIES = {
+    'genres': 'music_genres',
+    'emotions': 'music_emotions',
+    'narrative': 'narrative_elements'
+}
+
+# 各阶段需要读取的列；None 表示该阶段会把整张表写出，需要读取全部列
+STAGE_COLUMNS = {
+    'clean': None,
+    'dedup': None,
+    'categorize': None,
+    'similarity_index': ['cleaned_prompt', 'title', 'artist', 'prompt', 'tags', 'song_path'],
+    'frequency': ['cleaned_prompt', 'cleaned_tags', 'dedup_weight'] + CATEGORY_COLUMNS,
+    'consistency': [c for c in CATEGORY_COLUMNS if not c.endswith('_other')],
+    'vocab_mining': ['cleaned_prompt', 'cleaned_tags'] + CATEGORY_COLUMNS,
+    'segments': ['artist', 'duration', 'source_block'] + [c for c in CATEGORY_COLUMNS if not c.endswith('_other')],
+    'report': ['cleaned_prompt'],
+    'sample_estimates': ['cleaned_prompt', 'cleaned_tags', 'dedup_weight', 'sample_stratum', 'sample_weight'] + CATEGORY_COLUMNS,
+    'compare': ['time', 'compare_side', 'cleaned_prompt', 'cleaned_tags', 'dedup_weight'] + CATEGORY_COLUMNS,
+}
+
+# 低基数列使用category，数值和时间列使用紧凑类型
+CATEGORICAL_COLUMNS = ['artist', 'source_block', 'prompt_language', 'compare_side']
+FLOAT32_COLUMNS = ['duration', 'dedup_weight']
+DATETIME_COLUMNS = ['time']
+
+def text_dtype():
+    """文本列的类型: 安装pyarrow时使用pyarrow存储的字符串，否则保持object"""
+    if importlib.util.find_spec('pyarrow') is not None:
+        return 'string[pyarrow]'
+    return None
+
+def stage_columns(stage):
+    """返回某阶段需要读取的列，None表示全部列"""
+    return STAGE_COLUMNS.get(stage)
+
+def optimize_dtypes(df, lossless=False):
+    """把列转换为紧凑类型(原地修改并返回df): 低基数列category，duration为float32，time为datetime64，文本列为pyarrow字符串
+
+    lossless=True时只做不改变取值的转换(保留float64和原始的time)，用于会把整张表写回文件的阶段，
+    避免写出float32的舍入误差，以及time丢失时区、截断精度或把无法解析的值变为空值。
+    """
+    string_dtype = text_dtype()
+    for column in df.columns:
+        series = df[column]
+        if column in CATEGORICAL_COLUMNS:
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = series.astype('category')
+        elif column in FLOAT32_COLUMNS and not lossless:
+            df[column] = pd.to_numeric(series, errors='coerce').astype(np.float32)
+        elif column in DATETIME_COLUMNS and not lossless:
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                # 统一转换为UTC后去掉时区，Excel不支持带时区的时间
+                df[column] = pd.to_datetime(series, errors='coerce', utc=True).dt.tz_localize(None)
+        elif string_dtype is not None and series.dtype == object:
+            df[column] = series.astype(string_dtype)
+    return df
+
+def memory_mb(df):
+    """DataFrame占用的内存(MB，包含object列中字符串本身)"""
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+def memory_report(source, stages=None):
+    """比较每个阶段原先 read_excel 全部列(object)与按阶段投影+类型优化后的内存占用"""
+    import data_io
+
+    baseline = pd.read_excel(source) if isinstance(source, str) else source
+    baseline_mb = memory_mb(baseline)
+    rows = []
+    for stage in stages or STAGE_COLUMNS:
+        optimized = data_io.read_data(baseline, stage=stage)
+        optimized_mb = memory_mb(optimized)
+        rows.append({
+            'stage': stage,
+            'columns': len(optimized.columns),
+            'baseline_mb': round(baseline_mb, 2),
+            'optimized_mb': round(optimized_mb, 2),
+            'saving': f"{1 - optimized_mb / baseline_mb:.0%}" if baseline_mb else '0%'
+        })
+    return pd.DataFrame(rows)
+
+def main():
+    """命令行入口: 打印各阶段的内存对比"""
+    parser = argparse.ArgumentParser(description='各分析阶段读取数据的内存对比')
+    parser.add_argument('input_file', help='要比较的数据文件 (如 music_prompt_categorized.xlsx)')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGE_COLUMNS), help='只比较指定阶段')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_file):
+        print(f"错误: 输入文件 '{args.input_file}' 不存在")
+        sys.exit(1)
+
+    print(f"文本列类型: {text_dtype() or 'object (未安装pyarrow)'}")
+    report = memory_report(args.input_file, args.stages)
+    print(report.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
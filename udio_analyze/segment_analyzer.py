@@ -0,0 +1,203 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import consistency_analyzer
+import data_io
+import frequency_engine
+import profiler
+import tokenizer
+import writers
+
+# 可用的分组维度: 艺术家、时长区间、来源块(合并块文件时添加的source_block列)
+DIMENSIONS = ('artist', 'duration', 'block')
+DIMENSION_COLUMNS = {'artist': 'artist', 'duration': 'duration', 'block': 'source_block'}
+
+# 时长区间(秒)
+DURATION_BINS = [0, 60, 120, 180, 240, 300, 420, np.inf]
+DURATION_LABELS = ['<1:00', '1:00-2:00', '2:00-3:00', '3:00-4:00', '4:00-5:00', '5:00-7:00', '>=7:00']
+
+# 按组统计分布的分类列
+SEGMENT_COLUMNS = ['prompt_genres', 'prompt_emotions', 'prompt_narrative', 'tag_genres', 'tag_emotions', 'tag_narrative']
+
+def segment_codes(df, dimension):
+    """计算每行所属的组，返回(组编号数组(缺失为-1), 组名数组)"""
+    column = DIMENSION_COLUMNS[dimension]
+    if dimension == 'duration':
+        buckets = pd.cut(pd.to_numeric(df[column], errors='coerce'), DURATION_BINS, right=False,
+                         labels=DURATION_LABELS)
+        return buckets.cat.codes.to_numpy().astype(np.int64), np.asarray(DURATION_LABELS, dtype=object)
+    codes, labels = pd.factorize(df[column], sort=True)
+    return codes.astype(np.int64, copy=False), np.asarray(labels, dtype=object)
+
+class GroupedCounts:
+    """一列按组的词频: 每个(组, 词)一条记录，按组、再按频次降序排列"""
+
+    __slots__ = ('groups', 'words', 'counts', 'group_totals', 'vocabulary')
+
+    def __init__(self, groups, words, counts, group_totals, vocabulary):
+        self.groups = groups
+        self.words = words
+        self.counts = counts
+        self.group_totals = group_totals
+        self.vocabulary = vocabulary
+
+    def top_n(self, n, labels):
+        """每组出现最多的n个词(同频次按词ID)，返回长表: 组、名次、词、频次、占该组词数的比例"""
+        # 记录已按(组, -频次, 词ID)排序，组内名次 = 位置 - 该组第一条记录的位置
+        starts = np.flatnonzero(np.r_[True, self.groups[1:] != self.groups[:-1]]) if len(self.groups) else np.zeros(0, dtype=np.int64)
+        first = np.repeat(starts, np.diff(np.r_[starts, len(self.groups)]))
+        rank = np.arange(len(self.groups)) - first
+        keep = rank < n
+        groups = self.groups[keep]
+        counts = self.counts[keep]
+        return pd.DataFrame({
+            'Segment': labels[groups],
+            'Rank': rank[keep] + 1,
+            'Word': self.vocabulary[self.words[keep]],
+            'Frequency': counts,
+            'Share': np.round(counts / self.group_totals[groups], 4)
+        })
+
+def encode_columns(df):
+    """把各分类列展开并编码为(每个词所在行号, 词ID, 词表)，各分组维度共用"""
+    return {
+        column: frequency_engine.encode_tokens([tokenizer.split_words(text) for text in df[column]])
+        for column in SEGMENT_COLUMNS if column in df.columns
+    }
+
+def row_consistency(df):
+    """每行每个类别的一致性(consistency_analyzer.score_category)，各分组维度共用"""
+    frames = []
+    for category in ['genres', 'emotions', 'narrative']:
+        prompt_col, tag_col = f'prompt_{category}', f'tag_{category}'
+        if prompt_col not in df.columns or tag_col not in df.columns:
+            continue
+        scores = consistency_analyzer.score_category(df, prompt_col, tag_col)
+        if scores is not None:
+            frames.append(scores[['row_id', 'jaccard_similarity', 'overlap_coefficient']].assign(category=category))
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+def count_by_group(encoded, codes, n_groups):
+    """一次分组计数: 组编号 * 词表大小 + 词ID 打包为int64键后用np.unique计数"""
+    doc_index, words, vocabulary = encoded
+    groups = codes[doc_index]
+    valid = groups >= 0
+    groups, words = groups[valid], words[valid]
+    group_totals = np.bincount(groups, minlength=n_groups)
+
+    size = max(len(vocabulary), 1)
+    keys, counts = np.unique(groups * size + words, return_counts=True)
+    groups, words = keys // size, keys % size
+    order = np.lexsort((words, -counts, groups))
+    return GroupedCounts(groups[order], words[order], counts[order], group_totals, vocabulary)
+
+def consistency_by_group(scores, codes, labels):
+    """按组和类别汇总每行的一致性(见 row_consistency): 均值、中位数和行数"""
+    scores = scores.assign(group=codes[scores['row_id'].to_numpy()])
+    scores = scores[scores['group'] >= 0]
+    summary = scores.groupby(['group', 'category'], sort=True).agg(
+        jaccard_mean=('jaccard_similarity', 'mean'),
+        jaccard_median=('jaccard_similarity', 'median'),
+        overlap_mean=('overlap_coefficient', 'mean'),
+        overlap_median=('overlap_coefficient', 'median'),
+        count=('row_id', 'count')
+    ).reset_index()
+    summary.insert(0, 'Segment', labels[summary.pop('group').to_numpy()])
+    return summary.round(4)
+
+@profiler.traced('segments[{dimension}]')
+def analyze_dimension(df, dimension, output_dir, top_n=10, min_rows=5, encoded=None, scores=None):
+    """按一个维度分组统计各分类列的词分布和一致性，行数少于min_rows的组不输出，结果保存为 segment_{dimension} 文件
+
+    encoded和scores为 encode_columns 和 row_consistency 的结果，分析多个维度时只计算一次。
+    """
+    column = DIMENSION_COLUMNS[dimension]
+    if column not in df.columns:
+        print(f"列 {column} 不存在于数据中，跳过按 {dimension} 分组")
+        return None
+
+    print(f"正在按 {dimension} 分组统计...")
+    codes, labels = segment_codes(df, dimension)
+
+    # 行数不足的组视为缺失，不参与统计
+    group_rows = np.bincount(codes[codes >= 0], minlength=len(labels))
+    small = group_rows < min_rows
+    codes = np.where((codes >= 0) & ~small[np.maximum(codes, 0)], codes, -1)
+    kept = np.flatnonzero(~small)
+    print(f"共 {len(labels)} 个组，其中 {len(kept)} 个组不少于 {min_rows} 行")
+
+    if encoded is None:
+        encoded = encode_columns(df)
+    if scores is None:
+        scores = row_consistency(df)
+
+    sheets = {'summary': pd.DataFrame({'Segment': labels[kept], 'Rows': group_rows[kept]})}
+    with profiler.span('grouped_counting', rows=len(df)):
+        for column, column_encoded in encoded.items():
+            sheets[column] = count_by_group(column_encoded, codes, len(labels)).top_n(top_n, labels)
+
+    if scores is not None:
+        with profiler.span('grouped_consistency', rows=len(scores)):
+            sheets['consistency'] = consistency_by_group(scores, codes, labels)
+
+    with profiler.span('write_output'):
+        output_file = writers.save_sheets(sheets, os.path.join(output_dir, f"segment_{dimension}.xlsx"))
+    print(f"按 {dimension} 分组的结果已保存到: {output_file}")
+    return sheets
+
+def analyze_segments(input_file, output_dir=None, dimensions=DIMENSIONS, top_n=10, min_rows=5):
+    """按艺术家、时长区间和来源块分组分析类型、情绪、叙事元素的分布和一致性"""
+
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
+
+    try:
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='segments').reset_index(drop=True)
+            span['rows'] = len(df)
+
+        if output_dir is None:
+            output_dir = os.path.dirname(input_file)
+            if not output_dir:
+                output_dir = '.'
+
+        # 确保输出目录存在
+        os.makedirs(output_dir, exist_ok=True)
+
+        # 分类列的切分编码和每行的一致性只计算一次，各维度只是换一种分组
+        with profiler.span('encode', rows=len(df)):
+            encoded = encode_columns(df)
+            scores = row_consistency(df)
+
+        for dimension in dimensions:
+            analyze_dimension(df, dimension, output_dir, top_n, min_rows, encoded, scores)
+
+        print("\n分组分析完成！")
+
+        return True
+
+    except Exception as e:
+        print(f"分组分析过程中出错: {e}")
+        return False
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='按艺术家、时长区间或来源块分组统计词分布和一致性')
+    parser.add_argument('input_file', help='分类后的数据文件')
+    parser.add_argument('-o', '--output', dest='output_dir', help='输出目录 (默认: 输入文件所在目录)')
+    parser.add_argument('--by', nargs='+', choices=DIMENSIONS, default=list(DIMENSIONS), help='分组维度 (默认: 全部)')
+    parser.add_argument('--top', type=int, default=10, help='每组输出的高频词数量 (默认: 10)')
+    parser.add_argument('--min-rows', type=int, default=5, help='输出的组至少包含的行数 (默认: 5)')
+    parser.add_argument('--format', dest='output_format', choices=list(writers.FORMATS), default=writers.DEFAULT_FORMAT,
+                        help='输出格式 (默认: xlsx)')
+    args = parser.parse_args()
+
+    writers.set_format(args.output_format)
+    analyze_segments(args.input_file, args.output_dir, args.by, args.top, args.min_rows)
+
+if __name__ == "__main__":
+    main()
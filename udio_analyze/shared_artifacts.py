@@ -0,0 +1,246 @@
+import os
+import json
+import argparse
+
+import numpy as np
+
+import frequency_engine
+
+# 运行目录中保存共享数组的子目录
+ARTIFACT_DIR = 'artifacts'
+
+LEXICON_FILE = 'lexicon.npy'
+CATEGORY_WORDS_FILE = 'category_words.npy'
+CATEGORY_CODES_FILE = 'category_codes.npy'
+CATEGORIES_FILE = 'categories.json'
+VOCABULARY_FILE = 'vocabulary.npy'
+VOCABULARY_ORDER_FILE = 'vocabulary_order.npy'
+VOCABULARY_CATEGORY_FILE = 'vocabulary_category.npy'
+COUNTS_FILE = 'counts.npy'
+COUNTS_META_FILE = 'counts.json'
+
+def artifact_dir(run_dir):
+    """运行目录(或已经是artifacts目录)对应的共享数组目录"""
+    if os.path.basename(os.path.normpath(run_dir)) == ARTIFACT_DIR:
+        return run_dir
+    return os.path.join(run_dir, ARTIFACT_DIR)
+
+def _encode(strings):
+    """把字符串编码为定长UTF-8字节数组(numpy 'S'类型，可直接内存映射和二分查找)"""
+    encoded = [value.encode('utf-8') for value in strings]
+    width = max((len(value) for value in encoded), default=1) or 1
+    return np.array(encoded, dtype=f'S{width}')
+
+def _save(directory, name, array):
+    """原子写入.npy文件"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(f"{path}.tmp", 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(f"{path}.tmp", path)
+
+def _save_json(directory, name, data):
+    """原子写入JSON文件"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def _open(directory, name):
+    """以只读内存映射方式打开.npy文件(多个进程共享操作系统的页缓存)，文件不存在时返回None"""
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # 空数组无法内存映射
+        return np.load(path)
+
+class StringArray:
+    """内存映射的定长UTF-8字符串数组: 按下标取出时解码为str，按词查找下标时二分查找"""
+
+    __slots__ = ('data', 'order')
+
+    def __init__(self, data, order=None):
+        self.data = data
+        # data未排序时order为排序后的下标(searchsorted的sorter)，已排序时为None
+        self.order = order
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        values = self.data[index]
+        if isinstance(values, bytes):
+            return values.decode('utf-8')
+        result = np.empty(len(values), dtype=object)
+        result[:] = [value.decode('utf-8') for value in values]
+        return result
+
+    def lookup(self, words):
+        """返回每个词的下标，不存在时为-1"""
+        words = list(words)
+        if not words or len(self.data) == 0:
+            return np.full(len(words), -1, dtype=np.int64)
+        width = self.data.dtype.itemsize
+        encoded = [word.encode('utf-8') for word in words]
+        # 比定长更长的词不可能存在，且转换为定长时会被截断
+        fits = np.fromiter((len(value) <= width for value in encoded), dtype=bool, count=len(encoded))
+        queries = np.array(encoded, dtype=self.data.dtype)
+
+        position = np.searchsorted(self.data, queries, sorter=self.order)
+        position = np.minimum(position, len(self.data) - 1)
+        index = position if self.order is None else np.asarray(self.order[position])
+        found = fits & (self.data[index] == queries)
+        return np.where(found, index, -1).astype(np.int64)
+
+class Lexicon(StringArray):
+    """内存映射的英语词表(已排序)，可代替 data_cleaner.load_english_words 返回的集合"""
+
+    __slots__ = ()
+
+    def __contains__(self, word):
+        return self.lookup([word])[0] >= 0
+
+    def subset(self, words):
+        """返回words中属于词表的词的集合(一批文本的不同词一次二分查找)"""
+        words = list(words)
+        return {word for word, index in zip(words, self.lookup(words)) if index >= 0}
+
+def write_lexicon(directory, words):
+    """把英语词表写为排序的定长字节数组，返回文件路径"""
+    _save(directory, LEXICON_FILE, np.unique(_encode(words)))
+    return os.path.join(directory, LEXICON_FILE)
+
+def open_lexicon(directory):
+    """打开共享英语词表，不存在时返回None"""
+    data = _open(directory, LEXICON_FILE)
+    return None if data is None else Lexicon(data)
+
+class CategoryCodes:
+    """内存映射的分类词典: 排序的词和每个词的类别编号(类别名保存在JSON中)"""
+
+    __slots__ = ('words', 'codes', 'names', 'content_hash')
+
+    def __init__(self, words, codes, names, content_hash=None):
+        self.words = words
+        self.codes = codes
+        self.names = names
+        self.content_hash = content_hash
+
+    def lookup(self, words):
+        """返回每个词的类别编号，未分类的词为-1"""
+        index = self.words.lookup(words)
+        codes = np.full(len(index), -1, dtype=np.int16)
+        codes[index >= 0] = self.codes[index[index >= 0]]
+        return codes
+
+    def get(self, word, default=None):
+        code = self.lookup([word])[0]
+        return self.names[code] if code >= 0 else default
+
+def write_categories(directory, dictionary):
+    """写入分类词典的词和类别编号(dictionary为 category_dictionary.CategoryDictionary)"""
+    names = list(dictionary.categories)
+    words = sorted(dictionary.word_to_category)
+    _save(directory, CATEGORY_WORDS_FILE, _encode(words))
+    _save(directory, CATEGORY_CODES_FILE,
+          np.array([names.index(dictionary.word_to_category[word]) for word in words], dtype=np.int16))
+    _save_json(directory, CATEGORIES_FILE, {'categories': names, 'content_hash': dictionary.content_hash})
+
+def open_categories(directory):
+    """打开共享分类词典，不存在时返回None"""
+    words = _open(directory, CATEGORY_WORDS_FILE)
+    codes = _open(directory, CATEGORY_CODES_FILE)
+    path = os.path.join(directory, CATEGORIES_FILE)
+    if words is None or codes is None or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return CategoryCodes(StringArray(words), codes, meta['categories'], meta.get('content_hash'))
+
+def write_counts(directory, column_counts):
+    """写入词频阶段的共享词表和各列计数矩阵(column_counts为 frequency_engine.ColumnCounts)
+
+    同一目录中有分类词典时，同时写入每个词的类别编号(未分类为-1)。
+    """
+    vocabulary = _encode(column_counts.vocabulary)
+    _save(directory, VOCABULARY_FILE, vocabulary)
+    _save(directory, VOCABULARY_ORDER_FILE, np.argsort(vocabulary, kind='stable').astype(np.int64))
+    _save(directory, COUNTS_FILE, column_counts.column_counts)
+
+    categories = open_categories(directory)
+    if categories is not None:
+        _save(directory, VOCABULARY_CATEGORY_FILE, categories.lookup(column_counts.vocabulary))
+
+    _save_json(directory, COUNTS_META_FILE, {
+        'columns': column_counts.columns,
+        'totals': [int(total) for total in column_counts.totals],
+        'min_support': column_counts.min_support,
+        'weighted': column_counts.weighted
+    })
+
+def open_counts(directory):
+    """以内存映射方式打开共享词频计数，返回 frequency_engine.ColumnCounts (不复制数组)，不存在时返回None"""
+    path = os.path.join(directory, COUNTS_META_FILE)
+    vocabulary = _open(directory, VOCABULARY_FILE)
+    matrix = _open(directory, COUNTS_FILE)
+    if not os.path.exists(path) or vocabulary is None or matrix is None:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return frequency_engine.ColumnCounts(
+        meta['columns'], StringArray(vocabulary, _open(directory, VOCABULARY_ORDER_FILE)), matrix,
+        np.asarray(meta['totals'], dtype=np.int64), meta['min_support'], meta['weighted']
+    )
+
+def word_counts(directory, words):
+    """查询若干词在各列中的计数，返回 {词: {列: 计数, 'category': 类别}}"""
+    column_counts = open_counts(directory)
+    if column_counts is None:
+        return None
+    categories = open_categories(directory)
+    vocabulary_category = _open(directory, VOCABULARY_CATEGORY_FILE)
+
+    result = {}
+    for word, index in zip(words, column_counts.vocabulary.lookup(words)):
+        entry = {column: (counts[index].item() if index >= 0 else 0)
+                 for column, counts in zip(column_counts.columns, column_counts.column_counts)}
+        if categories is not None and vocabulary_category is not None and index >= 0:
+            code = vocabulary_category[index]
+            entry['category'] = categories.names[code] if code >= 0 else None
+        result[word] = entry
+    return result
+
+def main():
+    """命令行入口: 直接从运行目录的共享数组查询词频，不读取结果文件"""
+    parser = argparse.ArgumentParser(description='查询运行目录中的共享词表和词频计数')
+    parser.add_argument('run_dir', help='分析结果目录')
+    parser.add_argument('--words', nargs='+', help='查询这些词在各列中的计数')
+    parser.add_argument('--top', nargs=2, metavar=('COLUMN', 'N'), help='某一列出现最多的N个词')
+    args = parser.parse_args()
+
+    directory = artifact_dir(args.run_dir)
+    column_counts = open_counts(directory)
+    if column_counts is None:
+        print(f"错误: {directory} 中没有共享词频计数")
+        return
+
+    if args.words:
+        print(json.dumps(word_counts(directory, args.words), ensure_ascii=False, indent=2))
+    if args.top:
+        column, n = args.top[0], int(args.top[1])
+        if column not in column_counts.columns:
+            print(f"错误: 没有列 {column}，可选: {', '.join(column_counts.columns)}")
+            return
+        for word, count in zip(*column_counts.top_n(column, n)):
+            print(f"{word}\t{count}")
+    if not args.words and not args.top:
+        print(f"词表大小: {len(column_counts.vocabulary)}")
+        for column, total in zip(column_counts.columns, column_counts.totals):
+            print(f"  {column}: {total} 个词")
+
+if __name__ == "__main__":
+    main()
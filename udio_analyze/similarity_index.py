@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import data_io
+import frequency_engine
+import profiler
+import tokenizer
+
+# 索引目录中的文件
+INDEX_DIR_NAME = 'similarity_index'
+MATRIX_FILE = 'tfidf.npz'
+IDF_FILE = 'idf.npy'
+VOCABULARY_FILE = 'vocabulary.json'
+METADATA_FILE = 'metadata.pkl'
+INFO_FILE = 'index_info.json'
+
+# 查询结果中返回的歌曲信息列
+METADATA_COLUMNS = ['title', 'artist', 'prompt', 'tags', 'song_path']
+
+def _l2_normalize(matrix):
+    """把稀疏矩阵的每一行缩放为单位长度，空行保持为0"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+def _top_k(scores, k, exclude=None):
+    """从一维得分数组中取前k个(argpartition)，返回按得分降序的下标"""
+    if exclude is not None:
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    candidates = candidates[scores[candidates] > 0]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+class SimilarityIndex:
+    """基于cleaned_prompt的TF-IDF相似度索引: 行向量L2归一化，余弦相似度即稀疏矩阵乘积"""
+
+    def __init__(self, matrix, idf, vocabulary, metadata):
+        self.matrix = matrix.tocsc()
+        self.idf = idf
+        self.vocabulary = list(vocabulary)
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary)}
+        self.metadata = metadata.reset_index(drop=True)
+
+    @classmethod
+    def build(cls, df, column='cleaned_prompt'):
+        """从数据构建索引: 词频取1+log(tf)，idf平滑，行向量L2归一化"""
+        token_lists = [tokenizer.split_words(text) for text in df[column]]
+        doc_index, codes, vocabulary = frequency_engine.encode_tokens(token_lists)
+
+        n_docs = len(token_lists)
+        counts = sparse.csr_matrix(
+            (np.ones(len(codes), dtype=np.float32), (doc_index, codes)),
+            shape=(n_docs, len(vocabulary))
+        )
+        counts.sum_duplicates()
+
+        document_frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+        idf = (np.log((1 + n_docs) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        counts.data = 1 + np.log(counts.data)
+        matrix = _l2_normalize(counts @ sparse.diags(idf)).astype(np.float32)
+
+        metadata = df[[c for c in METADATA_COLUMNS if c in df.columns]]
+        return cls(matrix, idf, vocabulary.tolist(), metadata)
+
+    def save(self, index_dir):
+        """把索引保存到目录"""
+        os.makedirs(index_dir, exist_ok=True)
+        sparse.save_npz(os.path.join(index_dir, MATRIX_FILE), self.matrix, compressed=False)
+        np.save(os.path.join(index_dir, IDF_FILE), self.idf)
+        with open(os.path.join(index_dir, VOCABULARY_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.vocabulary, f, ensure_ascii=False)
+        self.metadata.to_pickle(os.path.join(index_dir, METADATA_FILE))
+        with open(os.path.join(index_dir, INFO_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'rows': self.matrix.shape[0],
+                'terms': self.matrix.shape[1],
+                'nnz': int(self.matrix.nnz),
+                'weighting': 'tfidf (1+log tf, smooth idf, l2)'
+            }, f, ensure_ascii=False, indent=2)
+        return index_dir
+
+    @classmethod
+    def load(cls, index_dir):
+        """从目录加载索引"""
+        matrix = sparse.load_npz(os.path.join(index_dir, MATRIX_FILE))
+        idf = np.load(os.path.join(index_dir, IDF_FILE))
+        with open(os.path.join(index_dir, VOCABULARY_FILE), 'r', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        metadata = pd.read_pickle(os.path.join(index_dir, METADATA_FILE))
+        return cls(matrix, idf, vocabulary, metadata)
+
+    def vectorize(self, texts):
+        """把查询文本转换为与索引相同权重的归一化稀疏行向量，词表外的词忽略"""
+        rows, cols = [], []
+        for i, text in enumerate(texts):
+            for term in tokenizer.tokenize(text):
+                term_id = self.term_ids.get(term)
+                if term_id is not None:
+                    rows.append(i)
+                    cols.append(term_id)
+
+        queries = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(texts), len(self.vocabulary))
+        )
+        queries.sum_duplicates()
+        queries.data = 1 + np.log(queries.data)
+        return _l2_normalize(queries @ sparse.diags(self.idf)).astype(np.float32)
+
+    def search_vectors(self, queries, k=10, block_size=64, exclude=None):
+        """分块计算余弦相似度top k；只取查询中出现的词对应的列(倒排)，返回每个查询的(下标, 得分)"""
+        queries = queries.tocsr()
+        results = []
+        for start in range(0, queries.shape[0], block_size):
+            block = queries[start:start + block_size]
+            terms = np.unique(block.indices)
+            if len(terms) == 0:
+                results.extend((np.array([], dtype=np.int64), np.array([], dtype=np.float32))
+                               for _ in range(block.shape[0]))
+                continue
+
+            # (行数 x 查询词) @ (查询词 x 查询数) -> 每首歌对本块每个查询的得分
+            scores = (self.matrix[:, terms] @ block[:, terms].T).toarray()
+            for j in range(block.shape[0]):
+                skip = None if exclude is None else exclude[start + j]
+                index = _top_k(scores[:, j], k, skip)
+                results.append((index, scores[index, j]))
+        return results
+
+    def _result_frame(self, index, scores):
+        """把下标和得分转换为歌曲信息表"""
+        result = self.metadata.iloc[index].copy()
+        result.insert(0, 'row', index)
+        result.insert(1, 'similarity', np.round(scores, 4))
+        return result.reset_index(drop=True)
+
+    def query(self, text, k=10):
+        """返回与查询文本最相似的k首歌"""
+        (index, scores), = self.search_vectors(self.vectorize([text]), k)
+        return self._result_frame(index, scores)
+
+    def query_batch(self, texts, k=10, block_size=64):
+        """批量查询，返回每个查询的结果表"""
+        results = self.search_vectors(self.vectorize(texts), k, block_size)
+        return [self._result_frame(index, scores) for index, scores in results]
+
+    def similar_to_row(self, row, k=10):
+        """返回与索引中第row首歌最相似的k首歌(不含其本身)"""
+        (index, scores), = self.search_vectors(self.matrix[row].tocsr(), k, exclude=[row])
+        return self._result_frame(index, scores)
+
+    def find_rows(self, song_path):
+        """按song_path查找歌曲在索引中的行号"""
+        if 'song_path' not in self.metadata.columns:
+            return []
+        return np.flatnonzero(self.metadata['song_path'].to_numpy() == song_path).tolist()
+
+def build_index(input_file, index_dir=None, column='cleaned_prompt'):
+    """从清洗/分类后的数据构建相似度索引并保存"""
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
+
+    try:
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='similarity_index')
+            span['rows'] = len(df)
+
+        if column not in df.columns:
+            print(f"列 {column} 不存在于数据中，无法构建相似度索引")
+            return None
+
+        if index_dir is None:
+            index_dir = os.path.join(os.path.dirname(input_file) or '.', INDEX_DIR_NAME)
+
+        print(f"正在为 {len(df)} 行构建TF-IDF相似度索引...")
+        with profiler.span('build_index', rows=len(df)):
+            index = SimilarityIndex.build(df, column)
+        with profiler.span('save_index'):
+            index.save(index_dir)
+
+        print(f"索引包含 {index.matrix.shape[1]} 个词，非零元素 {index.matrix.nnz} 个")
+        print(f"相似度索引已保存到: {index_dir}")
+        return index_dir
+
+    except Exception as e:
+        print(f"构建相似度索引时出错: {e}")
+        return None
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='提示词相似度检索')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='从清洗或分类后的Excel文件构建索引')
+    build_parser.add_argument('input_file', help='包含cleaned_prompt列的Excel文件')
+    build_parser.add_argument('-o', '--output', dest='index_dir',
+                              help=f'索引目录 (默认: 输入文件所在目录下的 {INDEX_DIR_NAME})')
+
+    query_parser = subparsers.add_parser('query', help='查询相似的歌曲')
+    query_parser.add_argument('index_dir', help='索引目录')
+    query_parser.add_argument('text', nargs='?', help='查询文本')
+    query_parser.add_argument('--song', dest='song_path', help='查询与某首歌(song_path)相似的歌曲')
+    query_parser.add_argument('-k', type=int, default=10, help='返回的歌曲数量 (默认: 10)')
+    query_parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.input_file, args.index_dir)
+        return
+
+    index = SimilarityIndex.load(args.index_dir)
+    start_time = time.perf_counter()
+    if args.song_path:
+        rows = index.find_rows(args.song_path)
+        if not rows:
+            print(f"索引中没有找到歌曲: {args.song_path}")
+            return
+        result = index.similar_to_row(rows[0], args.k)
+    elif args.text:
+        result = index.query(args.text, args.k)
+    else:
+        parser.error('请提供查询文本或 --song')
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    if args.json:
+        print(json.dumps(result.to_dict(orient='records'), ensure_ascii=False, indent=2))
+    else:
+        with pd.option_context('display.max_colwidth', 60, 'display.width', 200):
+            print(result.to_string(index=False))
+        print(f"\n查询耗时: {elapsed_ms:.1f} 毫秒")
+
+if __name__ == "__main__":
+    main()
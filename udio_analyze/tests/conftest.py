@@ -0,0 +1,10 @@
+import os
+import sys
+
+# 分析模块位于上级目录(平铺的脚本模块)，与 benchmarks 相同，保证从任意目录运行测试时都能导入
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, _PACKAGE_DIR)
+
+# 测试不需要图形界面
+os.environ.setdefault('MPLBACKEND', 'Agg')
@@ -0,0 +1,77 @@
+import os
+
+import pandas as pd
+
+import checkpoint
+
+def _write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def _run_stage(tracker, output_dir, name, text):
+    tracker.begin(name)
+    _write(os.path.join(output_dir, f"{name}.txt"), text)
+    tracker.complete(name, {'file': f"{name}.txt"})
+
+def test_resume_skips_completed_stages(tmp_path):
+    output_dir = str(tmp_path)
+    tracker = checkpoint.StageTracker(output_dir)
+    _run_stage(tracker, output_dir, 'clean', 'cleaned')
+    _run_stage(tracker, output_dir, 'categorize', 'categorized')
+
+    resumed = checkpoint.StageTracker(output_dir, resume=True)
+    assert resumed.completed('clean') == {'file': 'clean.txt'}
+    assert resumed.completed('categorize') == {'file': 'categorize.txt'}
+
+def test_without_resume_nothing_is_restored(tmp_path):
+    output_dir = str(tmp_path)
+    _run_stage(checkpoint.StageTracker(output_dir), output_dir, 'clean', 'cleaned')
+    assert checkpoint.StageTracker(output_dir).completed('clean') is None
+
+def test_changed_output_reruns_that_stage_and_all_later_ones(tmp_path):
+    output_dir = str(tmp_path)
+    tracker = checkpoint.StageTracker(output_dir)
+    for name in ['clean', 'categorize', 'frequency']:
+        _run_stage(tracker, output_dir, name, name)
+    _write(os.path.join(output_dir, 'categorize.txt'), 'edited by hand')
+
+    resumed = checkpoint.StageTracker(output_dir, resume=True)
+    assert resumed.completed('clean') is not None
+    assert resumed.completed('categorize') is None
+    # 之后的阶段输入可能已改变，即使输出未被修改也重新执行
+    assert resumed.completed('frequency') is None
+
+def test_failed_stage_is_not_restored(tmp_path):
+    output_dir = str(tmp_path)
+    tracker = checkpoint.StageTracker(output_dir)
+    _run_stage(tracker, output_dir, 'clean', 'cleaned')
+    tracker.begin('categorize')
+    tracker.fail('categorize', RuntimeError('boom'))
+
+    resumed = checkpoint.StageTracker(output_dir, resume=True)
+    assert resumed.completed('clean') is not None
+    assert resumed.completed('categorize') is None
+
+def test_process_in_chunks_resumes_from_saved_chunks(tmp_path):
+    chunk_dir = str(tmp_path / 'chunks')
+    df = pd.DataFrame({'x': range(10)})
+    calls = []
+
+    def double(chunk):
+        calls.append(len(chunk))
+        return pd.DataFrame({'y': chunk['x'] * 2}, index=chunk.index)
+
+    first = checkpoint.process_in_chunks(df, double, chunk_dir, chunk_rows=4, key='a')
+    assert calls == [4, 4, 2]
+
+    # 删除最后一块，模拟中断: 只重新计算缺少的块
+    os.remove(os.path.join(chunk_dir, 'chunk_00002.pkl'))
+    calls.clear()
+    resumed = checkpoint.process_in_chunks(df, double, chunk_dir, chunk_rows=4, key='a')
+    assert calls == [2]
+    pd.testing.assert_frame_equal(first, resumed)
+
+    # key不同时丢弃旧的分块
+    calls.clear()
+    checkpoint.process_in_chunks(df, double, chunk_dir, chunk_rows=4, key='b')
+    assert calls == [4, 4, 2]
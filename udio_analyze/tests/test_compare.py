@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+import compare
+
+def _side_counts(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    vocabulary = np.array([f"w{i}" for i in range(counts.shape[1])], dtype=object)
+    return compare.SideCounts(vocabulary, counts, counts.sum(axis=1))
+
+def test_log_odds_matches_dirichlet_formula():
+    sides = _side_counts([[10, 5, 1], [2, 6, 9]])
+    delta, z = sides.log_odds(prior_scale=0.5)
+
+    # Monroe等: alpha_w = 0.5 * 两侧合并频次
+    alpha = 0.5 * np.array([12, 11, 10], dtype=np.float64)
+    expected_delta = []
+    expected_z = []
+    for w in range(3):
+        y0, y1 = sides.counts[0, w] + alpha[w], sides.counts[1, w] + alpha[w]
+        n0, n1 = sides.totals[0] + alpha.sum(), sides.totals[1] + alpha.sum()
+        d = np.log(y1 / (n1 - y1)) - np.log(y0 / (n0 - y0))
+        expected_delta.append(d)
+        expected_z.append(d / np.sqrt(1 / y0 + 1 / y1))
+    np.testing.assert_allclose(delta, expected_delta)
+    np.testing.assert_allclose(z, expected_z)
+
+def test_log_odds_identical_sides_is_zero():
+    delta, z = _side_counts([[4, 3, 1], [4, 3, 1]]).log_odds()
+    np.testing.assert_allclose(delta, 0, atol=1e-12)
+    np.testing.assert_allclose(z, 0, atol=1e-12)
+
+def test_log_odds_is_antisymmetric_in_sides():
+    delta, z = _side_counts([[7, 1, 0], [1, 4, 3]]).log_odds()
+    swapped_delta, swapped_z = _side_counts([[1, 4, 3], [7, 1, 0]]).log_odds()
+    np.testing.assert_allclose(delta, -swapped_delta)
+    np.testing.assert_allclose(z, -swapped_z)
+    # 只在第二侧出现的词偏向第二侧
+    assert z[2] > 0 and z[0] < 0
+
+def test_single_word_vocabulary_has_no_odds():
+    delta, z = _side_counts([[3], [5]]).log_odds()
+    assert np.all(np.isfinite(delta)) and np.all(np.isfinite(z))
+
+def test_count_sides_weights_and_skips_unassigned_rows():
+    df = pd.DataFrame({'cleaned_prompt': ['rock rock pop', 'pop', 'jazz', 'rock']})
+    codes = np.array([0, 1, 1, -1])
+    sides = compare.count_sides(df, 'cleaned_prompt', codes)
+    counts = dict(zip(sides.vocabulary, sides.counts.T.tolist()))
+    assert counts == {'rock': [2, 0], 'pop': [1, 1], 'jazz': [0, 1]}
+    assert sides.totals.tolist() == [3, 2]
+
+    weighted = compare.count_sides(df, 'cleaned_prompt', codes, np.array([0.5, 1.0, 2.0, 1.0]))
+    counts = dict(zip(weighted.vocabulary, weighted.counts.T.tolist()))
+    assert counts['rock'] == [1.0, 0.0] and counts['jazz'] == [0.0, 2.0]
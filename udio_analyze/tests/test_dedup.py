@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+import dedup
+
+BASE = 'dreamy lofi beats with soft piano rain sounds and a slow mellow groove for late night study'
+
+def _frame(prompts):
+    return pd.DataFrame({'cleaned_prompt': prompts})
+
+def test_near_duplicates_share_a_cluster():
+    df = _frame([
+        BASE,
+        'aggressive metal with fast drums and screaming vocals about war',
+        BASE,
+        BASE + ' sessions',
+        'happy birthday song for my little brother with ukulele and claps',
+    ])
+    cluster_ids, cluster_sizes, is_representative = dedup.find_near_duplicates(df)
+
+    assert cluster_ids[0] == cluster_ids[2] == cluster_ids[3]
+    assert len({cluster_ids[0], cluster_ids[1], cluster_ids[4]}) == 3
+    assert cluster_sizes.tolist() == [3, 1, 3, 3, 1]
+    # 簇代表为簇内第一行，簇编号按代表行的顺序
+    assert is_representative.tolist() == [True, True, False, False, True]
+    assert cluster_ids.tolist() == [0, 1, 0, 0, 2]
+
+def test_rows_without_shingles_stay_singletons():
+    df = _frame(['', None, '', BASE])
+    cluster_ids, cluster_sizes, is_representative = dedup.find_near_duplicates(df)
+    assert cluster_sizes.tolist() == [1, 1, 1, 1]
+    assert is_representative.all()
+
+def test_groups_keep_clusters_apart():
+    df = _frame([BASE, BASE, BASE, BASE])
+    groups = np.array([0, 0, 1, 1])
+    cluster_ids, cluster_sizes, is_representative = dedup.find_near_duplicates(df, groups=groups)
+    assert cluster_ids[0] == cluster_ids[1] != cluster_ids[2] == cluster_ids[3]
+    assert cluster_sizes.tolist() == [2, 2, 2, 2]
+    assert is_representative.tolist() == [True, False, True, False]
+
+def test_minhash_estimates_jaccard():
+    token_lists = [['a', 'b', 'c', 'd', 'e', 'f'], ['a', 'b', 'c', 'd', 'e', 'f'], ['u', 'v', 'w', 'x', 'y', 'z']]
+    docs, keys = dedup.shingle_keys(token_lists)
+    signatures = dedup.minhash_signatures(docs, keys, len(token_lists), num_perm=128)
+    assert (signatures[0] == signatures[1]).all()
+    assert (signatures[0] == signatures[2]).mean() < 0.1
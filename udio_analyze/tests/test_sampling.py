@@ -0,0 +1,68 @@
+import numpy as np
+
+import frequency_engine
+import sampling
+
+def _design(codes, population):
+    codes = np.asarray(codes, dtype=np.int64)
+    sampled = np.bincount(codes, minlength=len(population))
+    names = np.array([f"s{i}" for i in range(len(population))], dtype=object)
+    return sampling.SampleDesign(codes, names, np.asarray(population, dtype=np.float64), sampled)
+
+TOKEN_LISTS = [['rock', 'rock', 'pop'], ['pop'], ['jazz', 'rock'], [], ['pop', 'pop'], ['jazz']]
+CODES = [0, 0, 0, 1, 1, 1]
+POPULATION = [30, 12]
+
+def _dense_totals(token_lists, design, vocabulary):
+    """逐层按教科书公式计算的分层总量估计和方差"""
+    y = np.array([[tokens.count(word) for word in vocabulary] for tokens in token_lists], dtype=np.float64)
+    total = np.zeros(len(vocabulary))
+    variance = np.zeros(len(vocabulary))
+    for h in range(len(design.names)):
+        rows = design.codes == h
+        n, big_n = rows.sum(), design.population[h]
+        total += big_n / n * y[rows].sum(axis=0)
+        if n > 1:
+            variance += big_n ** 2 * (1 - n / big_n) * y[rows].var(axis=0, ddof=1) / n
+    return y.sum(axis=0), total, variance
+
+def test_estimate_totals_matches_dense_stratified_estimator():
+    design = _design(CODES, POPULATION)
+    encoded = frequency_engine.encode_tokens(TOKEN_LISTS)
+    sample, total, variance = sampling.estimate_totals(encoded, design)
+
+    expected_sample, expected_total, expected_variance = _dense_totals(TOKEN_LISTS, design, list(encoded[2]))
+    np.testing.assert_allclose(sample, expected_sample)
+    np.testing.assert_allclose(total, expected_total)
+    np.testing.assert_allclose(variance, expected_variance)
+
+def test_census_has_no_sampling_variance():
+    design = _design(CODES, [3, 3])
+    encoded = frequency_engine.encode_tokens(TOKEN_LISTS)
+    sample, total, variance = sampling.estimate_totals(encoded, design)
+    np.testing.assert_allclose(total, sample)
+    np.testing.assert_allclose(variance, 0, atol=1e-12)
+
+def test_mean_estimate_matches_linearized_ratio_variance():
+    design = _design(CODES, POPULATION)
+    values = np.array([0.2, 0.6, np.nan, 1.0, 0.4, 0.0])
+    n, estimate, lower, upper = sampling.mean_estimate(values, design)
+
+    weights = (design.population / design.sampled)[design.codes]
+    domain = ~np.isnan(values)
+    ratio = (weights[domain] * values[domain]).sum() / weights[domain].sum()
+    u = np.where(domain, np.nan_to_num(values) - ratio, 0.0)
+    variance = 0.0
+    for h in range(len(design.names)):
+        rows = design.codes == h
+        sampled, big_n = rows.sum(), design.population[h]
+        variance += big_n ** 2 * (1 - sampled / big_n) * u[rows].var(ddof=1) / sampled
+    half_width = sampling.Z_95 * np.sqrt(variance) / weights[domain].sum()
+
+    assert n == 5
+    np.testing.assert_allclose(estimate, ratio)
+    np.testing.assert_allclose([lower, upper], [ratio - half_width, ratio + half_width])
+
+def test_mean_estimate_empty_domain():
+    n, estimate, lower, upper = sampling.mean_estimate(np.full(6, np.nan), _design(CODES, POPULATION))
+    assert n == 0 and np.isnan(estimate) and np.isnan(lower) and np.isnan(upper)
@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+import association
+import consistency_analyzer
+import data_categorizer
+import frequency_engine
+import watcher
+
+PROMPTS = [
+    'sad rock song about love and loss with guitar',
+    'happy pop dance track for a summer party',
+    'dark metal anthem about war and anger',
+    'calm jazz piano for a rainy night',
+    'energetic rock anthem about freedom',
+    None,
+    'romantic pop ballad about love and a long journey',
+    'sad piano ballad about loss',
+    'happy dance pop with love and summer vibes',
+    'angry metal with fast drums about war',
+]
+TAGS = [
+    'rock, sad, love', 'pop, happy, dance', 'metal, dark', 'jazz, calm, night', 'rock, energetic',
+    'pop', 'pop, romantic, love', 'piano, sad', 'pop, dance, happy', 'metal, angry, war',
+]
+
+@pytest.fixture(scope='module')
+def corpus():
+    df = pd.DataFrame({'cleaned_prompt': PROMPTS, 'cleaned_tags': [t.replace(',', '') for t in TAGS]})
+    categories = data_categorizer.DEFAULT_CATEGORIES
+    categorized = data_categorizer.categorize_frame(df, categories, data_categorizer.build_word_to_category(categories))
+    return pd.concat([df, categorized], axis=1)
+
+def _incremental(df, sizes):
+    aggregates = watcher.IncrementalAggregates()
+    start = 0
+    for size in sizes:
+        aggregates.add(df.iloc[start:start + size])
+        start += size
+    return aggregates
+
+def _pair_dict(associations):
+    vocabulary1, vocabulary2 = associations.row_vocabulary, associations.col_vocabulary
+    return {
+        (vocabulary1[r], vocabulary2[c]): (int(f), round(float(n), 10))
+        for r, c, f, n in zip(associations.rows, associations.cols,
+                              associations.metrics['Frequency'], associations.metrics['NPMI'])
+    }
+
+def test_word_counts_match_full_run(corpus):
+    aggregates = _incremental(corpus, [4, 3, 3])
+    full = frequency_engine.count_columns(corpus, watcher.FREQUENCY_COLUMNS)
+    vocabulary = aggregates.vocabulary
+    for column in full.columns:
+        counts = aggregates._pad(aggregates.counts[column])
+        incremental = {word: int(count) for word, count in zip(vocabulary, counts) if count}
+        expected = {word: int(count) for word, count in zip(full.vocabulary, full.counts(column)) if count}
+        assert incremental == expected, column
+        assert aggregates.totals[column] == full.total(column)
+
+def test_pairs_match_full_run(corpus):
+    _, pair_tables, _ = _incremental(corpus, [2, 5, 3]).outputs()
+    for column, name in watcher.PAIR_OUTPUTS.items():
+        expected = association.word_pair_associations(corpus[column])
+        assert _pair_dict(pair_tables[f"{name}_association"][0]) == _pair_dict(expected), name
+    for (column1, column2), name in watcher.CROSS_PAIR_OUTPUTS.items():
+        expected = association.cross_pair_associations(corpus[column1], corpus[column2])
+        assert _pair_dict(pair_tables[f"{name}_association"][0]) == _pair_dict(expected), name
+
+def test_consistency_and_report_inputs_match_full_run(corpus):
+    aggregates = _incremental(corpus, [5, 5])
+    tables, _, analysis_results = aggregates.outputs()
+
+    frames = []
+    for category in ['genres', 'emotions', 'narrative']:
+        scores = consistency_analyzer.score_category(corpus, f'prompt_{category}', f'tag_{category}')
+        if scores is not None:
+            scores.insert(1, 'category', category)
+            frames.append(scores)
+    expected = consistency_analyzer.summarize_consistency(pd.concat(frames, ignore_index=True))
+    pd.testing.assert_frame_equal(tables['tag_prompt_consistency_summary'], expected)
+    assert sorted(analysis_results.consistency) == sorted(expected['category'])
+
+    lengths = corpus['cleaned_prompt'].str.len()
+    summary = aggregates.summary()
+    assert summary['rows'] == len(corpus)
+    assert summary['valid_prompts'] == int(corpus['cleaned_prompt'].notna().sum())
+    assert summary['avg_prompt_length'] == pytest.approx(lengths.mean())
+    assert analysis_results.frequency('cleaned_prompt').words[0] == tables['prompt_word_frequency']['Word'].iloc[0]
+
+def test_batch_split_does_not_change_outputs(corpus):
+    one_batch, _, _ = _incremental(corpus, [len(corpus)]).outputs()
+    many_batches, _, _ = _incremental(corpus, [1] * len(corpus)).outputs()
+    for name, table in one_batch.items():
+        if name.endswith('_heatmap') or name == 'tag_prompt_consistency_details':
+            continue
+        other = many_batches[name]
+        key = list(table.columns[:2])
+        pd.testing.assert_frame_equal(table.sort_values(key).reset_index(drop=True),
+                                      other.sort_values(key).reset_index(drop=True), check_dtype=False)
+    # 一致性明细按批追加，比较时按(类别, 行号)排序
+    details = [_incremental(corpus, sizes).consistency.sort_values(['category', 'row_id']).reset_index(drop=True)
+               for sizes in ([len(corpus)], [3, 7])]
+    pd.testing.assert_frame_equal(*details)
@@ -0,0 +1,72 @@
+import re
+import string
+import unicodedata
+
+# 连字符和撇号直接删除，使 'lo-fi' -> 'lofi'、"can't" -> 'cant'，与分类词典中的写法一致
+JOINER_CHARS = "-‐‑⁃﹣－'’ʼ‘"
+
+# tags列中各标签之间的分隔符(见 get_data.py)
+TAG_SEPARATOR = '&'
+
+# 含'&'的固定写法先合并为一个词(与分类词典中的 'rb' 一致)，其余'&'按词边界处理
+AMPERSAND_TERMS = ('r&b', 'd&b')
+_AMPERSAND_RE = re.compile(
+    r'(?<![^\W_])(' + '|'.join(re.escape(term) for term in AMPERSAND_TERMS) + r')(?![^\W_])',
+    re.IGNORECASE
+)
+
+# ASCII快速路径: 一张256字节的转换表同时完成小写化和标点替换(标点 -> 空格)
+_ASCII_TABLE = bytes(
+    ord(' ') if chr(i) in string.punctuation
+    else (i + 32 if 65 <= i <= 90 else i)
+    for i in range(256)
+)
+_ASCII_DELETE = JOINER_CHARS.encode('ascii', 'ignore')
+
+# 非ASCII文本: NFKC规范化(全角字符等)后删除连字符/撇号，再按Unicode单词字符切分
+_JOINER_RE = re.compile('[' + re.escape(JOINER_CHARS) + ']')
+_WORD_RE = re.compile(r'[^\W_]+')
+
+def _join_ampersand_terms(text):
+    """把 'R&B' 等固定写法中的'&'删除，避免被当作标签分隔符拆开"""
+    if TAG_SEPARATOR not in text:
+        return text
+    return _AMPERSAND_RE.sub(lambda match: match.group(0).replace(TAG_SEPARATOR, ''), text)
+
+def normalize_text(text):
+    """规范化文本: 小写、Unicode标点替换为空格、连字符/撇号删除"""
+    if not isinstance(text, str):
+        return ''
+    text = _join_ampersand_terms(text)
+    if text.isascii():
+        return text.encode('ascii').translate(_ASCII_TABLE, _ASCII_DELETE).decode('ascii')
+    text = _join_ampersand_terms(unicodedata.normalize('NFKC', text)).lower()
+    return ' '.join(_WORD_RE.findall(_JOINER_RE.sub('', text)))
+
+def tokenize(text):
+    """把原始文本(prompt或'&'连接的tags)切分为规范化的词汇列表"""
+    if not isinstance(text, str):
+        return []
+    text = _join_ampersand_terms(text)
+    if text.isascii():
+        return text.encode('ascii').translate(_ASCII_TABLE, _ASCII_DELETE).decode('ascii').split()
+    text = _join_ampersand_terms(unicodedata.normalize('NFKC', text)).lower()
+    return _WORD_RE.findall(_JOINER_RE.sub('', text))
+
+def tokenize_batch(texts):
+    """批量分词，返回与输入顺序一致的词汇列表"""
+    _tokenize = tokenize
+    return [_tokenize(text) for text in texts]
+
+def split_tags(tags):
+    """把'&'连接的tags拆分为标签短语列表(每个标签已规范化，可能包含多个词)"""
+    if not isinstance(tags, str):
+        return []
+    phrases = (' '.join(tokenize(tag)) for tag in _join_ampersand_terms(tags).split(TAG_SEPARATOR))
+    return [phrase for phrase in phrases if phrase]
+
+def split_words(text):
+    """切分已清洗的文本或', '连接的分类词列表，返回词汇列表"""
+    if not isinstance(text, str):
+        return []
+    return text.replace(',', ' ').lower().split()
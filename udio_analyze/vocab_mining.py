@@ -0,0 +1,238 @@
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import association
+import category_dictionary
+import data_io
+import frequency_engine
+import profiler
+import schema
+import writers
+
+# 生成的候选词典差异文件
+CANDIDATES_FILE = 'vocabulary_candidates.xlsx'
+DIFF_FILE = 'category_dictionary_diff.json'
+
+# 词对分析的列: 分类列前缀 -> (清洗后的文本列, 词频分析阶段中词对结果的名称)
+PAIR_SOURCES = {
+    'prompt': ('cleaned_prompt', 'prompt_word_pairs'),
+    'tag': ('cleaned_tags', 'tag_word_pairs')
+}
+
+def word_pairs(df, pairs=None, min_support=1):
+    """各前缀的词内词对关联度: 优先复用词频分析阶段的结果(AnalysisResults.pairs)，缺少时按同样的方式计算"""
+    pairs = pairs or {}
+    associations = {}
+    for prefix, (column, name) in PAIR_SOURCES.items():
+        result = pairs.get(name)
+        if result is not None and result.associations is not None:
+            associations[prefix] = result.associations
+        elif column in df.columns:
+            associations[prefix] = association.word_pair_associations(df[column], min_support)
+    return associations
+
+def category_labels(df, prefixes=('prompt', 'tag')):
+    """各分类列在共享词表上的计数，返回(词表, 每个词所属的词典类别下标(未分类为-1), other列中的频次, 词典类别名列表)"""
+    columns = [f'{prefix}_{name}' for name in list(schema.CONSISTENCY_CATEGORIES) + ['other'] for prefix in prefixes]
+    counts = frequency_engine.count_columns(df, columns)
+    labels = np.full(len(counts.vocabulary), -1, dtype=np.int64)
+    other_frequency = np.zeros(len(counts.vocabulary), dtype=np.int64)
+    categories = []
+    for name, dict_name in schema.CONSISTENCY_CATEGORIES.items():
+        present = [f'{prefix}_{name}' for prefix in prefixes if f'{prefix}_{name}' in counts.columns]
+        if not present:
+            continue
+        labels[(labels < 0) & (sum(counts.counts(column) for column in present) > 0)] = len(categories)
+        categories.append(dict_name)
+    for prefix in prefixes:
+        if f'{prefix}_other' in counts.columns:
+            other_frequency += counts.counts(f'{prefix}_other')
+    return counts.vocabulary, labels, other_frequency, categories
+
+def mine_candidates(df, min_count=10, min_npmi=0.1, known_words=None, min_pair_count=3, top_k=3, pairs=None):
+    """从other列挖掘候选词: 按与各类别已分类词的词对关联度(NPMI)为高频未分类词推荐类别
+
+    词对关联度与词频分析阶段的prompt/tags词对是同一份统计(pairs为该阶段的结果时直接复用)。
+    候选词与某类别的得分为它与该类别中关联度最高的top_k个词的NPMI平均值(不足top_k个按0计)，
+    只与长文本中大量词偶然共现的词(如虚词)得分很低。返回按得分排序的候选表。
+    """
+    with profiler.span('category_counts', rows=len(df)):
+        vocabulary, labels, frequency, categories = category_labels(df, tuple(PAIR_SOURCES))
+        candidate = (frequency >= min_count) & (labels < 0)
+        # 纯数字不作为候选词
+        candidate &= ~np.array([word.isdigit() for word in vocabulary], dtype=bool)
+        if known_words:
+            candidate &= ~np.isin(vocabulary, list(known_words))
+
+    if not candidate.any() or not categories:
+        return pd.DataFrame()
+
+    with profiler.span('pair_association', rows=len(df)):
+        # 词对按字母顺序只存一次，两个方向都展开为(候选词, 已分类词)，映射到分类列的共享词表
+        word_index = pd.Index(vocabulary)
+        firsts, seconds, npmis, counts = [], [], [], []
+        for associations in word_pairs(df, pairs).values():
+            ids = word_index.get_indexer(associations.row_vocabulary)
+            first = np.concatenate([ids[associations.rows], ids[associations.cols]])
+            second = np.concatenate([ids[associations.cols], ids[associations.rows]])
+            keep = (first >= 0) & (second >= 0)
+            keep[keep] = candidate[first[keep]] & (labels[second[keep]] >= 0)
+            keep &= np.tile(associations.metrics['Frequency'] >= min_pair_count, 2)
+            firsts.append(first[keep])
+            seconds.append(second[keep])
+            npmis.append(np.tile(associations.metrics['NPMI'], 2)[keep])
+            counts.append(np.tile(associations.metrics['Frequency'], 2)[keep])
+        if not firsts:
+            return pd.DataFrame()
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        npmi, pair_count = np.concatenate(npmis), np.concatenate(counts)
+
+        # 同一词对在prompt和tags中都出现时只保留NPMI较高的一次
+        order = np.lexsort((-npmi, second, first))
+        pair_key = first[order] * len(vocabulary) + second[order]
+        order = order[np.r_[True, pair_key[1:] != pair_key[:-1]]]
+        first, second, npmi, pair_count = first[order], second[order], npmi[order], pair_count[order]
+        group = first * len(categories) + labels[second]
+
+        # 每个(候选词, 类别)组内按NPMI降序，取前top_k个
+        order = np.lexsort((-npmi, group))
+        sorted_group = group[order]
+        group_start = np.flatnonzero(np.r_[True, sorted_group[1:] != sorted_group[:-1]])
+        rank = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+        top = order[rank < top_k]
+
+        n_words = len(vocabulary)
+        scores = np.bincount(group[top], weights=np.maximum(npmi[top], 0),
+                             minlength=n_words * len(categories)).reshape(n_words, len(categories)) / top_k
+
+    ranking = np.argsort(-scores, axis=1, kind='stable')
+    best = ranking[:, 0]
+    runner_up = ranking[:, 1] if len(categories) > 1 else best
+    rows = np.arange(n_words)
+    best_scores = scores[rows, best]
+
+    keep = candidate & (best_scores >= min_npmi)
+    index = np.flatnonzero(keep)
+
+    # 证据: 推荐类别中关联度最高的几个词(来自同一份词对统计，不需要再遍历数据)
+    evidence_by_group = {}
+    for position in top:
+        word_id = first[position]
+        if keep[word_id] and labels[second[position]] == best[word_id]:
+            evidence_by_group.setdefault(word_id, []).append(
+                f"{vocabulary[second[position]]}({pair_count[position]}, {npmi[position]:.2f})"
+            )
+
+    category_names = np.asarray(categories, dtype=object)
+    candidates = pd.DataFrame({
+        'word': vocabulary[index],
+        'proposed_category': category_names[best[index]],
+        'score': np.round(best_scores[index], 4),
+        'frequency': frequency[index],
+        'runner_up_category': category_names[runner_up[index]],
+        'runner_up_score': np.round(scores[index, runner_up[index]], 4),
+        'margin': np.round(best_scores[index] - scores[index, runner_up[index]], 4),
+        'top_associated_words': ['; '.join(evidence_by_group.get(i, [])) for i in index]
+    })
+    return candidates.sort_values(['score', 'frequency'], ascending=[False, False]).reset_index(drop=True)
+
+def build_dictionary_diff(candidates, dictionary=None, limit=None):
+    """把候选表转换为分类词典差异: {类别: [新增词汇]}，并记录基准词典的哈希和版本"""
+    selected = candidates if limit is None else candidates.head(limit)
+    additions = {}
+    for word, category in zip(selected['word'], selected['proposed_category']):
+        additions.setdefault(category, []).append(word)
+    return {
+        'base_content_hash': dictionary.content_hash if dictionary is not None else None,
+        'base_version': dictionary.version if dictionary is not None else None,
+        'add': additions
+    }
+
+def apply_dictionary_diff(dictionary_file, diff):
+    """把差异中的新增词汇合并到词典文件(词典版本号随之递增)"""
+    dictionary = category_dictionary.CategoryDictionary.load(dictionary_file)
+    if diff.get('base_content_hash') not in (None, dictionary.content_hash):
+        print(f"警告: 差异基于的词典版本 {diff.get('base_version')} 与当前词典版本 {dictionary.version} 不同")
+
+    categories = {category: list(words) for category, words in dictionary.categories.items()}
+    for category, words in diff.get('add', {}).items():
+        categories.setdefault(category, [])
+        categories[category].extend(word for word in words if word not in categories[category])
+
+    updated = category_dictionary.CategoryDictionary.from_categories(categories)
+    updated.report()
+    updated.save(dictionary_file)
+    print(f"已把 {sum(len(w) for w in diff.get('add', {}).values())} 个词合并到 {dictionary_file} (版本 {updated.version})")
+    return updated
+
+def mine_vocabulary(input_file, output_dir=None, category_file=None, min_count=10, min_npmi=0.1, limit=None,
+                    pairs=None):
+    """执行词汇挖掘，输出候选表和候选词典差异；pairs为词频分析阶段的词对结果时复用其共现计数"""
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
+
+    try:
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='vocab_mining')
+            span['rows'] = len(df)
+
+        if output_dir is None:
+            output_dir = os.path.dirname(input_file) or '.'
+        os.makedirs(output_dir, exist_ok=True)
+
+        dictionary = None
+        known_words = None
+        if category_file and os.path.exists(category_file):
+            dictionary = category_dictionary.CategoryDictionary.load(category_file)
+            known_words = set(dictionary.word_to_category)
+
+        print(f"正在从other列挖掘候选词 (最低频次 {min_count}, 最低NPMI {min_npmi})...")
+        candidates = mine_candidates(df, min_count, min_npmi, known_words=known_words, pairs=pairs)
+        if candidates.empty:
+            print("没有找到符合条件的候选词")
+            return None
+
+        candidates_file = os.path.join(output_dir, CANDIDATES_FILE)
+        diff_file = os.path.join(output_dir, DIFF_FILE)
+        with profiler.span('write_output', rows=len(candidates)):
+            candidates_file = writers.save(candidates, candidates_file)
+        with open(diff_file, 'w', encoding='utf-8') as f:
+            json.dump(build_dictionary_diff(candidates, dictionary, limit), f, ensure_ascii=False, indent=2)
+
+        print(f"共 {len(candidates)} 个候选词，前几个: "
+              f"{', '.join(f'{w}->{c}' for w, c in zip(candidates['word'][:5], candidates['proposed_category'][:5]))}")
+        print(f"候选词及关联度已保存到: {candidates_file}")
+        print(f"候选词典差异已保存到: {diff_file}")
+        return candidates
+
+    except Exception as e:
+        print(f"词汇挖掘过程中出错: {e}")
+        return None
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='从未分类词汇中挖掘分类词典候选词')
+    parser.add_argument('input_file', nargs='?', help='分类后的Excel文件 (music_prompt_categorized.xlsx)')
+    parser.add_argument('-o', '--output', dest='output_dir', help='输出目录 (默认: 输入文件所在目录)')
+    parser.add_argument('--categories', dest='category_file', help='当前分类词典，用于记录差异的基准版本')
+    parser.add_argument('--min-count', type=int, default=10, help='候选词的最低文档频次 (默认: 10)')
+    parser.add_argument('--min-npmi', type=float, default=0.1, help='推荐类别的最低NPMI (默认: 0.1)')
+    parser.add_argument('--limit', type=int, help='差异文件中最多包含的候选词数量')
+    parser.add_argument('--apply', dest='diff_file', help='把差异文件合并到 --categories 指定的词典')
+    args = parser.parse_args()
+
+    if args.diff_file:
+        if not args.category_file:
+            parser.error('--apply 需要同时指定 --categories')
+        with open(args.diff_file, 'r', encoding='utf-8') as f:
+            apply_dictionary_diff(args.category_file, json.load(f))
+    elif args.input_file:
+        mine_vocabulary(args.input_file, args.output_dir, args.category_file, args.min_count, args.min_npmi, args.limit)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+from itertools import chain
+
+# 监视模式不需要图形界面
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import association
+import consistency_analyzer
+import corpus_merge
+import data_categorizer
+import data_cleaner
+import data_io
+import frequency_engine
+import report_generator
+import results
+import schema
+import tokenizer
+import writers
+
+# 监视状态目录(位于输出目录中): 持久化的聚合结果和每个文件的处理状态
+WATCH_DIR = '.watch'
+AGGREGATES_FILE = 'aggregates.pkl'
+STATE_FILE = 'watch_state.json'
+
+# 轮询间隔和防抖时间(文件在这段时间内大小和修改时间都不变才认为写入完成)
+DEFAULT_INTERVAL = 2.0
+DEFAULT_DEBOUNCE = 5.0
+
+# 统计词频的列、列内词对和跨列词对(与 word_frequency_analyzer 的输出文件名一致)
+FREQUENCY_COLUMNS = ['cleaned_prompt', 'cleaned_tags'] + schema.CATEGORY_COLUMNS
+FREQUENCY_OUTPUTS = {'cleaned_prompt': ('prompt_word_frequency', 30), 'cleaned_tags': ('tag_word_frequency', 30)}
+PAIR_OUTPUTS = {'cleaned_prompt': 'prompt_word_pairs', 'cleaned_tags': 'tag_word_pairs'}
+CROSS_PAIR_OUTPUTS = {
+    ('prompt_genres', 'prompt_emotions'): 'genre_emotion_pairs',
+    ('prompt_genres', 'prompt_narrative'): 'genre_narrative_pairs'
+}
+CROSS_LABELS = ('Category 1 Word', 'Category 2 Word')
+
+def _grow(array, size):
+    """把计数数组用0补齐到size长度"""
+    if len(array) >= size:
+        return array
+    return np.concatenate([array, np.zeros(size - len(array), dtype=array.dtype)])
+
+class IncrementalAggregates:
+    """可增量更新的聚合结果: 各列词频、词对共现矩阵、一致性明细、报告摘要的统计，以及每个文件已处理的行数
+
+    所有列共享一个词表(按首次出现编号)，新数据只需切分和编码新行，再把计数和共现矩阵累加上去。
+    不保存数据本身，报告也只由聚合结果生成。
+    """
+
+    def __init__(self):
+        self.word_ids = {}
+        self.counts = {column: np.zeros(0, dtype=np.int64) for column in FREQUENCY_COLUMNS}
+        self.totals = {column: 0 for column in FREQUENCY_COLUMNS}
+        self.document_frequency = {}
+        self.cooccurrence = {}
+        self.consistency = None
+        self.n_rows = 0
+        self.n_batches = 0
+        # 报告摘要: 有效提示词数量和cleaned_prompt的总字符数
+        self.prompt_rows = 0
+        self.prompt_chars = 0
+        self.files = {}
+        self.seen_keys = set()
+        self.dictionary_hash = None
+
+    @property
+    def vocabulary(self):
+        """共享词表(下标即词ID)"""
+        vocabulary = np.empty(len(self.word_ids), dtype=object)
+        vocabulary[:] = list(self.word_ids)
+        return vocabulary
+
+    def _encode(self, texts):
+        """切分一批文本并映射到共享词表，返回(每个词所在的行号, 词ID)"""
+        token_lists = [tokenizer.split_words(text) for text in texts]
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+        doc_index = np.repeat(np.arange(len(token_lists), dtype=np.int64), lengths)
+        flat = list(chain.from_iterable(token_lists))
+        if not flat:
+            return doc_index, np.zeros(0, dtype=np.int64)
+
+        # 只把这批数据中不同的词映射到共享词表
+        codes, uniques = pd.factorize(pd.Series(flat, dtype=object), sort=False)
+        word_ids = self.word_ids
+        ids = np.fromiter((word_ids.setdefault(word, len(word_ids)) for word in uniques),
+                          dtype=np.int64, count=len(uniques))
+        return doc_index, ids[codes]
+
+    def _add_cooccurrence(self, name, cooccurrence, size):
+        """把一批数据的共现矩阵累加到持久化的共现矩阵中"""
+        current = self.cooccurrence.get(name)
+        if current is None:
+            current = sparse.csr_matrix((size, size), dtype=np.int64)
+        else:
+            current.resize((size, size))
+        self.cooccurrence[name] = (current + cooccurrence.astype(np.int64)).tocsr()
+
+    def add(self, batch):
+        """累加一批已分类的新数据(行索引为全局行号)"""
+        encoded = {column: self._encode(batch[column]) for column in FREQUENCY_COLUMNS if column in batch.columns}
+        size = len(self.word_ids)
+
+        # 词频: 每列的词ID直接bincount
+        for column, (_, ids) in encoded.items():
+            self.counts[column] = _grow(self.counts[column], size) + np.bincount(ids, minlength=size)
+            self.totals[column] += len(ids)
+
+        # 词对: 0/1文档-词矩阵的 X.T @ X (列内) 和 X1.T @ X2 (跨列)
+        matrices = {}
+        for column in set(PAIR_OUTPUTS).union(*CROSS_PAIR_OUTPUTS):
+            if column not in encoded:
+                continue
+            doc_index, ids = encoded[column]
+            matrix = sparse.csr_matrix((np.ones(len(ids), dtype=np.int32), (doc_index, ids)),
+                                       shape=(len(batch), size))
+            matrix.sum_duplicates()
+            matrix.data[:] = 1
+            matrices[column] = matrix
+            frequency = np.asarray(matrix.sum(axis=0)).ravel().astype(np.int64)
+            self.document_frequency[column] = _grow(self.document_frequency.get(column, np.zeros(0, dtype=np.int64)), size) + frequency
+
+        for column, name in PAIR_OUTPUTS.items():
+            if column in matrices:
+                self._add_cooccurrence(name, matrices[column].T @ matrices[column], size)
+        for (column1, column2), name in CROSS_PAIR_OUTPUTS.items():
+            if column1 in matrices and column2 in matrices:
+                self._add_cooccurrence(name, matrices[column1].T @ matrices[column2], size)
+
+        # 一致性: 只对新行评分，明细按全局行号追加
+        frames = [] if self.consistency is None else [self.consistency]
+        for category in ['genres', 'emotions', 'narrative']:
+            prompt_col, tag_col = f'prompt_{category}', f'tag_{category}'
+            if prompt_col in batch.columns and tag_col in batch.columns:
+                scores = consistency_analyzer.score_category(batch, prompt_col, tag_col)
+                if scores is not None:
+                    scores.insert(1, 'category', category)
+                    frames.append(scores)
+        if frames:
+            self.consistency = pd.concat(frames, ignore_index=True)
+
+        if 'cleaned_prompt' in batch.columns:
+            # 与读取结果文件时一致: 清洗后为空的提示词不算有效
+            lengths = batch['cleaned_prompt'].str.len()
+            self.prompt_rows += int((lengths > 0).sum())
+            self.prompt_chars += int(lengths.sum())
+        self.n_rows += len(batch)
+        self.n_batches += 1
+
+    def _pad(self, array):
+        return _grow(array, len(self.word_ids))
+
+    def summary(self):
+        """报告摘要中的数据统计(与 report_generator.corpus_summary 相同)"""
+        return {
+            'rows': self.n_rows,
+            'valid_prompts': self.prompt_rows,
+            'avg_prompt_length': self.prompt_chars / self.prompt_rows if self.prompt_rows else 0
+        }
+
+    def outputs(self, min_support=1, heatmap_words=30, heatmap_metric='Frequency', heatmap_cluster=False):
+        """由聚合结果生成与完整分析相同的结果
+
+        返回({输出名: DataFrame}, {输出名: (PairAssociations, 列名)}, results.AnalysisResults)，
+        AnalysisResults包含词频、词对和一致性结果，用于生成报告。
+        """
+        vocabulary = self.vocabulary
+        n_docs = self.n_rows
+        tables = {}
+        pair_tables = {}
+        analysis_results = results.AnalysisResults()
+
+        for column in FREQUENCY_COLUMNS:
+            name, top_n = FREQUENCY_OUTPUTS.get(column, (f"{column}_frequency", 20))
+            counts = self._pad(self.counts[column])
+            index = frequency_engine.select_top_n(counts, top_n, min_support)
+            result = results.FrequencyResult(name, column, vocabulary[index], counts[index], self.totals[column])
+            analysis_results.frequencies[name] = result
+            tables[name] = result.to_frame()
+
+        for name in PAIR_OUTPUTS.values():
+            if name not in self.cooccurrence:
+                continue
+            cooccurrence = self.cooccurrence[name]
+            associations = association.cooccurrence_pair_associations(cooccurrence, vocabulary, n_docs, min_support)
+            column = next(column for column, output in PAIR_OUTPUTS.items() if output == name)
+            analysis_results.pairs[name] = results.PairResult.from_associations(name, (column,), associations)
+            tables[name] = analysis_results.pairs[name].to_frame()
+            pair_tables[f"{name}_association"] = (associations, ('Word 1', 'Word 2'))
+            tables[f"{name}_heatmap"] = association.top_k_from_cooccurrence(
+                cooccurrence, vocabulary, n_docs, heatmap_words, heatmap_metric, heatmap_cluster
+            )
+
+        for (column1, column2), name in CROSS_PAIR_OUTPUTS.items():
+            if name not in self.cooccurrence:
+                continue
+            associations = association.cross_cooccurrence_associations(
+                self.cooccurrence[name], self._pad(self.document_frequency[column1]),
+                self._pad(self.document_frequency[column2]), n_docs, min_support, vocabulary, vocabulary
+            )
+            analysis_results.pairs[name] = results.PairResult.from_associations(
+                name, (column1, column2), associations, labels=CROSS_LABELS
+            )
+            tables[name] = analysis_results.pairs[name].to_frame()
+            pair_tables[f"{name}_association"] = (associations, CROSS_LABELS)
+
+        if self.consistency is not None:
+            tables['tag_prompt_consistency_details'] = self.consistency
+            tables['tag_prompt_consistency_summary'] = consistency_analyzer.summarize_consistency(self.consistency)
+            for category, scores in self.consistency.groupby('category', sort=False):
+                analysis_results.consistency[category] = results.ConsistencyResult.from_scores(category, scores)
+        return tables, pair_tables, analysis_results
+
+def _file_state(path):
+    """文件的大小和修改时间"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+class FolderWatcher:
+    """监视块文件目录: 新增或修改的XLSX/CSV/Parquet/JSONL文件只处理新增的行，增量更新聚合结果并重新生成报告"""
+
+    def __init__(self, watch_dir, output_dir, category_file=None, min_support=1, heatmap_words=30,
+                 heatmap_metric='Frequency', heatmap_cluster=False, debounce=DEFAULT_DEBOUNCE, key='song_path'):
+        self.watch_dir = watch_dir
+        self.output_dir = output_dir
+        self.state_dir = os.path.join(output_dir, WATCH_DIR)
+        self.category_file = category_file
+        self.min_support = min_support
+        self.heatmap_options = (heatmap_words, heatmap_metric, heatmap_cluster)
+        self.debounce = debounce
+        self.key = key
+        self._pending = {}
+        os.makedirs(self.state_dir, exist_ok=True)
+
+        aggregates_file = os.path.join(self.state_dir, AGGREGATES_FILE)
+        if os.path.exists(aggregates_file):
+            self.aggregates = pd.read_pickle(aggregates_file)
+            print(f"已加载监视状态: {len(self.aggregates.files)} 个文件，{self.aggregates.n_rows} 行")
+        else:
+            self.aggregates = IncrementalAggregates()
+
+        # 未指定分类词典时在输出目录中创建默认词典
+        if self.category_file is None:
+            self.category_file = os.path.join(output_dir, 'word_categories.xlsx')
+            data_categorizer.create_category_dictionary(self.category_file)
+        data_cleaner.download_nltk_resources()
+
+    def scan(self):
+        """检查目录中的文件，返回已稳定(超过防抖时间未变化)且有新内容的文件列表"""
+        now = time.monotonic()
+        ready = []
+        for path in corpus_merge.expand_inputs(self.watch_dir):
+            path = os.path.abspath(path)
+            try:
+                state = _file_state(path)
+            except OSError:
+                continue
+
+            record = self.aggregates.files.get(path)
+            if record is not None and record['size'] == state['size'] and record['mtime_ns'] == state['mtime_ns']:
+                self._pending.pop(path, None)
+                continue
+
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != state:
+                # 文件仍在变化，重新开始计时
+                self._pending[path] = (state, now)
+                if self.debounce > 0:
+                    continue
+            elif now - pending[1] < self.debounce:
+                continue
+            ready.append(path)
+        return ready
+
+    def _new_rows(self, path):
+        """读取文件中上次之后新增的行，并按key去掉已处理过的记录"""
+        df = data_io.read_data(path)
+        record = self.aggregates.files.get(path)
+        start = 0
+        if record is not None:
+            if len(df) >= record['rows']:
+                # 抓取块文件只在末尾追加，从上次处理到的行之后开始
+                start = record['rows']
+            else:
+                print(f"  {os.path.basename(path)} 的行数少于上次处理时，重新检查全部行")
+        new = df.iloc[start:]
+
+        if self.key in new.columns:
+            values = new[self.key]
+            duplicated = (values.duplicated() & values.notna()) | values.isin(self.aggregates.seen_keys)
+            new = new[~duplicated]
+            self.aggregates.seen_keys.update(new[self.key].dropna())
+        return new.assign(source_block=os.path.splitext(os.path.basename(path))[0]), len(df)
+
+    def ingest(self, paths):
+        """处理一批文件的新增行，更新聚合结果、结果文件和报告，返回新增的行数"""
+        start_time = time.perf_counter()
+        aggregates = self.aggregates
+        blocks = []
+        states = {}
+        for path in paths:
+            try:
+                state = _file_state(path)
+                block, n_rows = self._new_rows(path)
+            except Exception as e:
+                # 文件可能仍在写入，下次轮询时重试
+                print(f"读取 {os.path.basename(path)} 时出错，稍后重试: {e}")
+                self._pending.pop(path, None)
+                continue
+            print(f"  {os.path.basename(path)}: 共 {n_rows} 行，新增 {len(block)} 行")
+            blocks.append(block)
+            states[path] = {**state, 'rows': n_rows, 'ingested_at': datetime.now().isoformat(timespec='seconds'),
+                            'new_rows': len(block)}
+            self._pending.pop(path, None)
+
+        new_rows = sum(len(block) for block in blocks)
+        if new_rows:
+            batch = pd.concat(blocks, ignore_index=True)
+            batch.index = pd.RangeIndex(aggregates.n_rows, aggregates.n_rows + len(batch))
+
+            # 只对新行清洗和分类
+            dictionary = data_categorizer.load_dictionary(self.category_file)
+            if aggregates.dictionary_hash not in (None, dictionary.content_hash):
+                print("分类词典已改变: 之前导入的数据不会重新分类，如需重新分类请删除输出目录中的 .watch 目录")
+            aggregates.dictionary_hash = dictionary.content_hash
+
+            cleaned = data_cleaner.clean_frame(batch)
+            for column in cleaned.columns:
+                batch[column] = cleaned[column]
+            categorized = data_categorizer.categorize_frame(batch, dictionary.categories, dictionary.word_to_category)
+            for column in categorized.columns:
+                batch[column] = categorized[column]
+
+            aggregates.add(batch)
+
+        aggregates.files.update(states)
+        self._save_state(new_rows, time.perf_counter() - start_time)
+
+        if new_rows:
+            self.write_outputs()
+            print(f"更新完成: 新增 {new_rows} 行，累计 {aggregates.n_rows} 行，耗时 {time.perf_counter() - start_time:.2f} 秒")
+        return new_rows
+
+    def _save_state(self, new_rows, seconds):
+        """原子写入聚合结果，并写出可读的文件处理状态"""
+        aggregates_file = os.path.join(self.state_dir, AGGREGATES_FILE)
+        pd.to_pickle(self.aggregates, aggregates_file + '.tmp')
+        os.replace(aggregates_file + '.tmp', aggregates_file)
+
+        state_file = os.path.join(self.state_dir, STATE_FILE)
+        with open(state_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({
+                'watch_dir': os.path.abspath(self.watch_dir),
+                'rows': self.aggregates.n_rows,
+                'batches': self.aggregates.n_batches,
+                'last_update': {'at': datetime.now().isoformat(timespec='seconds'), 'new_rows': new_rows,
+                                'seconds': round(seconds, 3)},
+                'files': self.aggregates.files
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(state_file + '.tmp', state_file)
+
+    def write_outputs(self):
+        """把聚合结果写成与完整分析相同的结果文件(不绘制图表)，并重新生成综合报告"""
+        tables, pair_tables, analysis_results = self.aggregates.outputs(self.min_support, *self.heatmap_options)
+        metric_min_count = max(self.min_support, association.DEFAULT_METRIC_MIN_COUNT)
+        with writers.background():
+            for name, table in tables.items():
+                writers.save(table, os.path.join(self.output_dir, f"{name}.xlsx"), index=name.endswith('_heatmap'))
+            for name, (associations, labels) in pair_tables.items():
+                association.save_association_tables(associations, os.path.join(self.output_dir, f"{name}.xlsx"),
+                                                    min_count=metric_min_count, labels=labels)
+
+        # 报告直接使用聚合结果，不需要再读取数据
+        return report_generator.generate_report(self.watch_dir, self.output_dir, analysis_results,
+                                                self.aggregates.summary())
+
+    def run(self, interval=DEFAULT_INTERVAL, once=False):
+        """轮询监视目录；once=True时只处理当前已有的文件后退出"""
+        print(f"正在监视: {os.path.abspath(self.watch_dir)} (每 {interval} 秒检查一次，防抖 {self.debounce} 秒)")
+        print(f"结果保存在: {self.output_dir}")
+        try:
+            while True:
+                ready = self.scan()
+                if ready:
+                    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] 检测到 {len(ready)} 个新增或修改的文件")
+                    self.ingest(ready)
+                if once:
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("已停止监视")
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='监视块文件目录，自动增量分析新增的抓取数据')
+    parser.add_argument('watch_dir', help='要监视的块文件目录')
+    parser.add_argument('-o', '--output', dest='output_dir', default='watch_results', help='输出目录 (默认: watch_results)')
+    parser.add_argument('--categories', dest='category_file', help='分类词典文件 (默认: 在输出目录中创建)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help=f'轮询间隔秒数 (默认: {DEFAULT_INTERVAL})')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f'文件停止变化多少秒后才处理 (默认: {DEFAULT_DEBOUNCE})')
+    parser.add_argument('--once', action='store_true', help='只处理目录中当前的文件，不继续监视')
+    parser.add_argument('--min-support', type=int, default=1, help='词频和词对统计中保留的最低频次 (默认: 1)')
+    parser.add_argument('--format', dest='output_format', choices=list(writers.FORMATS), default=writers.DEFAULT_FORMAT,
+                        help='中间结果的输出格式 (默认: xlsx)')
+    parser.add_argument('--heatmap-words', type=int, default=30, help='词对热力图的词数 (默认: 30)')
+    parser.add_argument('--heatmap-metric', choices=['Frequency', 'NPMI'], default='Frequency', help='词对热力图的取值')
+    parser.add_argument('--heatmap-cluster', action='store_true', help='词对热力图按层次聚类顺序排列')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.watch_dir):
+        print(f"错误: 目录 '{args.watch_dir}' 不存在")
+        return
+
+    writers.set_format(args.output_format)
+    os.makedirs(args.output_dir, exist_ok=True)
+    watcher = FolderWatcher(args.watch_dir, args.output_dir, args.category_file, args.min_support,
+                            args.heatmap_words, args.heatmap_metric, args.heatmap_cluster,
+                            0 if args.once else args.debounce)
+    watcher.run(args.interval, args.once)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,43 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-from collections import Counter
 import os
-import numpy as np
 
-def analyze_word_frequency(df, column_name, output_file, top_n=30):
-    """分析指定列的词频并输出到Excel"""
+import association
+import data_io
+import frequency_engine
+import profiler
+import results
+import shared_artifacts
+import writers
+
+CATEGORY_COLUMNS = [f"{prefix}_{category}" for prefix in ['prompt', 'tag']
+                    for category in ['genres', 'emotions', 'narrative', 'other']]
+
+# 各列词频结果的名称(即输出文件名，不含扩展名)和输出的高频词数量
+FREQUENCY_OUTPUTS = {
+    'cleaned_prompt': ('prompt_word_frequency', 30),
+    'cleaned_tags': ('tag_word_frequency', 30),
+    **{column: (f"{column}_frequency", 20) for column in CATEGORY_COLUMNS}
+}
+
+# 词对结果的名称和分析的列: 一列为列内词对，两列为跨类别词对
+PAIR_OUTPUTS = {
+    'prompt_word_pairs': ('cleaned_prompt',),
+    'tag_word_pairs': ('cleaned_tags',),
+    'genre_emotion_pairs': ('prompt_genres', 'prompt_emotions'),
+    'genre_narrative_pairs': ('prompt_genres', 'prompt_narrative'),
+}
+CROSS_PAIR_LABELS = ('Category 1 Word', 'Category 2 Word')
+
+def _result_name(output_file):
+    """输出文件对应的结果名称"""
+    return os.path.splitext(os.path.basename(output_file))[0]
+
+@profiler.traced('word_frequency[{column_name}]')
+def analyze_word_frequency(df, column_name, output_file, top_n=30, min_support=1, column_counts=None):
+    """分析指定列的词频并输出到文件(格式见 writers.set_format)，返回 results.FrequencyResult
+
+    column_counts为多列共享的计数结果，min_support为最低频次。
+    """
     
     if column_name not in df.columns:
         print(f"列 {column_name} 不存在于数据中")
@@ -13,47 +45,59 @@ def analyze_word_frequency(df, column_name, output_file, top_n=30):
     
     print(f"正在分析 {column_name} 列的词频...")
     
-    # 合并所有词汇
-    all_words = []
-    for text in df[column_name].dropna():
-        if isinstance(text, str):
-            all_words.extend(text.lower().split())
-    
-    print(f"共收集到 {len(all_words)} 个词汇")
-    
-    # 计算词频
-    word_counts = Counter(all_words)
-    most_common = word_counts.most_common(top_n)
+    with profiler.span('word_counting', rows=len(df)):
+        # 整数编码后用bincount计数，不为每个低频词保留Counter条目
+        if column_counts is None:
+            column_counts = frequency_engine.count_columns(df, [column_name], min_support)
+        
+        print(f"共收集到 {column_counts.total(column_name)} 个词汇")
+        
+        # 计算词频
+        result = results.FrequencyResult.from_counts(_result_name(output_file), column_name, column_counts, top_n)
+        most_common = list(zip(result.words.tolist(), result.counts.tolist()))
     
     print(f"最常见的词汇: {', '.join([word for word, _ in most_common[:5]])}")
     
     # 创建DataFrame
-    freq_df = pd.DataFrame(most_common, columns=['Word', 'Frequency'])
+    freq_df = result.to_frame()
     
-    # 保存到Excel
-    freq_df.to_excel(output_file, index=False)
+    # 保存结果(有后台写入线程时与后续计算重叠进行)
+    with profiler.span('write_output', rows=len(freq_df)):
+        output_file = writers.save(freq_df, output_file)
     print(f"词频分析结果已保存到: {output_file}")
     
     # 创建条形图
     try:
-        plt.figure(figsize=(12, 8))
-        plt.bar(range(len(most_common)), [count for _, count in most_common], align='center')
-        plt.xticks(range(len(most_common)), [word for word, _ in most_common], rotation=90)
-        plt.title(f'Top {top_n} Words in {column_name}')
-        plt.tight_layout()
-        
-        # 保存图表
-        chart_file = f"{os.path.splitext(output_file)[0]}_chart.png"
-        plt.savefig(chart_file)
-        print(f"词频图表已保存到: {chart_file}")
-        plt.close()
+        with profiler.span('chart'):
+            plt.figure(figsize=(12, 8))
+            plt.bar(range(len(most_common)), [count for _, count in most_common], align='center')
+            plt.xticks(range(len(most_common)), [word for word, _ in most_common], rotation=90)
+            plt.title(f'Top {top_n} Words in {column_name}')
+            plt.tight_layout()
+            
+            # 保存图表
+            chart_file = f"{os.path.splitext(output_file)[0]}_chart.png"
+            plt.savefig(chart_file)
+            print(f"词频图表已保存到: {chart_file}")
+            plt.close()
     except Exception as e:
         print(f"创建图表时出错: {e}")
     
-    return freq_df
+    return result
 
-def analyze_category_word_frequency(df, input_file, output_dir=None):
-    """分析各个类别的词频"""
+def count_frequency_columns(df, min_support=1):
+    """所有词频列一次分词、编码和计数，返回 frequency_engine.ColumnCounts"""
+    # 去重阶段以weight模式运行时，近似重复簇按1/簇大小计数
+    row_weights = None
+    if 'dedup_weight' in df.columns:
+        print("检测到 dedup_weight 列，词频按近似重复簇加权计数")
+        row_weights = df['dedup_weight'].to_numpy()
+    
+    with profiler.span('shared_counting', rows=len(df)):
+        return frequency_engine.count_columns(df, list(FREQUENCY_OUTPUTS), min_support, row_weights)
+
+def analyze_category_word_frequency(df, input_file, output_dir=None, min_support=1):
+    """分析各个类别的词频，所有列在一次遍历中共享词表计数，返回 {结果名称: results.FrequencyResult}"""
     
     if output_dir is None:
         output_dir = os.path.dirname(input_file)
@@ -63,30 +107,86 @@ def analyze_category_word_frequency(df, input_file, output_dir=None):
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
     
-    results = {}
+    frequencies = {}
     
-    # 分析prompt词频
-    if 'cleaned_prompt' in df.columns:
-        output_file = os.path.join(output_dir, "prompt_word_frequency.xlsx")
-        results['prompt'] = analyze_word_frequency(df, 'cleaned_prompt', output_file)
+    column_counts = count_frequency_columns(df, min_support)
     
-    # 分析tags词频
-    if 'cleaned_tags' in df.columns:
-        output_file = os.path.join(output_dir, "tag_word_frequency.xlsx")
-        results['tags'] = analyze_word_frequency(df, 'cleaned_tags', output_file)
+    # 词表和计数矩阵写为内存映射文件，报告生成和查询工具直接打开，不再读取结果表
+    try:
+        with profiler.span('write_artifacts'):
+            shared_artifacts.write_counts(shared_artifacts.artifact_dir(output_dir), column_counts)
+    except OSError as e:
+        print(f"无法写入共享词频计数，跳过: {e}")
+    
+    # prompt、tags和各类别列的词频
+    for column, (name, top_n) in FREQUENCY_OUTPUTS.items():
+        if column in df.columns:
+            output_file = os.path.join(output_dir, f"{name}.xlsx")
+            frequencies[name] = analyze_word_frequency(df, column, output_file, top_n=top_n,
+                                                       column_counts=column_counts)
+    
+    return frequencies
+
+@profiler.traced('ngrams[{column_name}]')
+def analyze_ngram_frequency(df, column_name, output_dir, prefix, max_n=4, top_n=30, min_support=1):
+    """分析有序短语(2..max_n词的n-gram)频率，每个n输出一个 {prefix}_{n}gram_frequency 文件和条形图
+
+    只统计出现不少于max(min_support, 2)次的短语，有 dedup_weight 列时按权重计数。
+    返回 {结果名称: results.FrequencyResult}。
+    """
     
-    # 按类别分析词频
-    for prefix in ['prompt', 'tag']:
-        for category in ['genres', 'emotions', 'narrative', 'other']:
-            column = f"{prefix}_{category}"
-            if column in df.columns:
-                output_file = os.path.join(output_dir, f"{column}_frequency.xlsx")
-                results[column] = analyze_word_frequency(df, column, output_file, top_n=20)
+    if column_name not in df.columns:
+        print(f"列 {column_name} 不存在于数据中")
+        return None
     
-    return results
+    print(f"正在分析 {column_name} 列的2~{max_n}词短语...")
+    
+    row_weights = df['dedup_weight'].to_numpy() if 'dedup_weight' in df.columns else None
+    with profiler.span('ngram_counting', rows=len(df)):
+        # 整数编码的词ID流上逐层计数，不为每个n-gram创建元组
+        ngram_counts = frequency_engine.count_ngrams(
+            df[column_name], max_n, max(min_support, frequency_engine.DEFAULT_NGRAM_MIN_SUPPORT), row_weights
+        )
+    
+    phrases = {}
+    for n in range(2, max_n + 1):
+        name = f"{prefix}_{n}gram_frequency"
+        phrases[name] = results.FrequencyResult.from_ngrams(name, column_name, ngram_counts, n, top_n)
+        phrases_df = phrases[name].to_frame()
+        if phrases_df.empty:
+            print(f"没有出现多次的{n}词短语")
+            continue
+        print(f"最常见的{n}词短语: {', '.join(phrases_df['Phrase'].head(3))}")
+        
+        with profiler.span('write_output', rows=len(phrases_df)):
+            output_file = writers.save(phrases_df, os.path.join(output_dir, f"{name}.xlsx"))
+        print(f"{n}词短语频率已保存到: {output_file}")
+        
+        # 创建条形图
+        try:
+            with profiler.span('chart'):
+                plt.figure(figsize=(12, 8))
+                plt.bar(range(len(phrases_df)), phrases_df['Frequency'], align='center')
+                plt.xticks(range(len(phrases_df)), phrases_df['Phrase'], rotation=90)
+                plt.title(f'Top {top_n} {n}-word Phrases in {column_name}')
+                plt.tight_layout()
+                
+                chart_file = f"{os.path.splitext(output_file)[0]}_chart.png"
+                plt.savefig(chart_file)
+                plt.close()
+        except Exception as e:
+            print(f"创建图表时出错: {e}")
+    
+    return phrases
 
-def analyze_word_pairs(df, column_name, output_file, top_n=30):
-    """分析词汇搭配频率"""
+@profiler.traced('word_pairs[{column_name}]')
+def analyze_word_pairs(df, column_name, output_file, top_n=30, min_support=1,
+                       heatmap_words=30, heatmap_metric='Frequency', heatmap_cluster=False):
+    """分析词汇搭配频率，并按PMI、NPMI、Lift和卡方分别排序输出关联度最高的词对
+
+    热力图为文档频次最高的heatmap_words个词的完整共现矩阵，heatmap_metric可选'Frequency'或'NPMI'，
+    heatmap_cluster=True时按层次聚类顺序排列。返回 results.PairResult。
+    """
     
     if column_name not in df.columns:
         print(f"列 {column_name} 不存在于数据中")
@@ -94,72 +194,63 @@ def analyze_word_pairs(df, column_name, output_file, top_n=30):
     
     print(f"正在分析 {column_name} 列的词对搭配...")
     
-    from itertools import combinations
-    
-    # 收集所有词对
-    all_pairs = []
-    for text in df[column_name].dropna():
-        if isinstance(text, str):
-            words = text.lower().split()
-            # 去重，避免同一行中的重复词汇产生多个相同的词对
-            unique_words = sorted(set(words))
-            if len(unique_words) > 1:  # 确保至少有两个不同的词
-                # 生成所有可能的词对组合
-                pairs = list(combinations(unique_words, 2))
-                all_pairs.extend(pairs)
-    
-    print(f"共收集到 {len(all_pairs)} 个词对")
-    
-    # 计算词对频率
-    pair_counts = Counter(all_pairs)
-    most_common_pairs = pair_counts.most_common(top_n)
-    
-    # 创建DataFrame
-    pairs_df = pd.DataFrame(most_common_pairs, columns=['Word Pair', 'Frequency'])
-    pairs_df['Word 1'] = pairs_df['Word Pair'].apply(lambda x: x[0])
-    pairs_df['Word 2'] = pairs_df['Word Pair'].apply(lambda x: x[1])
-    pairs_df = pairs_df[['Word 1', 'Word 2', 'Frequency']]
-    
-    # 保存到Excel
-    pairs_df.to_excel(output_file, index=False)
+    with profiler.span('pair_counting', rows=len(df)):
+        # 文档-词矩阵的共现矩阵一次给出所有词对的共现行数(同一行中的重复词汇只计一次)
+        matrix, vocabulary = association.document_term_matrix(df[column_name], min_support)
+        associations = association.matrix_pair_associations(matrix, vocabulary, min_support)
+        print(f"共收集到 {int(associations.metrics['Frequency'].sum())} 个词对")
+        
+        result = results.PairResult.from_associations(_result_name(output_file), (column_name,), associations, top_n)
+        pairs_df = result.to_frame()
+    
+    # 保存结果
+    with profiler.span('write_output', rows=len(pairs_df)):
+        output_file = writers.save(pairs_df, output_file)
+        association_file = association.save_association_tables(
+            associations, f"{os.path.splitext(output_file)[0]}_association", top_n,
+            max(min_support, association.DEFAULT_METRIC_MIN_COUNT)
+        )
     print(f"词对分析结果已保存到: {output_file}")
+    print(f"词对关联度排名(PMI、NPMI、Lift、卡方)已保存到: {association_file}")
     
-    # 创建热力图数据
+    # 创建热力图数据: 高频词的 K x K 共现矩阵由同一个文档-词矩阵一次稀疏乘积得到
     try:
-        top_words = list(set([w for pair in most_common_pairs for w in pair]))
-        heatmap_data = pd.DataFrame(0, index=top_words, columns=top_words)
-        
-        for (word1, word2), freq in most_common_pairs:
-            if word1 in top_words and word2 in top_words:
-                heatmap_data.loc[word1, word2] = freq
-                heatmap_data.loc[word2, word1] = freq
-        
-        # 保存热力图数据
-        heatmap_file = f"{os.path.splitext(output_file)[0]}_heatmap.xlsx"
-        heatmap_data.to_excel(heatmap_file)
-        print(f"词对热力图数据已保存到: {heatmap_file}")
-        
-        # 创建热力图
-        plt.figure(figsize=(12, 10))
-        plt.imshow(heatmap_data.values, cmap='YlOrRd')
-        plt.colorbar(label='Frequency')
-        plt.xticks(range(len(top_words)), top_words, rotation=90)
-        plt.yticks(range(len(top_words)), top_words)
-        plt.title(f'Word Pair Co-occurrence in {column_name}')
-        plt.tight_layout()
-        
-        # 保存图表
-        chart_file = f"{os.path.splitext(output_file)[0]}_heatmap.png"
-        plt.savefig(chart_file)
-        print(f"词对热力图已保存到: {chart_file}")
-        plt.close()
+        with profiler.span('heatmap', rows=heatmap_words):
+            heatmap_data = association.top_k_cooccurrence(matrix, vocabulary, heatmap_words,
+                                                          heatmap_metric, heatmap_cluster)
+            top_words = heatmap_data.index.tolist()
+            
+            # 保存热力图数据
+            heatmap_file = writers.save(heatmap_data, f"{os.path.splitext(output_file)[0]}_heatmap", index=True)
+            print(f"词对热力图数据已保存到: {heatmap_file}")
+            
+            # 创建热力图，词较多时按词数放大图幅并缩小标签字号
+            size = max(12, len(top_words) * 0.15)
+            font_size = 10 if len(top_words) <= 50 else max(4, 500 // len(top_words))
+            plt.figure(figsize=(size, size * 5 / 6))
+            if heatmap_metric == 'NPMI':
+                plt.imshow(heatmap_data.values, cmap='RdBu_r', vmin=-1, vmax=1)
+            else:
+                plt.imshow(heatmap_data.values, cmap='YlOrRd')
+            plt.colorbar(label=heatmap_metric)
+            plt.xticks(range(len(top_words)), top_words, rotation=90, fontsize=font_size)
+            plt.yticks(range(len(top_words)), top_words, fontsize=font_size)
+            plt.title(f'Word Pair Co-occurrence ({heatmap_metric}) of Top {len(top_words)} Words in {column_name}')
+            plt.tight_layout()
+            
+            # 保存图表
+            chart_file = f"{os.path.splitext(output_file)[0]}_heatmap.png"
+            plt.savefig(chart_file)
+            print(f"词对热力图已保存到: {chart_file}")
+            plt.close()
     except Exception as e:
         print(f"创建热力图时出错: {e}")
     
-    return pairs_df
+    return result
 
-def analyze_cross_category_pairs(df, cat1, cat2, output_file):
-    """分析不同类别之间的词汇搭配"""
+@profiler.traced('cross_category_pairs[{cat1}x{cat2}]')
+def analyze_cross_category_pairs(df, cat1, cat2, output_file, min_support=1):
+    """分析不同类别之间的词汇搭配，并按各关联度指标输出排名，返回 results.PairResult"""
     
     if cat1 not in df.columns or cat2 not in df.columns:
         print(f"列 {cat1} 或 {cat2} 不存在于数据中")
@@ -167,47 +258,41 @@ def analyze_cross_category_pairs(df, cat1, cat2, output_file):
     
     print(f"正在分析 {cat1} 和 {cat2} 之间的词汇搭配...")
     
-    all_pairs = []
-    for i, row in df.iterrows():
-        if isinstance(row[cat1], str) and isinstance(row[cat2], str):
-            words1 = row[cat1].lower().split(', ')
-            words2 = row[cat2].lower().split(', ')
-            
-            # 过滤掉空字符串
-            words1 = [w for w in words1 if w.strip()]
-            words2 = [w for w in words2 if w.strip()]
-            
-            if words1 and words2:  # 确保两个列表都不为空
-                # 生成跨类别词对
-                cross_pairs = [(w1, w2) for w1 in words1 for w2 in words2]
-                all_pairs.extend(cross_pairs)
-    
-    print(f"共收集到 {len(all_pairs)} 个跨类别词对")
-    
-    # 计算词对频率
-    pair_counts = Counter(all_pairs)
-    most_common_pairs = pair_counts.most_common(30)
-    
-    # 创建DataFrame
-    pairs_df = pd.DataFrame(most_common_pairs, columns=['Word Pair', 'Frequency'])
-    pairs_df['Category 1 Word'] = pairs_df['Word Pair'].apply(lambda x: x[0])
-    pairs_df['Category 2 Word'] = pairs_df['Word Pair'].apply(lambda x: x[1])
-    pairs_df = pairs_df[['Category 1 Word', 'Category 2 Word', 'Frequency']]
-    
-    # 保存到Excel
-    pairs_df.to_excel(output_file, index=False)
+    labels = CROSS_PAIR_LABELS
+    with profiler.span('pair_counting', rows=len(df)):
+        # 两列文档-词矩阵相乘得到跨类别共现行数
+        associations = association.cross_pair_associations(df[cat1], df[cat2], min_support)
+        print(f"共收集到 {int(associations.metrics['Frequency'].sum())} 个跨类别词对")
+        
+        result = results.PairResult.from_associations(_result_name(output_file), (cat1, cat2), associations, 30, labels)
+        pairs_df = result.to_frame()
+    
+    # 保存结果
+    with profiler.span('write_output', rows=len(pairs_df)):
+        output_file = writers.save(pairs_df, output_file)
+        association.save_association_tables(
+            associations, f"{os.path.splitext(output_file)[0]}_association", 30,
+            max(min_support, association.DEFAULT_METRIC_MIN_COUNT), labels
+        )
     print(f"跨类别词对分析结果已保存到: {output_file}")
     
-    return pairs_df
+    return result
+
+def analyze_all_word_frequencies(input_file, output_dir=None, min_support=1,
+                                 heatmap_words=30, heatmap_metric='Frequency', heatmap_cluster=False, ngram_max=4):
+    """执行所有词频分析，min_support为词频统计中保留的最低频次，heatmap_*为词对热力图选项(见 analyze_word_pairs)，
+    ngram_max为prompt短语分析的最大词数(小于2时不分析)
 
-def analyze_all_word_frequencies(input_file, output_dir=None):
-    """执行所有词频分析"""
+    返回包含各列词频、短语和词对的 results.AnalysisResults，出错时返回False。
+    """
     
-    print(f"正在读取文件: {input_file}")
+    print(f"正在读取文件: {data_io.source_name(input_file)}")
     
     try:
         # 读取Excel文件
-        df = pd.read_excel(input_file)
+        with profiler.span('read_data') as span:
+            df = data_io.read_data(input_file, stage='frequency')
+            span['rows'] = len(df)
         
         if output_dir is None:
             output_dir = os.path.dirname(input_file)
@@ -219,39 +304,57 @@ def analyze_all_word_frequencies(input_file, output_dir=None):
         
         # 1. 分析各列词频
         print("\n===== 开始词频分析 =====")
-        freq_results = analyze_category_word_frequency(df, input_file, output_dir)
+        freq_results = analyze_category_word_frequency(df, input_file, output_dir, min_support)
+        pairs = {}
         
         # 2. 分析词对搭配
         print("\n===== 开始词对搭配分析 =====")
         # 分析prompt中的词对
         if 'cleaned_prompt' in df.columns:
             output_file = os.path.join(output_dir, "prompt_word_pairs.xlsx")
-            prompt_pairs = analyze_word_pairs(df, 'cleaned_prompt', output_file)
+            pairs['prompt_word_pairs'] = analyze_word_pairs(
+                df, 'cleaned_prompt', output_file, min_support=min_support, heatmap_words=heatmap_words,
+                heatmap_metric=heatmap_metric, heatmap_cluster=heatmap_cluster
+            )
         
         # 分析tags中的词对
         if 'cleaned_tags' in df.columns:
             output_file = os.path.join(output_dir, "tag_word_pairs.xlsx")
-            tag_pairs = analyze_word_pairs(df, 'cleaned_tags', output_file)
+            pairs['tag_word_pairs'] = analyze_word_pairs(
+                df, 'cleaned_tags', output_file, min_support=min_support, heatmap_words=heatmap_words,
+                heatmap_metric=heatmap_metric, heatmap_cluster=heatmap_cluster
+            )
         
         # 3. 分析跨类别词对
         print("\n===== 开始跨类别词对分析 =====")
         # 分析音乐类型和情绪的搭配
         if 'prompt_genres' in df.columns and 'prompt_emotions' in df.columns:
             output_file = os.path.join(output_dir, "genre_emotion_pairs.xlsx")
-            genre_emotion_pairs = analyze_cross_category_pairs(
-                df, 'prompt_genres', 'prompt_emotions', output_file
+            pairs['genre_emotion_pairs'] = analyze_cross_category_pairs(
+                df, 'prompt_genres', 'prompt_emotions', output_file, min_support
             )
         
         # 分析音乐类型和叙事元素的搭配
         if 'prompt_genres' in df.columns and 'prompt_narrative' in df.columns:
             output_file = os.path.join(output_dir, "genre_narrative_pairs.xlsx")
-            genre_narrative_pairs = analyze_cross_category_pairs(
-                df, 'prompt_genres', 'prompt_narrative', output_file
+            pairs['genre_narrative_pairs'] = analyze_cross_category_pairs(
+                df, 'prompt_genres', 'prompt_narrative', output_file, min_support
             )
         
+        # 4. 分析prompt中的有序短语
+        phrases = None
+        if ngram_max >= 2:
+            print("\n===== 开始短语分析 =====")
+            phrases = analyze_ngram_frequency(df, 'cleaned_prompt', output_dir, 'prompt', ngram_max,
+                                              min_support=min_support)
+        
         print("\n词频分析全部完成！")
         
-        return True
+        return results.AnalysisResults(
+            frequencies={name: result for name, result in freq_results.items() if result is not None},
+            phrases=phrases,
+            pairs={name: result for name, result in pairs.items() if result is not None}
+        )
     
     except Exception as e:
         print(f"词频分析过程中出错: {e}")
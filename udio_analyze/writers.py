@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import queue
+import threading
+import contextlib
+
+import pandas as pd
+
+import data_io
+import profiler
+
+# 支持的输出格式及扩展名
+FORMATS = {
+    'xlsx': '.xlsx',
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'json': '.json'
+}
+DEFAULT_FORMAT = 'xlsx'
+
+# 当前输出格式和激活的后台写入线程，各模块通过 writers.save() 写出中间结果
+_output_format = DEFAULT_FORMAT
+_active_writer = None
+
+def set_format(output_format):
+    """设置中间结果的输出格式，返回实际使用的格式(未安装parquet引擎时退回csv)"""
+    global _output_format
+    if output_format not in FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}，可选: {', '.join(FORMATS)}")
+    if output_format == 'parquet' and not data_io.parquet_available():
+        print("未安装pyarrow或fastparquet，输出格式改为csv")
+        output_format = 'csv'
+    _output_format = output_format
+    return output_format
+
+def get_format():
+    """返回当前的输出格式"""
+    return _output_format
+
+def output_path(output_file, output_format=None):
+    """把文件名的扩展名替换为输出格式对应的扩展名"""
+    return f"{os.path.splitext(output_file)[0]}{FORMATS[output_format or _output_format]}"
+
+def split_output(file_name):
+    """拆分输出文件名为(不含扩展名的名称, 格式)，不是支持的格式时返回(None, None)"""
+    stem, extension = os.path.splitext(file_name)
+    for output_format, format_extension in FORMATS.items():
+        if extension.lower() == format_extension:
+            return stem, output_format
+    return None, None
+
+def write_frame(df, output_file, index=False):
+    """按扩展名把DataFrame写入文件"""
+    _, output_format = split_output(output_file)
+    if output_format == 'xlsx':
+        df.to_excel(output_file, index=index)
+        return output_file
+
+    if index:
+        # csv/parquet/json中把索引保存为普通列
+        df = df.reset_index()
+    if output_format == 'csv':
+        df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    elif output_format == 'parquet':
+        df.to_parquet(output_file, index=False)
+    elif output_format == 'json':
+        df.to_json(output_file, orient='records', force_ascii=False, date_format='iso')
+    else:
+        raise ValueError(f"不支持的输出文件: {output_file}")
+    return output_file
+
+def write_sheets(sheets, output_file):
+    """写入多个表: xlsx每个表一个工作表，json为 {表名: 记录列表}，csv/parquet每个表一个文件(<名称>_<表名>)"""
+    base_name, output_format = split_output(output_file)
+    if output_format == 'xlsx':
+        with pd.ExcelWriter(output_file) as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        return [output_file]
+
+    if output_format == 'json':
+        content = {sheet_name: json.loads(df.to_json(orient='records', force_ascii=False, date_format='iso'))
+                   for sheet_name, df in sheets.items()}
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(content, f, ensure_ascii=False)
+        return [output_file]
+
+    return [write_frame(df, f"{base_name}_{sheet_name}{FORMATS[output_format]}")
+            for sheet_name, df in sheets.items()]
+
+def find_output(output_dir, name):
+    """在输出目录中查找某个中间结果文件(优先当前格式)，找不到时返回None"""
+    for output_format in [_output_format] + [f for f in FORMATS if f != _output_format]:
+        path = os.path.join(output_dir, f"{name}{FORMATS[output_format]}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def list_outputs(output_dir):
+    """列出输出目录中的中间结果 {名称: 文件路径}，同名文件有多种格式时优先当前格式"""
+    outputs = {}
+    for file_name in os.listdir(output_dir):
+        stem, output_format = split_output(file_name)
+        if stem is None:
+            continue
+        if stem not in outputs or output_format == _output_format:
+            outputs[stem] = os.path.join(output_dir, file_name)
+    return outputs
+
+class WriteError(Exception):
+    """后台线程写出中间结果失败"""
+
+class BackgroundWriter:
+    """后台写入线程: 计算线程提交写入任务后立即返回，文件写入与后续计算重叠进行"""
+
+    def __init__(self, max_pending=16):
+        # 队列有上限，写入跟不上时计算线程会等待，避免待写入的DataFrame占用过多内存
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.errors = []
+        self.written = []
+        self.write_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='background-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                func, df, output_file, args, span = task
+                start_time = time.perf_counter()
+                try:
+                    result = func(df, output_file, *args)
+                    self.written.extend(result if isinstance(result, list) else [result])
+                except Exception as e:
+                    self.errors.append((output_file, e))
+                    print(f"后台写入 {output_file} 时出错: {e}")
+                finally:
+                    elapsed = time.perf_counter() - start_time
+                    self.write_seconds += elapsed
+                    if span is not None:
+                        # 提交时所在的区段(write_output)只记录了提交耗时，实际写文件耗时记录在 write_s 中
+                        span['write_s'] = round(span.get('write_s', 0.0) + elapsed, 6)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, func, df, output_file, *args):
+        """提交一个写入任务: func(df, output_file, *args)"""
+        self._queue.put((func, df, output_file, args, profiler.current_span()))
+
+    def flush(self):
+        """等待已提交的写入全部完成"""
+        self._queue.join()
+
+    def close(self):
+        """写完剩余任务后结束线程"""
+        self._queue.put(None)
+        self._thread.join()
+
+@contextlib.contextmanager
+def background():
+    """在with块中把 writers.save() 的写入交给后台线程，退出时等待全部写入完成
+
+    嵌套使用时复用外层的后台线程。写出的DataFrame在提交后不应再被修改。
+    有文件写入失败时退出with块会抛出WriteError；后台写文件的总耗时记录在所在区段的 background_write_s 中。
+    """
+    global _active_writer
+    if _active_writer is not None:
+        yield _active_writer
+        return
+
+    stage_span = profiler.current_span()
+    writer = BackgroundWriter()
+    _active_writer = writer
+    try:
+        yield writer
+    finally:
+        _active_writer = None
+        writer.close()
+        if stage_span is not None:
+            stage_span['background_write_s'] = round(writer.write_seconds, 6)
+
+    if writer.errors:
+        output_file, error = writer.errors[0]
+        raise WriteError(f"{len(writer.errors)} 个文件写入失败，如 {output_file}: {error}") from error
+
+def _submit(func, df, output_file, *args):
+    if _active_writer is not None:
+        _active_writer.submit(func, df, output_file, *args)
+    else:
+        func(df, output_file, *args)
+
+def save(df, output_file, index=False):
+    """按当前输出格式保存DataFrame(替换output_file的扩展名)，返回实际的文件路径"""
+    output_file = output_path(output_file)
+    _submit(write_frame, df, output_file, index)
+    return output_file
+
+def save_sheets(sheets, output_file):
+    """按当前输出格式保存多个表，返回主文件路径(csv/parquet时为各表文件共同的前缀路径)"""
+    output_file = output_path(output_file)
+    _submit(write_sheets, sheets, output_file)
+    return output_file